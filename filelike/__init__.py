@@ -43,6 +43,11 @@ It also provides some nifty file-handling functions:
     :slice:   access a section of a file-like object as if it were an
               independent file.
 
+    :copy:    efficiently copy data from one file-like object to another.
+
+The class MmapFile provides fast access to local files through a memory map,
+and is used by open() when the mode string contains an "m".
+
 
 The "wrappers" subpackage contains a collection of useful classes built on
 top of this framework.  These include:
@@ -96,10 +101,19 @@ __ver_tuple__ = (__ver_major__,__ver_minor__,__ver_patch__,__ver_sub__)
 __version__ = "%d.%d.%d%s" % __ver_tuple__
 
 
+import os
+import stat
+import errno
 from StringIO import StringIO
 import urllib2
 import urlparse
 import tempfile
+import time
+import weakref
+import threading
+import Queue
+import bisect
+from collections import deque, OrderedDict
 
 
 class NotReadableError(IOError):
@@ -161,12 +175,28 @@ class FileLikeBase(object):
     
     """
     
-    def __init__(self,bufsize=1024*64):
+    #  Capabilities decoded from the mode string, so that they needn't be
+    #  re-parsed on every call.  The defaults correspond to mode "r+", which
+    #  is assumed when there is no 'mode' attribute.
+    _readable = True     # file may be read from
+    _writable = True     # file may be written to
+    _seekable = True     # file may be read/written at an arbitrary position
+    _streaming = False   # file was opened with the "-" indicator
+    _appending = False   # file was opened in append mode
+
+    #  I/O statistics, collected only when enabled by enable_stats()
+    _stats = None
+
+    def __init__(self,bufsize=1024*64,wbufsize=0):
         """FileLikeBase Constructor.
 
         The optional argument 'bufsize' specifies the number of bytes to
         read at a time when looking for a newline character.  Setting this to
         a larger number when lines are long should improve efficiency.
+
+        The optional argument 'wbufsize' specifies the number of bytes of
+        written data to accumulate before passing it on to _write().  The
+        default of zero passes data through on every call to write().
         """
         # File-like attributes
         self.closed = False
@@ -174,9 +204,36 @@ class FileLikeBase(object):
         # Our own attributes
         self._bufsize = bufsize  # buffer size for chunked reading
         self._rbuffer = None     # data that's been read but not returned
-        self._wbuffer = None     # data that's been given but not written
+        self._rbufpos = 0        # offset of first unreturned byte in _rbuffer
+        self._lines = deque()    # complete lines split out of _rbuffer
+        self._wbuffer = None     # chunks that have been given but not written
+        self._wbuflen = 0        # total size of the chunks in _wbuffer
+        self._wbufsize = wbufsize  # size at which _wbuffer is written out
+        self._wleftover = 0      # size of data left over by last _write()
         self._sbuffer = None     # data between real & apparent file pos
         self._soffset = 0        # internal offset of file pointer
+        self._plock = threading.Lock()  # serialises simulated pread/pwrite
+
+    def _get_mode(self):
+        try:
+            return self._mode
+        except AttributeError:
+            raise AttributeError("mode")
+
+    def _set_mode(self,mode):
+        (self._readable,self._writable,self._seekable,self._streaming,
+         self._appending) = _decode_mode(mode)
+        self._mode = mode
+
+    def _del_mode(self):
+        del self._mode
+        del self._readable
+        del self._writable
+        del self._seekable
+        del self._streaming
+        del self._appending
+
+    mode = property(_get_mode,_set_mode,_del_mode)
 
     def _check_mode(self,mode,mstr=None):
         """Check whether the file may be accessed in the given mode.
@@ -192,20 +249,17 @@ class FileLikeBase(object):
         second argument.
         """
         if mstr is None:
-            try:
-                mstr = self.mode
-            except AttributeError:
-                mstr = "r+"
-        if "+" in mstr:
-            return True
-        if "-" in mstr and "-" not in mode:
-            return False    
-        if "r" in mode:
-            if "r" not in mstr:
-                return False    
-        if "w" in mode:
-            if "w" not in mstr and "a" not in mstr:
-                return False
+            readable = self._readable
+            writable = self._writable
+            seekable = self._seekable
+        else:
+            (readable,writable,seekable,_,_) = _decode_mode(mstr)
+        if not seekable and "-" not in mode:
+            return False
+        if not readable and "r" in mode:
+            return False
+        if not writable and "w" in mode:
+            return False
         return True
         
     def _assert_mode(self,mode,mstr=None):
@@ -215,34 +269,32 @@ class FileLikeBase(object):
         instead of returning False.
         """
         if mstr is None:
-            try:
-                mstr = self.mode
-            except AttributeError:
-                mstr = "r+"
-        if "+" in mstr:
-            return True
-        if "-" in mstr and "-" not in mode:
+            readable = self._readable
+            writable = self._writable
+            seekable = self._seekable
+        else:
+            (readable,writable,seekable,_,_) = _decode_mode(mstr)
+        if not seekable and "-" not in mode:
             raise NotSeekableError("File does not support seeking.")
-        if "r" in mode:
-            if "r" not in mstr:
-                raise NotReadableError("File not opened for reading")
-        if "w" in mode:
-            if "w" not in mstr and "a" not in mstr:
-                raise NotWritableError("File not opened for writing")
+        if not readable and "r" in mode:
+            raise NotReadableError("File not opened for reading")
+        if not writable and "w" in mode:
+            raise NotWritableError("File not opened for writing")
         return True
     
     def flush(self):
         """Flush internal write buffer, if necessary."""
         if self.closed:
             raise IOError("File has been closed")
-        if self._check_mode("w-") and self._wbuffer is not None:
-            buffered = ""
+        if self._writable and self._wbuffer is not None:
+            buffered = self._wbuffer
             if self._sbuffer:
-                buffered = buffered + self._sbuffer
+                buffered.insert(0,self._sbuffer)
                 self._sbuffer = None
-            buffered = buffered + self._wbuffer
             self._wbuffer = None
-            leftover = self._write(buffered,flushing=True)
+            self._wbuflen = 0
+            self._wleftover = 0
+            leftover = self._write("".join(buffered),flushing=True)
             if leftover:
                 raise IOError("Could not flush write buffer.")
     
@@ -259,6 +311,7 @@ class FileLikeBase(object):
         if not self.closed:
             self.flush()
             self.closed = True
+            self._lines.clear()
 
     def __del__(self):
         self.close()
@@ -269,6 +322,49 @@ class FileLikeBase(object):
     def __exit__(self,exc_type,exc_val,exc_tb):
         self.close()
         return False
+
+    def enable_stats(self):
+        """Start collecting I/O statistics for this file.
+
+        Calls to the primitive methods are counted and timed by shadowing
+        them with wrapper functions on the instance, so there is no overhead
+        until this method is called.  Use get_stats() to retrieve the
+        collected statistics.
+        """
+        if self._stats is None:
+            self._stats = _new_stats()
+            for name in _STATS_METHODS:
+                setattr(self,name,_stats_wrapper(self,name))
+
+    def disable_stats(self):
+        """Stop collecting I/O statistics for this file."""
+        if self._stats is not None:
+            for name in _STATS_METHODS:
+                self.__dict__.pop(name,None)
+            self._stats = None
+
+    def get_stats(self):
+        """Get the I/O statistics collected for this file.
+
+        If statistics are not enabled, None is returned.  Otherwise the
+        result is a dictionary with the following keys:
+
+            * read, readinto, write, seek, skip, tell, truncate:
+                  for each primitive method, a dictionary giving the
+                  number of "calls", the number of "bytes" transferred
+                  and the cumulative wall-clock "time" in seconds.
+            * discarded:  bytes read and thrown away to simulate seeks
+            * rbuffer_max:  maximum size of the read buffer
+            * wbuffer_max:  maximum size of the write buffer
+
+        """
+        if self._stats is None:
+            return None
+        _sample_buffers(self)
+        stats = self._stats.copy()
+        for name in _STATS_METHODS:
+            stats[name[1:]] = stats[name[1:]].copy()
+        return stats
     
     def next(self):
         """next() method complying with the iterator protocol.
@@ -276,14 +372,54 @@ class FileLikeBase(object):
         File-like objects are their own iterators, with each call to
         next() returning subsequent lines from the file.
         """
-        ln = self.readline()
+        #  Lines are split out of each buffered chunk in a single pass and
+        #  queued up in self._lines.  They still occupy the read buffer
+        #  until returned, so we need only advance its offset here and
+        #  any other read method can simply discard the queue.
+        lines = self._lines
+        if lines:
+            ln = lines.popleft()
+            self._rbufpos += len(ln)
+            return ln
+        #  Subclasses may override readline() to bypass the read buffer,
+        #  but we need it to be populated here.
+        ln = FileLikeBase.readline(self)
         if ln == "":
             raise StopIteration()
+        end = self._rbuffer.rfind("\n",self._rbufpos) + 1
+        if end:
+            lines.extend(_split_lines(self._rbuffer[self._rbufpos:end]))
         return ln
     
     def __iter__(self):
         return self
 
+    def iterlines(self,batch=False):
+        """Iterate over the lines in the file.
+
+        If 'batch' is false, this is equivalent to iter(self).  If it is
+        true, the iterator yields lists of lines, one list for each chunk
+        of data read from the file.  This avoids much of the per-line
+        overhead when processing a large number of lines.
+        """
+        if not batch:
+            return iter(self)
+        return self._iterbatches()
+
+    def _iterbatches(self):
+        """Private generator implementing iterlines(batch=True)."""
+        while True:
+            #  As in next(), the read buffer must be populated here.
+            ln = FileLikeBase.readline(self)
+            if ln == "":
+                break
+            batch = [ln]
+            end = self._rbuffer.rfind("\n",self._rbufpos) + 1
+            if end:
+                batch.extend(_split_lines(self._rbuffer[self._rbufpos:end]))
+                self._rbufpos = end
+            yield batch
+
     def truncate(self,size=None):
         """Truncate the file to the given size.
 
@@ -291,7 +427,7 @@ class FileLikeBase(object):
         used.  Note that this method may fail at runtime if the underlying
         filelike object is not truncatable.
         """
-        if "-" in getattr(self,"mode",""):
+        if self._streaming:
             raise NotTruncatableError("File is not seekable, can't truncate.")
         if self._wbuffer:
             self.flush()
@@ -303,15 +439,17 @@ class FileLikeBase(object):
         """Move the internal file pointer to the given location."""
         if whence > 2 or whence < 0:
             raise ValueError("Invalid value for 'whence': " + str(whence))
-        if "-" in getattr(self,"mode",""):
+        if self._streaming:
             raise NotSeekableError("File is not seekable.")
         # Ensure that there's nothing left in the write buffer
         if self._wbuffer:
             self.flush()
         # Adjust for any data left in the read buffer
         if whence == 1 and self._rbuffer:
-            offset = offset - len(self._rbuffer)
+            offset = offset - (len(self._rbuffer) - self._rbufpos)
         self._rbuffer = None
+        self._rbufpos = 0
+        self._lines.clear()
         # Adjust for any discrepancy in actual vs apparent seek position
         if whence == 1:
             if self._sbuffer:
@@ -345,22 +483,49 @@ class FileLikeBase(object):
                         raise NotImplementedError
                     sbuf = self._seek(offset,0)
                 except NotImplementedError:
-                    # Simulate by reseting to start
-                    self._seek(0,0)
-                    self._soffset = offset
+                    sbuf = self._simulate_seek(offset)
             finally:
-                self._sbuffer = sbuf
+                if isinstance(sbuf,(int,long)):
+                    self._soffset = sbuf
+                else:
+                    self._sbuffer = sbuf
         except NotReadableError:
             raise NotSeekableError("File not readable, can't simulate seek")
 
+    def _simulate_seek(self,offset):
+        """Private method to simulate an absolute seek to <offset>.
+
+        If the file is read-only and the target is ahead of the current
+        position, we try to skip forward using _skip(), falling back to
+        reading and discarding the intervening data when the file is next
+        read.  Otherwise we must reset to the start of the file and read
+        forward from there; writable files are always reset, since some
+        wrappers (e.g. Translate) can only write contiguously from the start.
+
+        Like _seek(), this may return the data between the actual and
+        apparent positions of the file.
+        """
+        pos = self._tell()
+        if offset >= pos and not self._writable:
+            if offset == pos:
+                return None
+            try:
+                return self._skip(offset - pos)
+            except NotImplementedError:
+                self._soffset = offset - pos
+                return None
+        self._seek(0,0)
+        self._soffset = offset
+        return None
+
     def tell(self):
         """Determine current position of internal file pointer."""
         # Need to adjust for unread/unwritten data in buffers
         pos = self._tell()
         if self._rbuffer:
-            pos = pos - len(self._rbuffer)
+            pos = pos - (len(self._rbuffer) - self._rbufpos)
         if self._wbuffer:
-            pos = pos + len(self._wbuffer)
+            pos = pos + self._wbuflen
         if self._sbuffer:
             pos = pos + len(self._sbuffer)
         if self._soffset:
@@ -376,73 +541,221 @@ class FileLikeBase(object):
         """
         if self.closed:
             raise IOError("File has been closed")
-        self._assert_mode("r-")
+        if not self._readable:
+            raise NotReadableError("File not opened for reading")
         return self._do_read(size)
 
-    def _do_read(self,size):
-        """Private method to read from the file.
+    def readinto(self,b):
+        """Read bytes into the pre-allocated writable buffer 'b'.
 
-        This method behaves the same as self.read(), but skips some
-        permission and sanity checks.  It is intended for use in simulating
-        seek(), where we may want to read (and discard) information from
-        a file not opened in read mode.
+        This method fills 'b' (e.g. a bytearray or memoryview) with data
+        from the file and returns the number of bytes read, which will be
+        less than len(b) only if EOF is encountered.  Subclasses providing
+        the _readinto() primitive can fill the buffer without creating
+        any intermediate strings.
+        """
+        if self.closed:
+            raise IOError("File has been closed")
+        if not self._readable:
+            raise NotReadableError("File not opened for reading")
+        return self._do_readinto(b)
+
+    def pread(self,offset,size):
+        """Read at most 'size' bytes starting at the given offset.
+
+        The file's current position is not changed.  If the class provides
+        the _pread() primitive this is safe to call from several threads
+        at once; otherwise it is simulated by seeking and reading with a
+        per-file lock held, which serialises it against other calls to
+        pread() and pwrite() but not against ordinary reads.
+        """
+        if self.closed:
+            raise IOError("File has been closed")
+        if not self._readable:
+            raise NotReadableError("File not opened for reading")
+        if not self._seekable:
+            raise NotSeekableError("File is not seekable.")
+        if self._wbuffer:
+            self.flush()
+        try:
+            data = self._pread(offset,size)
+        except NotImplementedError:
+            self._plock.acquire()
+            try:
+                pos = self.tell()
+                self.seek(offset)
+                data = self.read(size)
+                self.seek(pos)
+            finally:
+                self._plock.release()
+            return data
+        # Short reads are allowed from _pread(), so keep going until EOF
+        if len(data) < size and data != "":
+            chunks = [data]
+            nread = len(data)
+            while nread < size:
+                data = self._pread(offset + nread,size - nread)
+                if data == "":
+                    break
+                chunks.append(data)
+                nread += len(data)
+            data = "".join(chunks)
+        return data
 
-        Note that this may still fail if the file object actually can't
-        be read from - it just won't check whether the mode string gives
-        permission.
+    def _sync_read_position(self):
+        """Private method to prepare the file for reading.
+
+        This ensures that the file's actual position is consistent with
+        its apparent position, flushing any pending writes and discarding
+        any data that should have been seeked over.
         """
+        # Lines queued up by next() are still in the read buffer
+        if self._lines:
+            self._lines.clear()
         # If we were previously writing, ensure position is correct
         if self._wbuffer is not None:
             self.seek(0,1)
+        # Streamed files can't have seeked, so there's nothing to discard
+        if self._streaming:
+            return
         # Discard any data that should have been seeked over
         if self._sbuffer:
             s = len(self._sbuffer)
             self._sbuffer = None
-            self.read(s)
+            self._discard(s)
         elif self._soffset:
             s = self._soffset
             self._soffset = 0
-            while s > self._bufsize:
-                self._do_read(self._bufsize)
-                s -= self._bufsize
-            self._do_read(s)
+            self._discard(s)
+
+    def _discard(self,size):
+        """Private method to read and discard <size> bytes from the file.
+
+        Data is read directly using _read() and thrown away, without
+        building up any output strings.  If _read() returns more data
+        than was needed, the excess is kept in the read buffer.
+        """
+        total = size
+        while size > 0:
+            data = self._read(min(size,self._bufsize))
+            if data is None:
+                break
+            if len(data) > size:
+                self._rbuffer = data
+                self._rbufpos = size
+                size = 0
+                break
+            size -= len(data)
+        if self._stats is not None:
+            self._stats["discarded"] += total - size
+
+    def _do_read(self,size):
+        """Private method to read from the file.
+
+        This method behaves the same as self.read(), but skips some
+        permission and sanity checks.  It is intended for use in simulating
+        seek(), where we may want to read (and discard) information from
+        a file not opened in read mode.
+
+        Note that this may still fail if the file object actually can't
+        be read from - it just won't check whether the mode string gives
+        permission.
+        """
+        self._sync_read_position()
+        rbuffer = self._rbuffer
+        rbufpos = self._rbufpos
+        if rbuffer:
+            available = len(rbuffer) - rbufpos
+        else:
+            available = 0
         # Should the entire file be read?
         if size <= 0:
-            if self._rbuffer:
-                data = [self._rbuffer]
+            if available:
+                data = [rbuffer[rbufpos:]]
             else:
                 data = []
             self._rbuffer = ""
+            self._rbufpos = 0
             newData = self._read()
             while newData is not None:
                 data.append(newData)
                 newData = self._read()
             output = "".join(data)
-        # Otherwise, we need to return a specific amount of data
+        # Can the request be satisfied from the buffer alone?
+        elif available >= size:
+            self._rbufpos = rbufpos + size
+            output = rbuffer[rbufpos:rbufpos+size]
+        # Otherwise, we need to read a specific amount of data
         else:
-            if self._rbuffer:
-                newData = self._rbuffer
-                data = [newData]
+            if available:
+                data = [rbuffer[rbufpos:]]
             else:
-                newData = ""
                 data = []
-            sizeSoFar = len(newData)
+            sizeSoFar = available
+            self._rbuffer = ""
+            self._rbufpos = 0
             while sizeSoFar < size:
                 newData = self._read(size-sizeSoFar)
                 if newData is None:
                     break
                 data.append(newData)
                 sizeSoFar += len(newData)
-            data = "".join(data)
             if sizeSoFar > size:
-                # read too many bytes, store in the buffer
-                self._rbuffer = data[size:]
-                data = data[:size]
-            else:
-                self._rbuffer = ""
-            output = data
+                # Read too many bytes; keep the final chunk as the buffer,
+                # with its unreturned data starting at the appropriate offset.
+                lastData = data[-1]
+                keep = len(lastData) - (sizeSoFar - size)
+                data[-1] = lastData[:keep]
+                self._rbuffer = lastData
+                self._rbufpos = keep
+            output = "".join(data)
         return output
 
+    def _do_readinto(self,b):
+        """Private method to read from the file into a buffer.
+
+        This method behaves the same as self.readinto(), but skips some
+        permission and sanity checks in the manner of _do_read().
+        """
+        self._sync_read_position()
+        mv = memoryview(b)
+        size = len(mv)
+        n = 0
+        # Use up any data left in the read buffer
+        if self._rbuffer:
+            rbufpos = self._rbufpos
+            n = min(size,len(self._rbuffer) - rbufpos)
+            mv[:n] = self._rbuffer[rbufpos:rbufpos+n]
+            self._rbufpos = rbufpos + n
+        else:
+            self._rbuffer = ""
+            self._rbufpos = 0
+        # Read directly into the buffer if the primitive is available,
+        # falling back to _read() and copying the data in.
+        use_readinto = _prefers_readinto(self.__class__)
+        while n < size:
+            nread = None
+            if use_readinto:
+                try:
+                    nread = self._readinto(mv[n:])
+                except NotImplementedError:
+                    use_readinto = False
+            if not use_readinto:
+                data = self._read(size-n)
+                if data is not None:
+                    nread = len(data)
+                    if nread > size - n:
+                        nread = size - n
+                        self._rbuffer = data
+                        self._rbufpos = nread
+                        mv[n:] = data[:nread]
+                    else:
+                        mv[n:n+nread] = data
+            if nread is None:
+                break
+            n += nread
+        return n
+
     def _do_read_rest(self):
         """Private method to read the file through to EOF."""
         data = self._do_read(self._bufsize)
@@ -451,33 +764,43 @@ class FileLikeBase(object):
         
     def readline(self,size=-1):
         """Read a line from the file, or at most <size> bytes."""
+        if self.closed:
+            raise IOError("File has been closed")
+        if not self._readable:
+            raise NotReadableError("File not opened for reading")
+        self._sync_read_position()
+        if self._rbuffer is None:
+            self._rbuffer = ""
+            self._rbufpos = 0
         bits = []
-        indx = -1
         sizeSoFar = 0
-        while indx == -1:
-            nextBit = self.read(self._bufsize)
-            bits.append(nextBit)
-            sizeSoFar += len(nextBit)
-            if nextBit == "":
+        while True:
+            # Look for a newline in the unreturned portion of the buffer,
+            # and consume everything up to and including it.
+            rbuffer = self._rbuffer
+            rbufpos = self._rbufpos
+            indx = rbuffer.find("\n",rbufpos)
+            if indx == -1:
+                end = len(rbuffer)
+            else:
+                end = indx + 1
+            if size > 0 and sizeSoFar + (end - rbufpos) > size:
+                end = rbufpos + (size - sizeSoFar)
+                indx = -1
+            if end > rbufpos:
+                bits.append(rbuffer[rbufpos:end])
+                sizeSoFar += end - rbufpos
+                self._rbufpos = end
+            if indx != -1:
                 break
             if size > 0 and sizeSoFar >= size:
                 break
-            indx = nextBit.find("\n")
-        # If not found, return whole string up to <size> length
-        # Any leftovers are pushed onto front of buffer
-        if indx == -1:
-            data = "".join(bits)
-            if size > 0 and sizeSoFar > size:
-                extra = data[size:]
-                data = data[:size]
-                self._rbuffer = extra + self._rbuffer
-            return data
-        # If found, push leftovers onto front of buffer
-        # Add one to preserve the newline in the return value
-        indx += 1
-        extra = bits[-1][indx:]
-        bits[-1] = bits[-1][:indx]
-        self._rbuffer = extra + self._rbuffer
+            # Refill the buffer with the next chunk of data
+            newData = self._read(self._bufsize)
+            if newData is None:
+                break
+            self._rbuffer = newData
+            self._rbufpos = 0
         return "".join(bits)
     
     def readlines(self,sizehint=-1):
@@ -492,7 +815,8 @@ class FileLikeBase(object):
         """Write the given string to the file."""
         if self.closed:
             raise IOError("File has been closed")
-        self._assert_mode("w-")
+        if not self._writable:
+            raise NotWritableError("File not opened for writing")
         # If we were previously reading, ensure position is correct
         if self._rbuffer is not None:
             self.seek(0,1)
@@ -504,23 +828,86 @@ class FileLikeBase(object):
         elif self._soffset:
             s = self._soffset
             self._soffset = 0
+            # The gap is rewritten from the start of the file, but a
+            # forward seek may have left us part way along it.
+            pos = self._tell()
+            if pos:
+                self.seek(0,0)
+                s += pos
             try:
                 string = self._do_read(s) + string
             except NotReadableError:
                 raise NotSeekableError("File not readable, could not complete simulation of seek")
             self.seek(0,0)
+        wbuffer = self._wbuffer
+        if wbuffer is None:
+            wbuffer = self._wbuffer = []
+        if string:
+            wbuffer.append(string)
+            self._wbuflen += len(string)
+        # Pass the data on once enough has accumulated.  If the last call
+        # to _write() returned leftovers, wait until the buffer has at
+        # least doubled in size so that many small writes don't result
+        # in quadratic copying of the leftover data.
+        wbuflen = self._wbuflen
+        if wbuflen >= self._wbufsize and wbuflen >= 2 * self._wleftover:
+            if len(wbuffer) == 1:
+                string = wbuffer[0]
+            else:
+                string = "".join(wbuffer)
+            self._wbuffer = []
+            self._wbuflen = self._wleftover = 0
+            leftover = self._write(string)
+            if leftover:
+                self._wbuffer.append(leftover)
+                self._wbuflen = self._wleftover = len(leftover)
+    
+    def pwrite(self,offset,data):
+        """Write the given string starting at the given offset.
+
+        The file's current position is not changed.  As with pread(), this
+        is simulated using seek() and write() under a per-file lock if the
+        class does not provide the _pwrite() primitive.
+        """
+        if self.closed:
+            raise IOError("File has been closed")
+        if not self._writable:
+            raise NotWritableError("File not opened for writing")
+        if not self._seekable:
+            raise NotSeekableError("File is not seekable.")
         if self._wbuffer:
-            string = self._wbuffer + string
-        leftover = self._write(string)
-        if leftover is None:
-            self._wbuffer = ""
+            self.flush()
+        try:
+            self._pwrite(offset,data)
+        except NotImplementedError:
+            self._plock.acquire()
+            try:
+                pos = self.tell()
+                self.seek(offset)
+                self.write(data)
+                self.seek(pos)
+            finally:
+                self._plock.release()
         else:
-            self._wbuffer = leftover
-    
+            # Anything buffered for reading may now be out of date
+            if self._rbuffer:
+                self.seek(0,1)
+
     def writelines(self,seq):
         """Write a sequence of lines to the file."""
+        #  Join the lines into reasonably-sized batches, rather than
+        #  going through the full write() machinery for each one.
+        batch = []
+        size = 0
         for ln in seq:
-            self.write(ln)
+            batch.append(ln)
+            size += len(ln)
+            if size >= self._bufsize:
+                self.write("".join(batch))
+                batch = []
+                size = 0
+        if batch:
+            self.write("".join(batch))
     
     def _read(self,sizehint=-1):
         """Read approximately <sizehint> bytes from the file-like object.
@@ -542,6 +929,24 @@ class FileLikeBase(object):
         """
         raise NotReadableError("Object not readable")
     
+    def _readinto(self,b):
+        """Read up to len(<b>) bytes from the file-like object into <b>.
+
+        This method may be implemented by subclasses that can read data
+        directly into a writable buffer such as a bytearray or memoryview.
+        It should fill as much of <b> as is convenient and return the number
+        of bytes that were read, which may be zero if no data is yet
+        available.  Like _read(), it must return None to signify EOF.
+
+        If this method is not implemented, or raises NotImplementedError,
+        the higher-level methods will fall back to calling _read() and
+        copying the data into the buffer.  It will also be ignored if a
+        subclass overrides _read() without overriding this method, since
+        the inherited implementation may not be consistent with the
+        subclass's reading behaviour.
+        """
+        raise NotImplementedError
+
     def _write(self,string,flushing=False):
         """Write the given string to the file-like object.
         
@@ -566,6 +971,9 @@ class FileLikeBase(object):
         not possible to position the pointer exactly at the given offset,
         it should be positioned at a convenient *smaller* offset and the
         file data between the real and apparent position should be returned.
+        If that data is better read when it's needed, the number of bytes
+        between the two positions may be returned instead; they will be
+        read and discarded when the file is next read.
 
         At minimum, this method must implement the ability to seek to
         the start of the file, i.e. offset=0 and whence=0.  If more
@@ -575,6 +983,47 @@ class FileLikeBase(object):
         """
         raise NotSeekableError("Object not seekable")
 
+    def _skip(self,size):
+        """Move the file's internal position pointer <size> bytes forward.
+
+        This method may be implemented by subclasses that can move forward
+        through the file more cheaply than by reading the intervening data,
+        and will be used to simulate forward seeks when _seek() raises
+        NotImplementedError.  It follows the same conventions as _seek(),
+        and may position the pointer at a convenient smaller offset and
+        return the data between the real and apparent position.
+
+        If this method is not implemented, or raises NotImplementedError,
+        forward seeks are simulated by reading and discarding data.
+        """
+        raise NotImplementedError
+
+    def _pread(self,offset,size):
+        """Read approximately <size> bytes starting at <offset>.
+
+        This method may be implemented by subclasses that can read from an
+        arbitrary position without using the file's position pointer, and
+        must be safe to call from several threads at once.  Like _read(),
+        it may return fewer bytes than requested, but must return the empty
+        string only at EOF.
+
+        If this method is not implemented, pread() is simulated by seeking
+        and reading.
+        """
+        raise NotImplementedError
+
+    def _pwrite(self,offset,data):
+        """Write the string <data> starting at <offset>.
+
+        This method may be implemented by subclasses that can write to an
+        arbitrary position without using the file's position pointer.
+        Unlike _write(), all of the data must be written.
+
+        If this method is not implemented, pwrite() is simulated by seeking
+        and writing.
+        """
+        raise NotImplementedError
+
     def _tell(self):
         """Get the location of the file's internal position pointer.
 
@@ -601,6 +1050,127 @@ class FileLikeBase(object):
         """
         raise NotTruncatableError("Object not truncatable")
 
+    def _raw_region(self,offset):
+        """Locate the data at <offset> within a real OS-level file.
+
+        This method may be implemented by subclasses whose contents are
+        stored verbatim in a real file, and is used by copy() to transfer
+        data using sendfile() or splice().  It must return a tuple
+        (fileobj,offset,size) giving an object with a fileno() method,
+        the corresponding offset in that file and the number of bytes
+        available from there (or None if unlimited).  If this is not
+        possible, None is returned.
+        """
+        return None
+
+
+def _decode_mode(mstr):
+    """Decode a mode string into a tuple of capability flags.
+
+    The flags returned are (readable,writable,seekable,streaming,appending),
+    following the rules documented in the FileLikeBase class.
+    """
+    plus = ("+" in mstr)
+    streaming = ("-" in mstr)
+    readable = plus or ("r" in mstr)
+    writable = plus or ("w" in mstr) or ("a" in mstr)
+    seekable = plus or not streaming
+    appending = ("a" in mstr)
+    return (readable,writable,seekable,streaming,appending)
+
+
+def _split_lines(data):
+    """Split a string of complete, newline-terminated lines into a list."""
+    #  str.splitlines() is fastest, but also splits on carriage returns.
+    if "\r" not in data:
+        return data.splitlines(True)
+    return [ln + "\n" for ln in data[:-1].split("\n")]
+
+
+_readinto_cache = {}
+
+def _prefers_readinto(cls):
+    """Check whether instances of 'cls' should read using _readinto().
+
+    This is the case if the class provides a _readinto() method at least
+    as specific as its _read() method, i.e. it does not inherit _readinto()
+    from a class whose _read() behaviour it has since overridden.
+    """
+    try:
+        return _readinto_cache[cls]
+    except KeyError:
+        prefers = False
+        for c in cls.__mro__:
+            if "_readinto" in c.__dict__:
+                prefers = (c is not FileLikeBase)
+                break
+            if "_read" in c.__dict__:
+                break
+        _readinto_cache[cls] = prefers
+        return prefers
+
+
+#  Primitive methods that are counted and timed when stats are enabled
+_STATS_METHODS = ("_read","_readinto","_write","_seek","_skip","_tell",
+                  "_truncate")
+
+def _new_stats():
+    """Create an empty dictionary of I/O statistics."""
+    stats = {"discarded":0,"rbuffer_max":0,"wbuffer_max":0}
+    for name in _STATS_METHODS:
+        stats[name[1:]] = {"calls":0,"bytes":0,"time":0.0}
+    return stats
+
+def _sample_buffers(fileobj):
+    """Update the buffer high-water marks in the stats for 'fileobj'."""
+    stats = fileobj._stats
+    if fileobj._rbuffer:
+        if len(fileobj._rbuffer) > stats["rbuffer_max"]:
+            stats["rbuffer_max"] = len(fileobj._rbuffer)
+    if fileobj._wbuflen > stats["wbuffer_max"]:
+        stats["wbuffer_max"] = fileobj._wbuflen
+
+def _stats_wrapper(fileobj,name):
+    """Make a function counting and timing calls to primitive 'name'.
+
+    The returned function is intended to shadow the method on the instance.
+    It holds only a weak reference to 'fileobj', so as not to create a
+    reference cycle that would stop the file being closed by __del__.
+    """
+    method = getattr(type(fileobj),name)
+    ref = weakref.ref(fileobj)
+    counts = fileobj._stats[name[1:]]
+    def wrapper(*args,**kwds):
+        fileobj = ref()
+        _sample_buffers(fileobj)
+        start = time.time()
+        try:
+            result = method(fileobj,*args,**kwds)
+        finally:
+            counts["time"] += time.time() - start
+            counts["calls"] += 1
+        if name == "_read":
+            #  Data returned by _read() is held in the read buffer until
+            #  it's needed, so this is also the time to sample its size.
+            if result:
+                counts["bytes"] += len(result)
+                if len(result) > fileobj._stats["rbuffer_max"]:
+                    fileobj._stats["rbuffer_max"] = len(result)
+        elif name == "_readinto":
+            if result:
+                counts["bytes"] += result
+        elif name == "_write":
+            size = len(args[0])
+            if size > fileobj._stats["wbuffer_max"]:
+                fileobj._stats["wbuffer_max"] = size
+            if result:
+                size -= len(result)
+            counts["bytes"] += size
+        return result
+    wrapper.__name__ = name
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
 
 class Opener(object):
     """Class allowing clever opening of files.
@@ -612,6 +1182,7 @@ class Opener(object):
     as:
         
         * URLs are opened using urllib2
+        * local files are memory-mapped if the mode contains "m"
         * files with names ending in ".gz" are gunzipped on the fly
         * etc...
         
@@ -673,6 +1244,9 @@ def _file_opener(filename,mode):
     comps = urlparse.urlparse(filename)
     if comps[0] and comps[1]:
         return None
+    # Memory-map the file if requested
+    if "m" in mode:
+        return MmapFile(filename,mode)
     return file(filename,mode)
 
 open = Opener(openers=(_urllib_opener,_file_opener))
@@ -695,13 +1269,15 @@ def is_filelike(obj,mode="rw"):
     simpler to (a) catch the AttributeError, or (b) use to_filelike(obj)
     to ensure a suitable object.
     """
-    # Check reading interface
+    # Check reading interface.  The primitive methods of FileLikeBase
+    # subclasses are looked up on the class, as enable_stats() shadows
+    # them on the instance with plain functions.
     if "r" in mode:
         # Special-case for FileLikeBase subclasses
         if isinstance(obj,FileLikeBase):
             if not hasattr(obj,"_read"):
                 return False
-            if obj._read.im_class is FileLikeBase:
+            if type(obj)._read.im_class is FileLikeBase:
                 return False
         else:
             attrs = ("read","readline","readlines","__iter__",)
@@ -714,7 +1290,7 @@ def is_filelike(obj,mode="rw"):
         if isinstance(obj,FileLikeBase):
             if not hasattr(obj,"_write"):
                 return False
-            if obj._write.im_class is FileLikeBase:
+            if type(obj)._write.im_class is FileLikeBase:
                 return False
         else:
             attrs = ("write","writelines","close")
@@ -726,7 +1302,7 @@ def is_filelike(obj,mode="rw"):
         if isinstance(obj,FileLikeBase):
             if not hasattr(obj,"_seek"):
                 return False
-            if obj._seek.im_class is FileLikeBase:
+            if type(obj)._seek.im_class is FileLikeBase:
                 return False
         else:
             attrs = ("seek","tell",)
@@ -744,36 +1320,91 @@ class join(FileLikeBase):
     (so long as the underlying files permit those operations, of course).
 
     When reading, data is read from each file in turn until it has been
-    exhausted.  Seeks and tells are calculated using the individual positions
-    of each file.
+    exhausted.  The size of each file is recorded in an index the first
+    time it's needed, so that seeks can jump directly to the correct file
+    and tells don't need to query every file.
 
     When writing, data is spread across each file according to its size,
     and only the last file in the sequence will grow as data is appended.
     This requires that the size of each file can be determined, either by
-    checking for a 'size' attribute or using seek/tell.
+    checking for a 'size' attribute or using seek/tell.  Files other than
+    the last must not change size while the join is in use.
+
+    Instead of a file-like object, each member may be given as a filename
+    or as a callable taking no arguments and returning a file-like object.
+    Such members are opened only when they are first accessed, and if the
+    'max_open' argument is given then at most that many of them are kept
+    open at once; the least recently used are closed, and will be opened
+    again if needed.  The sizes of filename members are found without
+    opening them at all.
+
+    If the 'prefetch' argument is given, a background thread opens that
+    many of the following members while the current one is being read,
+    and reads up to 'prefetch_bytes' bytes in total from the start of them.
+    This hides the latency of opening and decoding each member during
+    sequential reads.  Members being prefetched are not closed by the
+    'max_open' limit until they have been reached.
     """
 
-    def __init__(self,files,mode=None):
+    def __init__(self,files,mode=None,max_open=None,prefetch=0,
+                 prefetch_bytes=4*1024*1024):
         """Filelike join constructor.
 
-        This first argument must be a sequence of file-like objects
-        that are to be joined together.  The optional second argument
-        specifies the access mode and can be used e.g. to prevent
-        writing even when the underlying files are writable.
+        This first argument must be a sequence of file-like objects,
+        filenames or file-opening functions that are to be joined together.
+        The optional second argument specifies the access mode and can be
+        used e.g. to prevent writing even when the underlying files are
+        writable.  Filenames are opened for reading only unless a writable
+        mode is given.  The optional third argument limits the number of
+        lazily-opened members that may be open at any one time.
+
+        The 'prefetch' and 'prefetch_bytes' arguments give the number of
+        members to read ahead and the memory to use for doing so.
         """
         super(join,self).__init__()
         if mode:
             self.mode = mode
-        self._files = list(files)
+        if max_open is not None and max_open < 1:
+            raise ValueError("max_open must be at least one")
+        self._members = list(files)
+        self._files = []
+        for f in self._members:
+            if isinstance(f,basestring) or _is_opener(f):
+                self._files.append(None)
+            else:
+                self._files.append(f)
+        if mode and self._writable:
+            self._memberMode = "r+b"
+        else:
+            self._memberMode = "rb"
+        self._maxOpen = max_open
+        self._prefetch = prefetch
+        self._prefetchChunk = max(prefetch_bytes // max(prefetch,1),1)
+        self._prefetched = {}    # _Prefetch objects for following members
+        self._prefetchTasks = None
+        self._pending = None     # prefetched data not yet returned
+        self._lazyOpen = OrderedDict()  # lazily-opened members, LRU order
+        self._memberLock = threading.RLock()
         self._curFile = 0
+        self._starts = None      # offset at which each file begins
+        self._lastSize = None    # size of the last file, which may grow
+        self._pos = None         # cached position within the join
         if mode and "a" in mode:
             self.seek(0,2)
 
     def close(self):
         super(join,self).close()
+        # Let the background thread finish before closing its files
+        if self._prefetchTasks is not None:
+            for entry in self._prefetched.values():
+                entry.done.wait()
+            self._prefetched.clear()
+            self._prefetchTasks.put(None)
+            self._prefetchTasks = None
         for f in self._files:
             if hasattr(f,"close"):
                 f.close()
+        self._lazyOpen.clear()
 
     def flush(self):
         super(join,self).flush()
@@ -781,81 +1412,389 @@ class join(FileLikeBase):
             if hasattr(f,"flush"):
                 f.flush()
 
+    def _get_file(self,idx):
+        """Get the file object for the member at the given index.
+
+        Members given as filenames or functions are opened on demand, and
+        the least recently used of them closed if there are too many.
+        """
+        f = self._files[idx]
+        if f is None:
+            # Opening may be slow, so it's done without holding the lock
+            member = self._members[idx]
+            if isinstance(member,basestring):
+                # Use the builtin, as the sizes of named members are taken
+                # from the filesystem and must match the bytes we read.
+                newf = file(member,self._memberMode)
+            else:
+                newf = member()
+            self._memberLock.acquire()
+            try:
+                f = self._files[idx]
+                if f is None:
+                    f = self._files[idx] = newf
+                    self._lazyOpen[idx] = True
+                    if self._maxOpen is not None:
+                        self._close_cold_members(idx)
+                    return f
+            finally:
+                self._memberLock.release()
+            # Another thread opened it first
+            newf.close()
+        if self._maxOpen is not None and idx in self._lazyOpen:
+            self._memberLock.acquire()
+            try:
+                if self._lazyOpen.pop(idx,None):
+                    self._lazyOpen[idx] = True
+            finally:
+                self._memberLock.release()
+        return f
+
+    def _close_cold_members(self,keep):
+        """Close lazily-opened members until within the 'max_open' limit.
+
+        The member at index 'keep' is never closed, nor are the current
+        member and any being prefetched.
+        """
+        cold = iter(list(self._lazyOpen))
+        while len(self._lazyOpen) > self._maxOpen:
+            try:
+                idx = cold.next()
+            except StopIteration:
+                break
+            if idx in (keep,self._curFile) or idx in self._prefetched:
+                continue
+            del self._lazyOpen[idx]
+            f = self._files[idx]
+            self._files[idx] = None
+            if hasattr(f,"flush"):
+                f.flush()
+            f.close()
+
+    def _member_size(self,idx):
+        """Get the size of the member at the given index."""
+        if self._files[idx] is None:
+            member = self._members[idx]
+            if isinstance(member,basestring):
+                return os.path.getsize(member)
+        return _file_size(self._get_file(idx))
+
+    def _member_starts(self):
+        """Get the offset at which each file in the join begins.
+
+        Only the last file can change size, so these are calculated once
+        and then cached.
+        """
+        starts = self._starts
+        if starts is None:
+            self._wait_prefetch()
+            self._memberLock.acquire()
+            try:
+                starts = [0]
+                for idx in xrange(len(self._files) - 1):
+                    starts.append(starts[-1] + self._member_size(idx))
+                self._starts = starts
+            finally:
+                self._memberLock.release()
+        return starts
+
+    def _total_size(self):
+        """Get the total size of the joined files."""
+        if self._lastSize is None:
+            self._lastSize = self._member_size(len(self._files) - 1)
+        return self._member_starts()[-1] + self._lastSize
+
+    def _advance(self):
+        """Move on to the start of the next file in the join."""
+        self._curFile += 1
+        entry = self._prefetched.pop(self._curFile,None)
+        if entry is None:
+            self._get_file(self._curFile).seek(0,0)
+        else:
+            # The file is left positioned after the prefetched data
+            entry.done.wait()
+            if entry.error is not None:
+                self._get_file(self._curFile).seek(0,0)
+                raise entry.error
+            if entry.data:
+                self._pending = entry.data
+
+    def _schedule_prefetch(self):
+        """Start reading ahead from the members following the current one."""
+        if self._prefetchTasks is None:
+            self._prefetchTasks = Queue.Queue()
+            t = threading.Thread(target=_prefetch_worker,
+                                 args=(weakref.ref(self),self._prefetchTasks))
+            t.setDaemon(True)
+            t.start()
+        last = min(self._curFile + self._prefetch,len(self._files) - 1)
+        for idx in xrange(self._curFile + 1,last + 1):
+            if idx not in self._prefetched:
+                entry = self._prefetched[idx] = _Prefetch(idx)
+                self._prefetchTasks.put(entry)
+
+    def _wait_prefetch(self):
+        """Wait until the background thread is not using any members."""
+        for entry in self._prefetched.values():
+            entry.done.wait()
+
+    def _stop_prefetch(self):
+        """Discard all prefetched data, restoring the file positions."""
+        self._wait_prefetch()
+        self._prefetched.clear()
+        if self._pending is not None:
+            pos = self._tell()
+            self._pending = None
+            offset = pos - self._member_starts()[self._curFile]
+            self._get_file(self._curFile).seek(offset,0)
+
     def _read(self,sizehint=-1):
-        data = self._files[self._curFile].read(sizehint)
-        if data == "":
+        if self._prefetch:
+            self._schedule_prefetch()
+        data = self._pending
+        if data is not None:
+            self._pending = None
+        else:
+            data = self._get_file(self._curFile).read(sizehint)
+        while data == "":
             if self._curFile == len(self._files) - 1:
                 return None
+            self._advance()
+            data = self._pending
+            if data is not None:
+                self._pending = None
             else:
-                self._curFile += 1
-                return self._read(sizehint)
+                data = self._get_file(self._curFile).read(sizehint)
+        if self._pos is not None:
+            self._pos += len(data)
+        return data
+
+    def _readinto(self,b):
+        if self._prefetch:
+            self._schedule_prefetch()
+        n = self._readinto_member(b)
+        while n is None:
+            if self._curFile == len(self._files) - 1:
+                return None
+            self._advance()
+            n = self._readinto_member(b)
+        if self._pos is not None:
+            self._pos += n
+        return n
+
+    def _readinto_member(self,b):
+        """Read into the given buffer from the current member."""
+        data = self._pending
+        if data is None:
+            f = self._get_file(self._curFile)
+            return filelike.wrappers._readinto_fileobj(f,b)
+        n = min(len(data),len(b))
+        b[:n] = data[:n]
+        if n < len(data):
+            self._pending = data[n:]
         else:
-            return data
+            self._pending = None
+        return n
 
     def _write(self,data,flushing=False):
-        cf = self._files[self._curFile]
-        # If we're at the last file, just write it all out
-        if self._curFile == len(self._files) - 1:
-            cf.write(data)
-            return None
-        # Otherwise, we may need to write into multiple files
-        pos = cf.tell()
-        try:
-            size = cf.size
-        except AttributeError:
-            cf.seek(0,2)
-            size = cf.tell()
-            cf.seek(pos,0)
-        # If the data will all fit in the current file, just write it
-        gap = size - pos
-        if gap >= len(data):
-            cf.write(data)
-            return None
-        # Otherwise, split up the data and recurse
-        cf.write(data[:gap])
-        self._curFile += 1
-        return self._write(data[gap:],flushing=flushing)
+        if self._pending is not None or self._prefetched:
+            self._stop_prefetch()
+        pos = self._tell()
+        while True:
+            cf = self._get_file(self._curFile)
+            # If we're at the last file, just write it all out
+            if self._curFile == len(self._files) - 1:
+                cf.write(data)
+                self._pos = pos = pos + len(data)
+                if self._lastSize is not None:
+                    end = pos - self._member_starts()[-1]
+                    self._lastSize = max(self._lastSize,end)
+                return None
+            # If the data will all fit in the current file, just write it
+            gap = self._member_starts()[self._curFile+1] - pos
+            if gap >= len(data):
+                cf.write(data)
+                self._pos = pos + len(data)
+                return None
+            # Otherwise, write what fits and move on to the next file
+            cf.write(data[:gap])
+            self._pos = pos = pos + gap
+            data = data[gap:]
+            self._advance()
 
     def _seek(self,offset,whence):
-        # Seek-from-end simulated using seek-to-end, then relative seek.
-        if whence == 2:
-            for f in self._files[self._curFile:]:
-                f.seek(0,2)
-            self._curFile = len(self._files)-1
-            self._seek(offset,1)
-        # Absolute seek simulated using tell() and relative seek.
-        elif whence == 0:
-            offset = offset - self._tell()
-            self._seek(offset,1)
-        # Relative seek
-        elif whence == 1:
-            # Working backwards, we simply rewind each file until
-            # the offset is small enough to be within the current file
-            if offset < 0:
-                off1 = self._files[self._curFile].tell()
-                while off1 < -1*offset:
-                    offset += off1
-                    self._files[self._curFile].seek(0,0)
-                    # If seeking back past start of first file, stop at zero
-                    if self._curFile == 0:
-                        return None
-                    self._curFile -= 1
-                    off1 = self._files[self._curFile].tell()
-                self._files[self._curFile].seek(offset,1)
-            # Working forwards, we wind each file forward to its end,
-            # then seek backwards once we've gone too far.
-            elif offset > 0:
-                offset += self._files[self._curFile].tell()
-                self._files[self._curFile].seek(0,2)
-                offset -= self._files[self._curFile].tell()
-                while offset > 0:
-                    self._curFile += 1
-                    self._files[self._curFile].seek(0,2)
-                    offset -= self._files[self._curFile].tell()
-                self.seek(offset,1)
+        if whence == 1:
+            offset += self._tell()
+        elif whence == 2:
+            offset += self._total_size()
+        if self._pending is not None or self._prefetched:
+            self._pending = None
+            self._wait_prefetch()
+            self._prefetched.clear()
+        # Seeking back past the start of the first file stops at zero
+        offset = max(offset,0)
+        starts = self._member_starts()
+        idx = bisect.bisect_right(starts,offset) - 1
+        self._curFile = idx
+        self._get_file(idx).seek(offset - starts[idx],0)
+        self._pos = offset
 
     def _tell(self):
-        return sum([f.tell() for f in self._files[:self._curFile+1]])
+        if self._pos is None:
+            starts = self._member_starts()
+            self._pos = starts[self._curFile]
+            self._pos += self._get_file(self._curFile).tell()
+            if self._pending is not None:
+                self._pos -= len(self._pending)
+        return self._pos
+
+    def _pread(self,offset,size):
+        starts = self._member_starts()
+        self._wait_prefetch()
+        # Members may be closed by other threads when the pool is bounded
+        if self._maxOpen is not None:
+            self._memberLock.acquire()
+        try:
+            idx = bisect.bisect_right(starts,offset) - 1
+            while idx < len(self._files):
+                f = self._get_file(idx)
+                data = filelike.wrappers._pread_fileobj(f,offset-starts[idx],
+                                                        size)
+                if data:
+                    return data
+                idx += 1
+                if idx < len(self._files):
+                    offset = starts[idx]
+            return ""
+        finally:
+            if self._maxOpen is not None:
+                self._memberLock.release()
+
+    def _pwrite(self,offset,data):
+        starts = self._member_starts()
+        if self._pending is not None or self._prefetched:
+            self._stop_prefetch()
+        if self._maxOpen is not None:
+            self._memberLock.acquire()
+        try:
+            self._pwrite_members(starts,offset,data)
+        finally:
+            if self._maxOpen is not None:
+                self._memberLock.release()
+
+    def _pwrite_members(self,starts,offset,data):
+        """Write data at the given offset, spreading it across members."""
+        idx = bisect.bisect_right(starts,offset) - 1
+        while data:
+            f = self._get_file(idx)
+            if idx == len(self._files) - 1:
+                gap = len(data)
+                if self._lastSize is not None:
+                    end = offset - starts[idx] + len(data)
+                    self._lastSize = max(self._lastSize,end)
+            else:
+                gap = starts[idx+1] - offset
+            filelike.wrappers._pwrite_fileobj(f,offset-starts[idx],data[:gap])
+            data = data[gap:]
+            offset += gap
+            idx += 1
+
+    def window(self,start=0,length=None):
+        """Get a read-only view of a region of the file.
+
+        This requires each file in the join to provide a window() method,
+        as MmapFile does.  If the region lies within a single file, its
+        view is returned without copying any data; otherwise the views
+        are copied together into a single buffer.
+        """
+        if self._wbuffer:
+            self.flush()
+        if length is None:
+            end = None
+        else:
+            end = start + length
+        starts = self._member_starts()
+        views = []
+        idx = max(bisect.bisect_right(starts,start) - 1,0)
+        while idx < len(self._files):
+            offset = starts[idx]
+            if end is not None and offset >= end:
+                break
+            fstart = max(start - offset,0)
+            if end is None:
+                flen = None
+            else:
+                flen = end - offset - fstart
+            f = self._get_file(idx)
+            try:
+                views.append(f.window(fstart,flen))
+            except AttributeError:
+                raise IOError("File does not support windows: %s" % (f,))
+            idx += 1
+        if len(views) == 1:
+            return views[0]
+        data = bytearray()
+        for v in views:
+            data += v
+        return filelike.mmapfile._view(data,0,len(data))
+
+
+class _Prefetch(object):
+    """Data read ahead from a member of a join by a background thread."""
+
+    def __init__(self,idx):
+        self.idx = idx
+        self.data = None
+        self.error = None
+        self.done = threading.Event()
+
+
+def _prefetch_worker(ref,tasks):
+    """Background thread for prefetching join members.
+
+    Only a weak reference to the join is held between tasks, so that it
+    can still be closed when garbage-collected.
+    """
+    while True:
+        entry = tasks.get()
+        if entry is None:
+            return
+        fileobj = ref()
+        if fileobj is None:
+            return
+        try:
+            try:
+                f = fileobj._get_file(entry.idx)
+                f.seek(0,0)
+                entry.data = f.read(fileobj._prefetchChunk)
+            except Exception, e:
+                entry.error = e
+        finally:
+            entry.done.set()
+            del fileobj
+
+
+def _is_opener(f):
+    """Check whether a join member is a function for opening a file."""
+    if not callable(f):
+        return False
+    return not (hasattr(f,"read") or hasattr(f,"write"))
+
+
+def _file_size(f):
+    """Determine the size of the given file-like object.
+
+    The 'size' attribute is used if present, otherwise the size is found
+    by seeking to the end of the file and back again.
+    """
+    try:
+        return f.size
+    except AttributeError:
+        pos = f.tell()
+        f.seek(0,2)
+        size = f.tell()
+        f.seek(pos,0)
+        return size
  
 
 def slice(f,start=0,stop=None,mode=None,resizable=False):
@@ -868,6 +1807,166 @@ def slice(f,start=0,stop=None,mode=None,resizable=False):
     return filelike.wrappers.Slice(f,start,stop,mode,resizable)
 
 
+def copy(src,dst,length=None,chunksize=1024*1024):
+    """Copy data from one file-like object to another.
+
+    Up to 'length' bytes (by default, everything up to EOF) are copied from
+    the current position in 'src' to the current position in 'dst', using
+    the cheapest mechanism available:
+
+        * os.sendfile() or os.splice(), if the data in 'src' is stored in a
+          real file (possibly through a Slice or MmapFile) and 'dst' has a
+          file descriptor
+        * readinto() with a single reusable buffer, if 'src' provides it
+        * read() and write() in chunks of 'chunksize' bytes
+
+    The destination may also be a socket, in which case its sendall()
+    method is used for writing.  A dictionary is returned giving the
+    number of "bytes" copied, the elapsed "seconds" and the "method" used.
+    """
+    start = time.time()
+    if hasattr(dst,"flush"):
+        dst.flush()
+    result = _copy_fd(src,dst,length)
+    if result is not None:
+        (method,nbytes) = result
+    elif hasattr(src,"readinto"):
+        method = "readinto"
+        nbytes = _copy_readinto(src,dst,length,chunksize)
+    else:
+        method = "read"
+        nbytes = _copy_read(src,dst,length,chunksize)
+    return {"bytes": nbytes, "seconds": time.time() - start, "method": method}
+
+
+def _raw_file_region(f,offset):
+    """Locate the data at <offset> in 'f' within a real OS-level file.
+
+    See FileLikeBase._raw_region() for details of the return value.
+    """
+    if isinstance(f,FileLikeBase):
+        return f._raw_region(offset)
+    try:
+        f.fileno()
+        f.seek
+    except (AttributeError,IOError,ValueError):
+        return None
+    return (f,offset,None)
+
+
+def _copy_fd(src,dst,length):
+    """Copy data between file descriptors using sendfile() or splice().
+
+    A tuple (method,nbytes) is returned, or None if neither method can
+    be used to copy between the given objects.
+    """
+    if not hasattr(os,"sendfile") and not hasattr(os,"splice"):
+        return None
+    try:
+        out_fd = dst.fileno()
+        pos = src.tell()
+    except (AttributeError,IOError,ValueError):
+        return None
+    if getattr(src,"closed",False):
+        return None
+    if hasattr(src,"flush"):
+        src.flush()
+    region = _raw_file_region(src,pos)
+    if region is None:
+        return None
+    (raw,offset,size) = region
+    in_fd = raw.fileno()
+    if size is not None and (length is None or size < length):
+        length = size
+    # The destination's position moves as the descriptor is written to,
+    # so seekable destinations will need to be told about it.
+    try:
+        dst_pos = dst.tell()
+    except (AttributeError,IOError,ValueError):
+        dst_pos = None
+    if hasattr(os,"splice") and stat.S_ISFIFO(os.fstat(out_fd).st_mode):
+        method = "splice"
+        def transfer(offset,count):
+            return os.splice(in_fd,out_fd,count,offset_src=offset)
+    elif hasattr(os,"sendfile"):
+        method = "sendfile"
+        def transfer(offset,count):
+            return os.sendfile(out_fd,in_fd,offset,count)
+    else:
+        return None
+    nbytes = 0
+    while length is None or nbytes < length:
+        count = 1024*1024*64
+        if length is not None:
+            count = min(count,length - nbytes)
+        try:
+            sent = transfer(offset + nbytes,count)
+        except OSError, e:
+            # Fall back to copying in python if the descriptors
+            # don't support this method at all.
+            unsupported = (errno.EINVAL,errno.ENOSYS,errno.ENOTSOCK,
+                           getattr(errno,"EOPNOTSUPP",errno.EINVAL))
+            if nbytes == 0 and e.errno in unsupported:
+                return None
+            raise
+        if sent == 0:
+            break
+        nbytes += sent
+    src.seek(pos + nbytes)
+    if dst_pos is not None:
+        dst.seek(dst_pos + nbytes)
+    return (method,nbytes)
+
+
+def _get_writer(dst):
+    """Get a function writing a memoryview to 'dst'.
+
+    Real files and sockets can be given the memoryview directly, but
+    other objects may expect a string.
+    """
+    if not hasattr(dst,"write"):
+        return dst.sendall
+    if hasattr(dst,"fileno"):
+        return dst.write
+    def write(data):
+        dst.write(data.tobytes())
+    return write
+
+
+def _copy_readinto(src,dst,length,chunksize):
+    """Copy data by reading into a single reusable buffer."""
+    buf = bytearray(chunksize)
+    view = memoryview(buf)
+    write = _get_writer(dst)
+    nbytes = 0
+    while length is None or nbytes < length:
+        count = chunksize
+        if length is not None:
+            count = min(count,length - nbytes)
+        n = src.readinto(view[:count])
+        if not n:
+            break
+        write(view[:n])
+        nbytes += n
+    return nbytes
+
+
+def _copy_read(src,dst,length,chunksize):
+    """Copy data by reading and writing large chunks."""
+    write = getattr(dst,"write",None) or dst.sendall
+    nbytes = 0
+    while length is None or nbytes < length:
+        count = chunksize
+        if length is not None:
+            count = min(count,length - nbytes)
+        data = src.read(count)
+        if not data:
+            break
+        write(data)
+        nbytes += len(data)
+    return nbytes
+
+
 def to_filelike(obj,mode="r+"):
     """Convert 'obj' to a file-like object if possible.
     
@@ -912,3 +2011,4 @@ def to_filelike(obj,mode="r+"):
 
 # Imported here to aoid circular imports
 import filelike.wrappers
+from filelike.mmapfile import MmapFile
@@ -0,0 +1,377 @@
+# filelike/benchmarks/__init__.py
+#
+# Copyright (C) 2006-2009, Ryan Kelly
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+#
+"""
+
+    filelike.benchmarks:  performance measurements for file-like objects
+
+This module measures the throughput and per-operation latency of the core
+file-like machinery and of the wrappers in filelike.wrappers.  Plain files
+and StringIO objects are measured as baselines.  It can be run from the
+command line like so:
+
+    python -m filelike.benchmarks [options] [subject ...]
+
+The results are printed as a JSON document, so that runs can be saved and
+compared across versions.  Each subject (a kind of file-like object) is
+measured with each of the following operations:
+
+    * read:      read the whole file in chunks using read(n)
+    * readline:  read the whole file using readline()
+    * iterate:   read the whole file by iterating over its lines
+    * write:     write the whole file in chunks, then close it
+    * seek:      seek to random positions and read a few bytes
+    * truncate:  truncate a freshly-opened file to half its size
+
+Operations that a subject does not support are reported with an "error"
+key rather than timing information.
+
+"""
+
+import os
+import sys
+import time
+import random
+import platform
+import tempfile
+import bz2
+import gzip
+from StringIO import StringIO
+from optparse import OptionParser
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+import filelike
+from filelike import wrappers
+
+
+OPERATIONS = ("read","readline","iterate","write","seek","truncate")
+
+
+class Subject(object):
+    """A kind of file-like object to be benchmarked.
+
+    Instances of this class know how to create a file-like object with
+    given contents and mode, by calling the 'factory' function given in
+    the constructor.
+    """
+
+    def __init__(self,name,factory,blocksize=1,encode=None):
+        """Subject constructor.
+
+        'factory' must be a callable taking the contents and mode of the
+        file to create.  If the subject can only be truncated to multiples
+        of some size, it should be given as 'blocksize'.  If data written
+        to the subject must be in some other form, such as compressed data,
+        'encode' should convert the contents into that form.
+        """
+        self.name = name
+        self.factory = factory
+        self.blocksize = blocksize
+        self.encode = encode
+
+    def make(self,contents,mode):
+        """Create a new file-like object with the given contents and mode."""
+        return self.factory(contents,mode)
+
+
+_temp_paths = []
+
+def _make_file(contents,mode):
+    """Create a plain file with the given contents."""
+    (fd,path) = tempfile.mkstemp()
+    _temp_paths.append(path)
+    os.write(fd,contents)
+    os.close(fd)
+    return open(path,mode.replace("-","") + "b")
+
+def _cleanup_files():
+    """Remove any plain files created by _make_file."""
+    while _temp_paths:
+        try:
+            os.unlink(_temp_paths.pop())
+        except OSError:
+            pass
+
+def _noop(data):
+    return data
+
+def _gzip(data):
+    """Compress data into the gzip file format."""
+    s = StringIO()
+    f = gzip.GzipFile(fileobj=s,mode="wb")
+    f.write(data)
+    f.close()
+    return s.getvalue()
+
+def _make_join(contents,mode):
+    """Create a join of eight equal-sized StringIO objects."""
+    size = len(contents) / 8 + 1
+    files = [StringIO(contents[i:i+size])
+             for i in xrange(0,max(len(contents),1),size)]
+    return filelike.join(files,mode=mode)
+
+def _make_pipeline(contents,mode):
+    """Create a pipeline decompressing bzip'd data in fixed-size blocks."""
+    from filelike.pipeline import UnBZip2, FixedBlockSize
+    if "r" in mode:
+        return StringIO(bz2.compress(contents)) > UnBZip2() | FixedBlockSize(512)
+    return UnBZip2() | FixedBlockSize(512) > StringIO()
+
+
+SUBJECTS = [
+  Subject("file",_make_file),
+  Subject("StringIO",lambda c,m: StringIO(c)),
+  Subject("FileWrapper",lambda c,m: wrappers.FileWrapper(StringIO(c),m)),
+  Subject("join",_make_join),
+  Subject("slice",lambda c,m: filelike.slice(StringIO("X"*100+c),start=100,
+                                             mode=m,resizable=True)),
+  Subject("Translate",lambda c,m: wrappers.Translate(StringIO(c),_noop,
+                                                     mode=m)),
+  Subject("BytewiseTranslate",lambda c,m: wrappers.BytewiseTranslate(
+                                            StringIO(c),_noop,mode=m)),
+  Subject("FixedBlockSize",lambda c,m: wrappers.FixedBlockSize(StringIO(c),
+                                                         512,mode=m)),
+  Subject("PadToBlockSize",lambda c,m: wrappers.PadToBlockSize(StringIO(c),
+                                                         512,mode=m),512),
+  Subject("UnPadToBlockSize",lambda c,m: wrappers.UnPadToBlockSize(
+                StringIO(c + "Z" + "X"*(511 - len(c) % 512)),512,mode=m),512),
+  Subject("Buffer",lambda c,m: wrappers.Buffer(StringIO(c),mode=m)),
+  Subject("FlushableBuffer",lambda c,m: wrappers.FlushableBuffer(StringIO(c),
+                                                                  mode=m)),
+  Subject("UnBZip2",lambda c,m: wrappers.UnBZip2(StringIO(bz2.compress(c)),
+                                                 mode=m)),
+  Subject("BZip2",lambda c,m: wrappers.BZip2(StringIO(c),mode=m),
+          encode=bz2.compress),
+  Subject("UnGZip",lambda c,m: wrappers.UnGZip(StringIO(_gzip(c)),mode=m)),
+  Subject("GZip",lambda c,m: wrappers.GZip(StringIO(c),mode=m),
+          encode=_gzip),
+  Subject("pipeline",_make_pipeline),
+]
+
+
+def make_contents(size):
+    """Generate 'size' bytes of line-oriented sample data.
+
+    The data is deterministic for a given size, so results from different
+    runs are comparable.
+    """
+    rnd = random.Random(size)
+    lines = []
+    total = 0
+    i = 0
+    while total < size:
+        ln = "%08d %s\n" % (i,"abcdefghij"*rnd.randint(0,12))
+        lines.append(ln)
+        total += len(ln)
+        i += 1
+    return "".join(lines)[:size]
+
+
+def _bench_read(subject,contents,opts):
+    f = subject.make(contents,"r")
+    nops = nbytes = 0
+    start = time.time()
+    data = f.read(opts.chunksize)
+    while data:
+        nops += 1
+        nbytes += len(data)
+        data = f.read(opts.chunksize)
+    elapsed = time.time() - start
+    f.close()
+    return (nops,nbytes,elapsed)
+
+def _bench_readline(subject,contents,opts):
+    f = subject.make(contents,"r")
+    nops = nbytes = 0
+    start = time.time()
+    ln = f.readline()
+    while ln:
+        nops += 1
+        nbytes += len(ln)
+        ln = f.readline()
+    elapsed = time.time() - start
+    f.close()
+    return (nops,nbytes,elapsed)
+
+def _bench_iterate(subject,contents,opts):
+    f = subject.make(contents,"r")
+    nops = nbytes = 0
+    start = time.time()
+    for ln in f:
+        nops += 1
+        nbytes += len(ln)
+    elapsed = time.time() - start
+    f.close()
+    return (nops,nbytes,elapsed)
+
+def _bench_write(subject,contents,opts):
+    if subject.encode is not None:
+        contents = subject.encode(contents)
+    chunks = [contents[i:i+opts.chunksize]
+              for i in xrange(0,len(contents),opts.chunksize)]
+    f = subject.make("","w")
+    start = time.time()
+    for chunk in chunks:
+        f.write(chunk)
+    f.close()
+    elapsed = time.time() - start
+    return (len(chunks),len(contents),elapsed)
+
+def _bench_seek(subject,contents,opts):
+    rnd = random.Random(len(contents))
+    offsets = [rnd.randint(0,len(contents)) for _ in xrange(opts.seeks)]
+    f = subject.make(contents,"r")
+    nbytes = 0
+    start = time.time()
+    for offset in offsets:
+        f.seek(offset)
+        nbytes += len(f.read(64))
+    elapsed = time.time() - start
+    f.close()
+    return (len(offsets),nbytes,elapsed)
+
+def _bench_truncate(subject,contents,opts):
+    size = len(contents) / 2
+    size -= size % subject.blocksize
+    elapsed = 0
+    for _ in xrange(opts.truncates):
+        f = subject.make(contents,"r+")
+        start = time.time()
+        f.truncate(size)
+        f.flush()
+        elapsed += time.time() - start
+        f.close()
+    return (opts.truncates,(len(contents)-size)*opts.truncates,elapsed)
+
+
+def _measure(subject,operation,contents,opts):
+    """Measure a single operation on a subject, taking the best run."""
+    bench = globals()["_bench_" + operation]
+    best = None
+    try:
+        for _ in xrange(opts.repeat):
+            (nops,nbytes,elapsed) = bench(subject,contents,opts)
+            if best is None or elapsed < best[2]:
+                best = (nops,nbytes,elapsed)
+    except Exception, e:
+        return {"error": "%s: %s" % (e.__class__.__name__,e)}
+    finally:
+        _cleanup_files()
+    (nops,nbytes,elapsed) = best
+    result = {"ops":nops,"bytes":nbytes,"seconds":elapsed}
+    if elapsed > 0:
+        result["mb_per_s"] = nbytes / elapsed / (1024*1024)
+    if nops > 0:
+        result["latency_us"] = elapsed / nops * 1000000
+    return result
+
+
+def _default_options():
+    """Get the default options for a benchmark run."""
+    (opts,_) = _make_parser().parse_args([])
+    return opts
+
+def _make_parser():
+    """Build the command-line option parser."""
+    parser = OptionParser(usage="python -m filelike.benchmarks [options] "
+                                "[subject ...]")
+    parser.add_option("-s","--size",type="int",default=1024*1024,
+                      help="size of the test data in bytes")
+    parser.add_option("-c","--chunksize",type="int",default=4096,
+                      help="size of each read() and write() call")
+    parser.add_option("-r","--repeat",type="int",default=3,
+                      help="number of runs, reporting the fastest")
+    parser.add_option("--seeks",type="int",default=200,
+                      help="number of random seeks to perform")
+    parser.add_option("--truncates",type="int",default=10,
+                      help="number of truncates to perform")
+    parser.add_option("-O","--operation",action="append",dest="operations",
+                      choices=OPERATIONS,
+                      help="operation to measure (may be repeated)")
+    parser.add_option("-o","--output",
+                      help="file to write results to (default stdout)")
+    parser.add_option("-l","--list",action="store_true",
+                      help="list the available subjects and exit")
+    return parser
+
+
+def run(subjects=None,operations=None,opts=None):
+    """Run the benchmarks and return the results as a dictionary.
+
+    'subjects' and 'operations' are lists of names to restrict the run to;
+    by default everything is measured.  'opts' may be an options object as
+    produced by the command-line parser, to override the default settings.
+    """
+    if opts is None:
+        opts = _default_options()
+    if operations is None:
+        operations = OPERATIONS
+    known = dict((s.name,s) for s in SUBJECTS)
+    if subjects is None:
+        subjects = [s.name for s in SUBJECTS]
+    for name in subjects:
+        if name not in known:
+            raise ValueError("unknown benchmark subject: %s" % (name,))
+    contents = make_contents(opts.size)
+    results = {}
+    for name in subjects:
+        results[name] = {}
+        for op in operations:
+            results[name][op] = _measure(known[name],op,contents,opts)
+    return {
+        "filelike_version": filelike.__version__,
+        "python_version": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.time(),
+        "options": {"size": opts.size, "chunksize": opts.chunksize,
+                    "repeat": opts.repeat, "seeks": opts.seeks,
+                    "truncates": opts.truncates},
+        "results": results,
+    }
+
+
+def main(argv=None,stream=None):
+    """Command-line entry point for the benchmarks."""
+    if argv is None:
+        argv = sys.argv[1:]
+    if stream is None:
+        stream = sys.stdout
+    parser = _make_parser()
+    (opts,args) = parser.parse_args(argv)
+    if opts.list:
+        for s in SUBJECTS:
+            stream.write(s.name + "\n")
+        return 0
+    try:
+        results = run(args or None,opts.operations,opts)
+    except ValueError, e:
+        parser.error(str(e))
+    if opts.output:
+        stream = open(opts.output,"w")
+    try:
+        json.dump(results,stream,indent=2,sort_keys=True)
+        stream.write("\n")
+    finally:
+        if opts.output:
+            stream.close()
+    return 0
+
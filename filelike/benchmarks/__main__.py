@@ -0,0 +1,5 @@
+
+import sys
+from filelike.benchmarks import main
+
+sys.exit(main())
@@ -0,0 +1,51 @@
+
+import unittest
+from StringIO import StringIO
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+from filelike import benchmarks
+
+
+class Test_Benchmarks(unittest.TestCase):
+    """Smoke tests for the benchmark runner."""
+
+    def setUp(self):
+        self.opts = benchmarks._default_options()
+        self.opts.size = 4096
+        self.opts.repeat = 1
+        self.opts.seeks = 5
+        self.opts.truncates = 1
+
+    def test_run(self):
+        subjects = ["file","StringIO","FileWrapper","UnBZip2"]
+        res = benchmarks.run(subjects,opts=self.opts)
+        self.assertEquals(sorted(res["results"].keys()),sorted(subjects))
+        for name in subjects:
+            for op in benchmarks.OPERATIONS:
+                self.assert_(op in res["results"][name])
+        read = res["results"]["FileWrapper"]["read"]
+        self.assertEquals(read["bytes"],4096)
+        seek = res["results"]["UnBZip2"]["seek"]
+        self.assert_("error" in seek or seek["ops"] == 5)
+
+    def test_compressed_writes(self):
+        # These take compressed data when written to
+        res = benchmarks.run(["BZip2","GZip"],["write"],opts=self.opts)
+        for name in ("BZip2","GZip"):
+            self.assert_("error" not in res["results"][name]["write"])
+
+    def test_main(self):
+        out = StringIO()
+        argv = ["-s","1024","-r","1","-O","read","-O","write","StringIO"]
+        self.assertEquals(benchmarks.main(argv,out),0)
+        res = json.loads(out.getvalue())
+        self.assertEquals(res["results"].keys(),["StringIO"])
+        self.assertEquals(sorted(res["results"]["StringIO"].keys()),
+                          ["read","write"])
+
+    def test_unknown_subject(self):
+        self.assertRaises(ValueError,benchmarks.run,["nonesuch"])
+
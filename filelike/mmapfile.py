@@ -0,0 +1,288 @@
+# filelike/mmapfile.py
+#
+# Copyright (C) 2006-2009, Ryan Kelly
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+#
+"""
+
+    filelike.mmapfile:  access local files through a memory map
+
+This module provides the class MmapFile, which implements the file-like
+interface on top of a memory-mapped local file.  Reads are served directly
+from the map, and the window() method gives access to a region of the file
+without copying any data.  It is selected by filelike.open() when the
+mode string contains an "m", e.g.:
+
+    f = filelike.open("data.bin","rm")
+
+"""
+
+import mmap
+
+import filelike
+from filelike import FileLikeBase
+
+
+#  Zero-copy views of the map.  The old-style buffer() type is needed on
+#  python2, where mmap objects don't support memoryview().
+try:
+    buffer
+except NameError:
+    def _view(m,start,length):
+        return memoryview(m)[start:start+length]
+else:
+    def _view(m,start,length):
+        return buffer(m,start,length)
+
+
+class MmapFile(FileLikeBase):
+    """Class providing file-like access to a memory-mapped file.
+
+    The constructor accepts either a filename or an open file object with
+    a fileno() method, along with a mode string.  Any "m" in the mode
+    string is ignored, so the mode used with filelike.open() can be passed
+    straight through.
+
+    Reads, readinto() and readline() are served straight from the map,
+    bypassing the read buffer whenever possible.  Writes that extend the
+    file cause the map to be resized.
+
+    The 'advice' argument, if given, is passed to the advise() method to
+    give the operating system a hint about the expected access pattern.
+    """
+
+    _mmap = None
+    _owns_file = False
+
+    def __init__(self,fileobj,mode="r",advice=None):
+        super(MmapFile,self).__init__()
+        self.mode = mode
+        if isinstance(fileobj,basestring):
+            self.name = fileobj
+            # The map needs a file descriptor opened for reading, even
+            # when it will only be written to.
+            fmode = mode.replace("m","").replace("-","").replace("b","")
+            if self._writable:
+                fmode = fmode[0] + "+"
+            else:
+                fmode = "r"
+            self._fileobj = open(fileobj,fmode + "b")
+            self._owns_file = True
+        else:
+            self.name = getattr(fileobj,"name","<mmap>")
+            self._fileobj = fileobj
+        self._pos = 0
+        self._fileobj.seek(0,2)
+        size = self._fileobj.tell()
+        if size > 0:
+            self._mmap = self._map(size)
+        if self._appending:
+            self._pos = size
+        if advice is not None:
+            self.advise(advice)
+
+    def _map(self,size):
+        """Create a memory map of the first <size> bytes of the file."""
+        if self._writable:
+            access = mmap.ACCESS_WRITE
+        else:
+            access = mmap.ACCESS_READ
+        return mmap.mmap(self._fileobj.fileno(),size,access=access)
+
+    def _resize(self,size):
+        """Change the size of the file, and of the map along with it."""
+        if self._mmap is None:
+            # Empty files can't be mapped, so they're left unmapped.
+            self._fileobj.truncate(size)
+            if size > 0:
+                self._mmap = self._map(size)
+        elif size == 0:
+            self._mmap.close()
+            self._mmap = None
+            self._fileobj.truncate(0)
+        else:
+            self._mmap.resize(size)
+
+    def _get_size(self):
+        if self._mmap is None:
+            return 0
+        return len(self._mmap)
+    size = property(_get_size)
+
+    def close(self):
+        super(MmapFile,self).close()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._owns_file:
+            self._fileobj.close()
+
+    def advise(self,advice,start=0,length=None):
+        """Give the operating system a hint about how data will be accessed.
+
+        'advice' is the name of one of the MADV_* constants, e.g. "random",
+        "sequential" or "willneed", which applies to 'length' bytes starting
+        at 'start' (by default the whole file).  The hint is ignored if the
+        platform doesn't support it; True is returned if it was applied.
+        """
+        flag = getattr(mmap,"MADV_" + advice.upper(),None)
+        if flag is None or self._mmap is None:
+            return False
+        if not hasattr(self._mmap,"madvise"):
+            return False
+        if length is None:
+            length = len(self._mmap) - start
+        # The start of the region must be page-aligned
+        offset = start % mmap.PAGESIZE
+        self._mmap.madvise(flag,start - offset,length + offset)
+        return True
+
+    def window(self,start=0,length=None):
+        """Get a read-only view of a region of the file, without copying.
+
+        The region of 'length' bytes (by default, to the end of the file)
+        beginning at 'start' is returned as a memoryview, or as a buffer
+        object on versions of python where mmap objects don't support
+        memoryview.  The file's position is not affected.  Views must be
+        released before the file is resized or closed.
+        """
+        if self.closed:
+            raise IOError("File has been closed")
+        if self._wbuffer:
+            self.flush()
+        size = self._get_size()
+        start = min(start,size)
+        if length is None or start + length > size:
+            length = size - start
+        if self._mmap is None:
+            return _view(bytearray(),0,0)
+        return _view(self._mmap,start,length)
+
+    def _raw_region(self,offset):
+        return (self._fileobj,offset,max(self._get_size() - offset,0))
+
+    def _unbuffered(self):
+        """Check whether reads can bypass the read buffer entirely."""
+        if self.closed or not self._readable:
+            return False
+        if self._wbuffer is not None or self._soffset or self._sbuffer:
+            return False
+        rbuffer = self._rbuffer
+        if rbuffer and self._rbufpos < len(rbuffer):
+            return False
+        self._rbuffer = None
+        return True
+
+    def read(self,size=-1):
+        if not self._unbuffered():
+            return super(MmapFile,self).read(size)
+        pos = self._pos
+        end = self._get_size()
+        if size > 0 and pos + size < end:
+            end = pos + size
+        if pos >= end:
+            return ""
+        self._pos = end
+        return self._mmap[pos:end]
+
+    def readline(self,size=-1):
+        if not self._unbuffered():
+            return super(MmapFile,self).readline(size)
+        pos = self._pos
+        end = self._get_size()
+        if size > 0 and pos + size < end:
+            end = pos + size
+        if pos >= end:
+            return ""
+        idx = self._mmap.find("\n",pos,end)
+        if idx != -1:
+            end = idx + 1
+        self._pos = end
+        return self._mmap[pos:end]
+
+    def readinto(self,b):
+        if not self._unbuffered():
+            return super(MmapFile,self).readinto(b)
+        n = self._readinto(memoryview(b))
+        if n is None:
+            return 0
+        return n
+
+    def _read(self,sizehint=-1):
+        pos = self._pos
+        end = self._get_size()
+        if sizehint > 0 and pos + sizehint < end:
+            end = pos + sizehint
+        if pos >= end:
+            return None
+        self._pos = end
+        return self._mmap[pos:end]
+
+    def _readinto(self,b):
+        pos = self._pos
+        n = min(len(b),self._get_size() - pos)
+        if n <= 0:
+            return None
+        b[:n] = _view(self._mmap,pos,n)
+        self._pos = pos + n
+        return n
+
+    def _write(self,data,flushing=False):
+        if not data:
+            return None
+        end = self._pos + len(data)
+        if end > self._get_size():
+            self._resize(end)
+        self._mmap[self._pos:end] = data
+        self._pos = end
+
+    def _pread(self,offset,size):
+        end = min(offset + size,self._get_size())
+        if offset >= end:
+            return ""
+        return self._mmap[offset:end]
+
+    def _pwrite(self,offset,data):
+        if not data:
+            return None
+        end = offset + len(data)
+        if end > self._get_size():
+            self._plock.acquire()
+            try:
+                if end > self._get_size():
+                    self._resize(end)
+            finally:
+                self._plock.release()
+        self._mmap[offset:end] = data
+
+    def _seek(self,offset,whence):
+        if whence == 1:
+            offset += self._pos
+        elif whence == 2:
+            offset += self._get_size()
+        elif whence != 0:
+            raise ValueError("Invalid value for whence: " + str(whence))
+        self._pos = max(offset,0)
+
+    def _tell(self):
+        return self._pos
+
+    def _truncate(self,size):
+        self._resize(size)
+        if self._pos > size:
+            self._pos = size
+
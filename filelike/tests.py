@@ -3,6 +3,7 @@ import unittest
 from StringIO import StringIO
 import tempfile
 import os
+import threading
 
 import filelike
 from filelike import to_filelike, is_filelike, join, wrappers
@@ -94,6 +95,38 @@ class Test_Read(unittest.TestCase):
         self.assertEquals(self.file.read(),"")
         self.assertEquals(self.file.read(),"")
 
+    def test_read_mixed(self):
+        if hasattr(self.file,"_bufsize"):
+            self.file._bufsize = 7
+        def expected_line(pos,size=-1):
+            end = self.contents.find("\n",pos) + 1
+            if end == 0:
+                end = len(self.contents)
+            if size > 0 and end - pos > size:
+                end = pos + size
+            return self.contents[pos:end]
+        ln = self.file.readline()
+        self.assertEquals(ln,expected_line(0))
+        pos = len(ln)
+        self.assertEquals(self.file.read(3),self.contents[pos:pos+3])
+        pos += 3
+        ln = self.file.readline(5)
+        self.assertEquals(ln,expected_line(pos,5))
+        pos += len(ln)
+        self.assertEquals(self.file.read(),self.contents[pos:])
+        self.assertEquals(self.file.readline(),"")
+
+    def test_readinto(self):
+        b = bytearray(5)
+        self.assertEquals(self.file.readinto(b),5)
+        self.assertEquals(str(b),self.contents[:5])
+        self.assertEquals(self.file.read(2),self.contents[5:7])
+        b = bytearray(len(self.contents) + 10)
+        n = self.file.readinto(memoryview(b)[3:])
+        self.assertEquals(n,len(self.contents) - 7)
+        self.assertEquals(str(b[3:3+n]),self.contents[7:])
+        self.assertEquals(self.file.readinto(b),0)
+
 
 class Test_ReadWrite(Test_Read):
     """Generic file-like testcases for writable files."""
@@ -117,6 +150,14 @@ class Test_ReadWrite(Test_Read):
         self.assertEquals(f.getvalue(),self.contents)
         f.close()
 
+    def test_writelines(self):
+        f = self.makeFile(self.empty_contents,"w")
+        f.writelines(self.contents.splitlines(True))
+        self.assertEquals(f.tell(),len(self.contents))
+        f.flush()
+        self.assertEquals(f.getvalue(),self.contents)
+        f.close()
+
     def test_write_stream(self):
         f = self.makeFile(self.empty_contents,"w-")
         f.write(self.contents)
@@ -170,6 +211,40 @@ class Test_ReadWriteSeek(Test_ReadWrite):
         self.file.seek(-5,1)
         self.assertEquals(self.file.tell(),9)
 
+    def test_seek_forward(self):
+        f = self.makeFile(self.contents,"r")
+        for start in xrange(len(self.contents)):
+            self.assertEquals(f.read(1),self.contents[start:start+1])
+            for step in (1,3,8):
+                if start + step > len(self.contents):
+                    break
+                f.seek(start)
+                f.seek(step,1)
+                self.assertEquals(f.tell(),start+step)
+                self.assertEquals(f.read(2),self.contents[start+step:][:2])
+            f.seek(start+1)
+
+    def test_pread(self):
+        pread = wrappers._pread_fileobj
+        self.assertEquals(self.file.read(3),self.contents[:3])
+        for offset in (0,4,7,len(self.contents)-2):
+            data = pread(self.file,offset,5)
+            self.assertEquals(data,self.contents[offset:offset+5])
+        self.assertEquals(pread(self.file,len(self.contents)+10,5),"")
+        self.assertEquals(self.file.tell(),3)
+        self.assertEquals(self.file.read(3),self.contents[3:6])
+
+    def test_pwrite(self):
+        pwrite = wrappers._pwrite_fileobj
+        self.assertEquals(self.file.read(3),self.contents[:3])
+        pwrite(self.file,6,"hello")
+        self.assertEquals(self.file.tell(),3)
+        self.assertEquals(self.file.read(3),self.contents[3:6])
+        self.assertEquals(self.file.read(5),"hello")
+        self.file.flush()
+        self.assertEquals(self.file.getvalue(),
+                          self.contents[:6] + "hello" + self.contents[11:])
+
     def test_seek_end(self):
         self.assertEquals(self.file.tell(),0)
         self.file.seek(-7,2)
@@ -209,21 +284,311 @@ class Test_StringIO(Test_ReadWriteSeek):
         f.xreadlines = xreadlines
         return f
 
+    def test_readinto(self):
+        # StringIO doesn't provide readinto(), so check the fallback to
+        # _read() used for classes that don't provide _readinto().
+        s = self.file
+        class Reader(filelike.FileLikeBase):
+            def _read(self,sizehint=-1):
+                data = s.read(3)
+                if data == "":
+                    return None
+                return data
+        self.file = Reader()
+        self.file.mode = "r-"
+        super(Test_StringIO,self).test_readinto()
+
 
 class Test_Join(Test_ReadWriteSeek):
     """Run our testcases against filelike.join."""
 
+    join_args = {}
+
     def makeFile(self,contents,mode):
         files = []
         files.append(StringIO(contents[0:5]))
         files.append(StringIO(contents[5:8]))
         files.append(StringIO(contents[8:]))
-        f = join(files)
+        f = join(files,**self.join_args)
         def getvalue():
             return "".join([s.getvalue() for s in files])
         f.getvalue = getvalue
         return f
 
+    def test_many_members(self):
+        data = "".join([chr(65 + i%26)*(i%4) for i in xrange(200)])
+        files = []
+        offset = 0
+        for i in xrange(200):
+            files.append(StringIO(data[offset:offset+i%4]))
+            offset += i%4
+        f = join(files,**self.join_args)
+        for pos in (0,57,3,len(data)-1,len(data),120):
+            f.seek(pos)
+            self.assertEquals(f.tell(),pos)
+            self.assertEquals(f.read(5),data[pos:pos+5])
+            self.assertEquals(f.tell(),min(pos+5,len(data)))
+        f.seek(-4,2)
+        f.write("ABCDEFGH")
+        self.assertEquals(f.tell(),len(data)+4)
+        f.seek(0,2)
+        self.assertEquals(f.tell(),len(data)+4)
+        f.seek(-10,1)
+        self.assertEquals(f.read(),data[-6:-4] + "ABCDEFGH")
+        self.assertEquals("".join([s.getvalue() for s in files]),
+                          data[:-4] + "ABCDEFGH")
+
+    def test_lazy_members(self):
+        paths = []
+        for i in xrange(40):
+            (fd,nm) = tempfile.mkstemp()
+            os.write(fd,"%02d\n" % (i,))
+            os.close(fd)
+            paths.append(nm)
+        opened = []
+        def opener(nm):
+            def open_member():
+                f = ProxyObject(open(nm,"rb"))
+                opened.append(f)
+                return f
+            return open_member
+        try:
+            members = paths[:20] + [opener(p) for p in paths[20:]]
+            f = join(members,max_open=3,**self.join_args)
+            self.assertEquals(f._lazyOpen,{})
+            expected = "".join(["%02d\n" % (i,) for i in xrange(40)])
+            self.assertEquals(f.read(),expected)
+            self.assert_(len(f._lazyOpen) <= 3)
+            self.assertEquals(len([o for o in opened if not o.closed]),3)
+            f.seek(31)
+            self.assertEquals(f.read(5),expected[31:36])
+            self.assertEquals(f.pread(4,6),expected[4:10])
+            self.assertEquals(f.tell(),36)
+            f.seek(-3,2)
+            self.assertEquals(f.read(),"39\n")
+            f.close()
+            self.assertEquals(len([o for o in opened if not o.closed]),0)
+            self.assertRaises(ValueError,join,paths,max_open=0)
+        finally:
+            for nm in paths:
+                os.unlink(nm)
+
+    def test_compressed_member_names(self):
+        import gzip
+        paths = []
+        for c in "AB":
+            (fd,nm) = tempfile.mkstemp(suffix=".gz")
+            os.close(fd)
+            g = gzip.GzipFile(nm,"wb")
+            g.write(c*1000)
+            g.close()
+            paths.append(nm)
+        try:
+            # Named members are joined as the raw bytes on disk
+            raw = "".join([open(nm,"rb").read() for nm in paths])
+            f = join(paths,**self.join_args)
+            f.seek(0,2)
+            self.assertEquals(f.tell(),len(raw))
+            f.seek(len(raw) - 30)
+            self.assertEquals(f.read(5),raw[-30:-25])
+            f.seek(0)
+            self.assertEquals(f.read(),raw)
+            f.close()
+        finally:
+            for nm in paths:
+                os.unlink(nm)
+
+
+class Test_JoinPrefetch(Test_Join):
+    """Run our testcases against filelike.join with prefetching."""
+
+    join_args = {"prefetch":2,"prefetch_bytes":4}
+
+    def test_prefetch(self):
+        opened = []
+        def opener(i):
+            def open_member():
+                opened.append(i)
+                return StringIO("member %d\n" % (i,))
+            return open_member
+        f = join([opener(i) for i in xrange(10)],**self.join_args)
+        self.assertEquals(f.readline(),"member 0\n")
+        f._wait_prefetch()
+        self.assertEquals(sorted(opened),[0,1,2])
+        self.assertEquals(f.tell(),9)
+        self.assertEquals(f.read(),"".join(["member %d\n" % (i,)
+                                            for i in xrange(1,10)]))
+        f.seek(20)
+        self.assertEquals(f.read(5),"mber ")
+        f.close()
+
+
+class Test_MmapFile(Test_ReadWriteSeek):
+    """Run our testcases against filelike.MmapFile."""
+
+    def setUp(self):
+        self.paths = []
+        super(Test_MmapFile,self).setUp()
+
+    def tearDown(self):
+        super(Test_MmapFile,self).tearDown()
+        for nm in self.paths:
+            os.unlink(nm)
+
+    def makeFile(self,contents,mode):
+        (fd,nm) = tempfile.mkstemp()
+        self.paths.append(nm)
+        os.write(fd,contents)
+        os.close(fd)
+        f = filelike.MmapFile(nm,mode)
+        def getvalue():
+            f.flush()
+            return open(nm,"rb").read()
+        f.getvalue = getvalue
+        return f
+
+    def test_open(self):
+        (fd,nm) = tempfile.mkstemp()
+        self.paths.append(nm)
+        os.write(fd,self.contents)
+        os.close(fd)
+        f = filelike.open(nm,"rm")
+        self.assert_(isinstance(f,filelike.MmapFile))
+        self.assertEquals(f.read(),self.contents)
+        f.close()
+
+    def test_iterlines_batch(self):
+        contents = "".join(["line %d\n" % (i,) for i in xrange(5000)])
+        f = self.makeFile(contents,"r")
+        lines = []
+        for batch in f.iterlines(batch=True):
+            lines.extend(batch)
+        self.assertEquals(lines,contents.splitlines(True))
+        f.close()
+
+    def test_truncate_empty(self):
+        f = self.makeFile(self.empty_contents,"r+")
+        f.truncate(0)
+        self.assertEquals(f.size,0)
+        f.write("data")
+        f.truncate(0)
+        f.truncate(0)
+        self.assertEquals(f.getvalue(),"")
+        f.close()
+
+    def test_window(self):
+        w = self.file.window(5,4)
+        self.assertEquals(str(w),self.contents[5:9])
+        self.assertEquals(self.file.tell(),0)
+        self.assertEquals(str(self.file.window(len(self.contents)-3)),
+                          self.contents[-3:])
+        del w
+
+    def test_window_slice_join(self):
+        s = filelike.slice(self.file,5,20)
+        self.assertEquals(str(s.window(2,5)),self.contents[7:12])
+        self.assertEquals(str(s.window(10)),self.contents[15:20])
+        f2 = self.makeFile(self.contents,"r")
+        j = join([self.file,f2])
+        size = len(self.contents)
+        self.assertEquals(str(j.window(size+3,4)),self.contents[3:7])
+        self.assertEquals(str(j.window(size-2,4)),
+                          self.contents[-2:] + self.contents[:2])
+
+    def test_advise(self):
+        applied = self.file.advise("random")
+        self.assertEquals(applied,hasattr(self.file._mmap,"madvise"))
+        self.assertEquals(self.file.read(),self.contents)
+
+    def test_pread_threads(self):
+        f = self.file
+        errors = []
+        def reader(offset):
+            for i in xrange(200):
+                pos = (offset + i) % len(self.contents)
+                if f.pread(pos,4) != self.contents[pos:pos+4]:
+                    errors.append(pos)
+        threads = [threading.Thread(target=reader,args=(i*7,))
+                   for i in xrange(4)]
+        for t in threads:
+            t.start()
+        self.assertEquals(f.read(),self.contents)
+        for t in threads:
+            t.join()
+        self.assertEquals(errors,[])
+
+
+class Test_Copy(unittest.TestCase):
+    """Testcases for filelike.copy."""
+
+    contents = "".join(["line %d of the data\n" % i for i in xrange(2000)])
+
+    def setUp(self):
+        self.paths = []
+
+    def tearDown(self):
+        for nm in self.paths:
+            os.unlink(nm)
+
+    def makeFile(self,contents):
+        (fd,nm) = tempfile.mkstemp()
+        self.paths.append(nm)
+        os.write(fd,contents)
+        os.close(fd)
+        return open(nm,"r+b")
+
+    def test_copy_stringio(self):
+        src = StringIO(self.contents)
+        dst = StringIO()
+        res = filelike.copy(src,dst,chunksize=1000)
+        self.assertEquals(res["method"],"read")
+        self.assertEquals(res["bytes"],len(self.contents))
+        self.assertEquals(dst.getvalue(),self.contents)
+
+    def test_copy_readinto(self):
+        src = wrappers.FileWrapper(StringIO(self.contents),"r")
+        src.read(10)
+        dst = StringIO()
+        res = filelike.copy(src,dst,length=5000,chunksize=1000)
+        self.assertEquals(res["method"],"readinto")
+        self.assertEquals(res["bytes"],5000)
+        self.assertEquals(dst.getvalue(),self.contents[10:5010])
+        self.assertEquals(src.read(5),self.contents[5010:5015])
+
+    def test_copy_files(self):
+        src = self.makeFile(self.contents)
+        dst = self.makeFile("header")
+        dst.seek(0,2)
+        res = filelike.copy(src,dst)
+        self.assertEquals(res["bytes"],len(self.contents))
+        self.assertEquals(src.tell(),len(self.contents))
+        dst.write("footer")
+        dst.seek(0)
+        self.assertEquals(dst.read(),"header" + self.contents + "footer")
+
+    def test_copy_slice(self):
+        f = self.makeFile(self.contents)
+        src = filelike.slice(f,100,3100)
+        src.read(100)
+        dst = self.makeFile("")
+        res = filelike.copy(src,dst)
+        self.assertEquals(res["bytes"],2900)
+        self.assertEquals(src.tell(),3000)
+        self.assertEquals(src.read(),"")
+        dst.seek(0)
+        self.assertEquals(dst.read(),self.contents[200:3100])
+        if hasattr(os,"sendfile"):
+            self.assertEquals(res["method"],"sendfile")
+
+    def test_copy_mmap(self):
+        f = self.makeFile(self.contents)
+        src = filelike.MmapFile(f,"r")
+        src.seek(50)
+        dst = wrappers.FileWrapper(StringIO(),"w")
+        res = filelike.copy(src,dst,length=1000)
+        self.assertEquals(res["bytes"],1000)
+        self.assertEquals(dst._fileobj.getvalue(),self.contents[50:1050])
+
 
 class Test_IsTo(unittest.TestCase):
     """Tests for is_filelike/to_filelike."""
@@ -235,6 +600,15 @@ class Test_IsTo(unittest.TestCase):
         self.assert_(is_filelike(tempfile.TemporaryFile("r"),"w"))
         self.assert_(is_filelike(StringIO()))
 
+    def test_isfilelike_stats(self):
+        """Test is_filelike on a file collecting statistics."""
+        f = wrappers.FileWrapper(StringIO("data"))
+        f.enable_stats()
+        self.assert_(is_filelike(f))
+        self.assert_(is_filelike(f,"r-"))
+        self.assert_(not is_filelike(filelike.FileLikeBase()))
+        self.assertEquals(f.read(),"data")
+
     def test_tofilelike_read(self):
         """Test behavior of to_filelike for mode "r-"."""
         class F:
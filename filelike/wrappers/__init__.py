@@ -48,10 +48,175 @@ the file on-the-fly as it is read.
 
 """ 
 
+import os
+import weakref
+import threading
+
 import filelike
 from filelike import FileLikeBase
 
 
+def _readinto_fileobj(fileobj,b):
+    """Read data from 'fileobj' directly into the buffer 'b'.
+
+    This uses the readinto() method of the file if it exists, and falls
+    back to read() otherwise.  The number of bytes read is returned, or
+    None if EOF was reached.
+    """
+    try:
+        readinto = fileobj.readinto
+    except AttributeError:
+        data = fileobj.read(len(b))
+        if data == "":
+            return None
+        b[:len(data)] = data
+        return len(data)
+    else:
+        n = readinto(b)
+        if not n:
+            return None
+        return n
+
+
+#  Locks used to simulate positional reads and writes on objects that aren't
+#  FileLikeBase instances, created on demand for each object.  Objects that
+#  can't be weakly referenced must share a single lock.
+_plocks = weakref.WeakKeyDictionary()
+_plocks_lock = threading.Lock()
+_shared_plock = threading.Lock()
+
+def _get_plock(fileobj):
+    """Get the lock used to simulate pread/pwrite on 'fileobj'."""
+    _plocks_lock.acquire()
+    try:
+        try:
+            return _plocks[fileobj]
+        except KeyError:
+            lock = _plocks[fileobj] = threading.Lock()
+            return lock
+        except TypeError:
+            return _shared_plock
+    finally:
+        _plocks_lock.release()
+
+
+#  The wrapper that last moved each file, for wrappers that share a file
+#  and cache their position in it.
+_owners = weakref.WeakKeyDictionary()
+
+def _get_owner(fileobj):
+    """Get the cell recording which wrapper last moved 'fileobj'.
+
+    This is a one-item list holding a token identifying the wrapper.
+    None is returned if the object can't be weakly referenced, in which
+    case positions can't safely be cached.
+    """
+    try:
+        try:
+            return _owners[fileobj]
+        except KeyError:
+            owner = _owners[fileobj] = [None]
+            return owner
+    except TypeError:
+        return None
+
+
+def _pread_fileobj(fileobj,offset,size):
+    """Read 'size' bytes from 'fileobj' at 'offset', leaving its position.
+
+    This uses the pread() method for FileLikeBase objects and os.pread()
+    for real files where it's available.  Otherwise it seeks and reads
+    while holding a lock specific to 'fileobj'.  As with the built-in
+    os.pread(), data pending in a real file's write buffer won't be seen.
+    """
+    if isinstance(fileobj,FileLikeBase):
+        return fileobj.pread(offset,size)
+    if hasattr(os,"pread"):
+        try:
+            fd = fileobj.fileno()
+        except (AttributeError,IOError,ValueError):
+            pass
+        else:
+            return os.pread(fd,size,offset)
+    lock = _get_plock(fileobj)
+    lock.acquire()
+    try:
+        pos = fileobj.tell()
+        fileobj.seek(offset,0)
+        data = fileobj.read(size)
+        fileobj.seek(pos,0)
+    finally:
+        lock.release()
+    return data
+
+
+def _pwrite_fileobj(fileobj,offset,data):
+    """Write 'data' to 'fileobj' at 'offset', leaving its position.
+
+    This is the counterpart of _pread_fileobj(), using pwrite() or
+    os.pwrite() where possible.
+    """
+    if isinstance(fileobj,FileLikeBase):
+        return fileobj.pwrite(offset,data)
+    if hasattr(os,"pwrite"):
+        try:
+            fd = fileobj.fileno()
+        except (AttributeError,IOError,ValueError):
+            pass
+        else:
+            while data:
+                n = os.pwrite(fd,data,offset)
+                data = data[n:]
+                offset += n
+            return None
+    lock = _get_plock(fileobj)
+    lock.acquire()
+    try:
+        pos = fileobj.tell()
+        fileobj.seek(offset,0)
+        fileobj.write(data)
+        fileobj.seek(pos,0)
+    finally:
+        lock.release()
+
+
+def _iter_stack(fileobj):
+    """Iterate over the layers of a stack of file wrappers.
+
+    This yields 'fileobj' itself, followed by each object reached by
+    following the chain of '_fileobj' attributes.
+    """
+    while fileobj is not None:
+        yield fileobj
+        fileobj = getattr(fileobj,"_fileobj",None)
+
+
+def enable_stack_stats(fileobj):
+    """Enable I/O statistics on every layer of a stack of file wrappers.
+
+    Layers that are not FileLikeBase instances are skipped.
+    """
+    for layer in _iter_stack(fileobj):
+        if isinstance(layer,FileLikeBase):
+            layer.enable_stats()
+
+
+def stack_stats(fileobj):
+    """Get the I/O statistics for each layer of a stack of file wrappers.
+
+    A list of (layer,stats) pairs is returned, starting with 'fileobj'
+    and working down to the innermost file.  For layers not collecting
+    statistics, 'stats' will be None.
+    """
+    stats = []
+    for layer in _iter_stack(fileobj):
+        if isinstance(layer,FileLikeBase):
+            stats.append((layer,layer.get_stats()))
+        else:
+            stats.append((layer,None))
+    return stats
+
+
 class FileWrapper(FileLikeBase):
     """Base class for objects that wrap a file-like object.
     
@@ -96,7 +261,7 @@ class FileWrapper(FileLikeBase):
         if hasattr(fileobj,"name"):
             self.name = fileobj.name
         # Respect append-mode setting
-        if "a" in self.mode:
+        if self._appending:
             if self._check_mode("r"):
                 self._fileobj.seek(0)
             self.seek(0,2)
@@ -151,12 +316,18 @@ class FileWrapper(FileLikeBase):
             return None
         return data
 
+    def _readinto(self,b):
+        return _readinto_fileobj(self._fileobj,b)
+
     def _write(self,string,flushing=False):
         return self._fileobj.write(string)
 
     def _seek(self,offset,whence):
         self._fileobj.seek(offset,whence)
 
+    def _skip(self,size):
+        return self._seek(size,1)
+
     def _tell(self):
         return self._fileobj.tell()
 
@@ -178,8 +349,13 @@ from filelike.wrappers.crypto import Encrypt, Decrypt
 from filelike.wrappers.buffer import Buffer, FlushableBuffer
 
 from filelike.wrappers.compress import BZip2, UnBZip2, GZip, UnGZip
+from filelike.wrappers.compress import BGZip, UnBGZip
+from filelike.wrappers.compress import LZMA, UnLZMA
+from filelike.wrappers.compress import CheckpointIndex
 
 from filelike.wrappers.unix import Head
 
 from filelike.wrappers.slice import Slice
 
+from filelike.wrappers.extents import Extents
+
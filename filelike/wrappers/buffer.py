@@ -81,7 +81,7 @@ class Buffer(FileWrapper):
     def _write_out_buffer(self):
         if self._check_mode("r"):
             self._read_rest()
-            if "a" in self.mode:
+            if self._appending:
                 self._buffer.seek(self._in_pos)
                 self._fileobj.seek(self._in_pos)
             else:
@@ -134,7 +134,7 @@ class Buffer(FileWrapper):
 
     def _write(self,data,flushing=False):
         self._buffer.write(data)
-        if self._check_mode("r") and not self._in_eof:
+        if self._readable and not self._in_eof:
             diff = self._buffer.tell() - self._in_pos
             if diff > 0:
                 junk = self._fileobj.read(diff)
@@ -145,7 +145,7 @@ class Buffer(FileWrapper):
     
     def _seek(self,offset,whence):
         # Ensure we've read enough to simply do the seek on the buffer
-        if self._check_mode("r") and not self._in_eof:
+        if self._readable and not self._in_eof:
             if whence == 0:
                 if offset > self._in_pos:
                     self._read_rest()
@@ -161,7 +161,7 @@ class Buffer(FileWrapper):
         return self._buffer.tell()
 
     def _truncate(self,size):
-        if self._check_mode("r") and not self._in_eof:
+        if self._readable and not self._in_eof:
             if size > self._in_pos:
                 self._read_rest()
         self._in_eof = True
@@ -207,14 +207,26 @@ class FlushableBuffer(Buffer):
     This subclass of Buffer assumes that the underlying file object can
     be reset to position 0, allowing calls to flush() to write out to
     the underlying file.
+
+    If 'appendable' is true, the underlying file must accept further data
+    written at its end, without being reset.  When nothing but new data at
+    the end of the file has been written since the last flush, only that
+    new data is then written out.
     """
 
     _append_requires_overwite = True
 
-    def __init__(self,fileobj,mode=None,max_size_in_memory=1024*8):
+    def __init__(self,fileobj,mode=None,max_size_in_memory=1024*8,
+                 appendable=False):
+        self._appendable = appendable
+        self._out_size = None
+        self._dirty_pos = None
+        self._appended = False
         super(FlushableBuffer,self).__init__(fileobj,mode,max_size_in_memory)
-        if "a" in self.mode and not self._check_mode("r"):
+        self._start_pos = 0
+        if self._appending and not self._check_mode("r"):
             self._start_pos = self._fileobj.tell()
+            self._out_size = 0
 
     def flush(self):
         if self._check_mode("w-"):
@@ -232,25 +244,69 @@ class FlushableBuffer(Buffer):
         # that's done by the implicit flush() in this case.
         super(Buffer,self).close()
 
+    def _write(self,data,flushing=False):
+        if data:
+            pos = self._buffer.tell()
+            if self._dirty_pos is None or pos < self._dirty_pos:
+                self._dirty_pos = pos
+        super(FlushableBuffer,self)._write(data,flushing)
+
+    def _written_out_size(self):
+        """Get how much of the buffer the underlying file already holds.
+
+        None is returned if the underlying file can't be trusted to hold
+        any of it at its current position.
+        """
+        if self._was_truncated:
+            return None
+        out_size = self._out_size
+        if out_size is None:
+            # Nothing has been written out, so the underlying file holds
+            # just what we've read from it.
+            if not self._check_mode("r") or not self._in_eof:
+                return None
+            out_size = self._in_pos
+        if self._fileobj.tell() != self._start_pos + out_size:
+            return None
+        return out_size
+
     def _write_out_buffer(self):
+        out_size = self._written_out_size()
+        if out_size is not None:
+            if self._dirty_pos is None:
+                # Nothing has changed since it was last written out.
+                return
+            if self._appendable and self._dirty_pos >= out_size:
+                self._buffer.seek(out_size)
+                for chunk in self._buffer_chunks():
+                    self._fileobj.write(chunk)
+                self._out_size = self._buffer.tell()
+                self._dirty_pos = None
+                self._appended = True
+                return
         if self._check_mode("r"):
             self._read_rest()
-            if "a" in self.mode:
+            if self._appending:
                 self._buffer.seek(self._in_pos)
                 self._fileobj.seek(self._in_pos)
             else:
                 self._fileobj.seek(0)
                 self._buffer.seek(0)
         else:
-            if "a" in self.mode:
+            if self._appending:
                 self._fileobj.seek(self._start_pos)
             else:
                 self._fileobj.seek(0)
             self._buffer.seek(0)
-        if self._was_truncated:
+        # Data appended by an earlier flush may take up more room than
+        # the rewritten file, so it has to go.
+        if self._was_truncated or (self._appended and not self._appending):
             self._fileobj.truncate(0)
             self._was_truncated = False
+            self._appended = False
         for chunk in self._buffer_chunks():
             self._fileobj.write(chunk)
+        self._out_size = self._buffer.tell()
+        self._dirty_pos = None
 
 
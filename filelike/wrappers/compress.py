@@ -22,18 +22,216 @@
     filelike.wrappers.compress:  wrapper classes handling compressed files
     
 This module provides the filelike wrappers 'BZip2' and 'UnBZip2' for dealing
-with files compressed in bz2 format.  It also provides some base classes for
-building other compression wrappers.
+with files compressed in bz2 format, and 'GZip' and 'UnGZip' for files in
+gzip format.  It also provides some base classes for building other
+compression wrappers.  When they are only reading a real file, UnBZip2 and
+UnGZip leave the work to the bz2 and gzip modules of the standard library
+where they are able to handle it.  When writing, new data at the end of the
+file is flushed as a further bzip2 stream or gzip member, rather than by
+compressing the whole file again.
+
+Seeking within a compressed file normally means decompressing everything
+up to the target position.  To avoid this, UnGZip records checkpoints in a
+CheckpointIndex as the file is read, from which later seeks can resume.
+The checkpoints at the start of each member of a multi-member gzip file
+can be saved to a sidecar file named by appending INDEX_SUFFIX to the name
+of the compressed file, which filelike.open() will load automatically.
+The other checkpoints can't be saved, so a saved index is no help in
+seeking within a file that has only one member.
+
+Blocks of a bzip2 stream are independent of each other, so UnBZip2 can
+decompress several of them at once using a pool of threads.  Likewise,
+UnGZip and GZip can compress blocks of data in parallel in the style of
+pigz, producing a single gzip stream.
+
+The wrappers 'BGZip' and 'UnBGZip' handle the blocked gzip format (BGZF),
+made up of small independent gzip members that any gzip reader can read.
+The size of each block is recorded in its header, so UnBGZip can seek
+directly to any block, by position or by BGZF virtual offset, and can
+decompress several blocks at once.  An index of the blocks in the ".gzi"
+format used by bgzip is loaded by filelike.open() if present.
+
+If the lzma module is available, the wrappers 'LZMA' and 'UnLZMA' handle
+files in the xz format.  These are written in independent blocks, and
+UnLZMA uses the index at the end of the file to seek directly to the block
+containing any position.
 
 """ 
 
+import os
+import sys
+import bisect
+import warnings
+import struct
+import atexit
+import weakref
+import threading
+import Queue
+from collections import deque
+from binascii import hexlify, unhexlify
+
 import filelike
-from filelike.wrappers import FileWrapper
+from filelike.wrappers import FileWrapper, _pread_fileobj
 from filelike.wrappers.translate import Translate
 from filelike.wrappers.buffer import FlushableBuffer
 
 import bz2
+import gzip
 import zlib
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+
+
+#  Suffix of the sidecar files holding a saved CheckpointIndex
+INDEX_SUFFIX = ".fidx"
+
+
+class CheckpointIndex(object):
+    """Index of points from which decompression can be resumed.
+
+    Each checkpoint records an offset in the decompressed data, the
+    corresponding offset in the compressed data, and the state of the
+    decompressor at that point.  Checkpoints whose state is None mark places
+    where decompression can begin afresh, such as the start of a member in
+    a multi-member gzip file; only these can be saved to a file.  The state
+    of a zlib decompressor can't be rebuilt from the data preceding it,
+    so an index saved for a single-member gzip file is useless, and saving
+    one gives a warning.
+
+    Checkpoints with a saved state are recorded roughly every 'spacing'
+    bytes of decompressed output.  Each one holds a copy of the decompressor,
+    which for zlib is around 40KB, so the spacing should be chosen with the
+    size of the files in mind.  If 'spacing' is None, only restart points
+    are recorded.
+    """
+
+    def __init__(self,spacing=16*1024*1024):
+        self.spacing = spacing
+        self._uoffsets = [0]
+        self._coffsets = [0]
+        self._states = [None]
+        self._last_state = 0
+
+    def __len__(self):
+        return len(self._uoffsets)
+
+    def due(self,uoffset):
+        """Check whether a checkpoint with saved state is due at 'uoffset'."""
+        if self.spacing is None:
+            return False
+        return uoffset >= self._uoffsets[self._last_state] + self.spacing
+
+    def add(self,uoffset,coffset,state=None):
+        """Add a checkpoint to the index.
+
+        Checkpoints must be added in order; any at or before the last
+        checkpoint in the index are ignored, as they will have been found
+        by an earlier pass over the data.
+        """
+        if uoffset <= self._uoffsets[-1]:
+            return
+        self._uoffsets.append(uoffset)
+        self._coffsets.append(coffset)
+        self._states.append(state)
+        if state is not None:
+            self._last_state = len(self._states) - 1
+
+    def find(self,uoffset):
+        """Find the last checkpoint at or before 'uoffset'.
+
+        The checkpoint is returned as a tuple (uoffset,coffset,state).
+        """
+        idx = bisect.bisect_right(self._uoffsets,uoffset) - 1
+        return (self._uoffsets[idx],self._coffsets[idx],self._states[idx])
+
+    def find_compressed(self,coffset):
+        """Find the last checkpoint at or before compressed offset 'coffset'.
+
+        The checkpoint is returned as a tuple (uoffset,coffset,state).
+        """
+        idx = bisect.bisect_right(self._coffsets,coffset) - 1
+        return (self._uoffsets[idx],self._coffsets[idx],self._states[idx])
+
+    def save(self,f):
+        """Save the restart points to the given file or filename."""
+        if isinstance(f,basestring):
+            f = open(f,"w")
+            try:
+                return self.save(f)
+            finally:
+                f.close()
+        if None not in self._states[1:]:
+            msg = "index has no restart points after the start of the file"
+            warnings.warn(msg,stacklevel=2)
+        f.write("filelike checkpoint index 1\n")
+        for (u,c,state) in zip(self._uoffsets,self._coffsets,self._states):
+            if state is None:
+                f.write("%d %d\n" % (u,c))
+
+    def load(cls,f,spacing=16*1024*1024):
+        """Load an index from the given file or filename."""
+        if isinstance(f,basestring):
+            f = open(f,"r")
+            try:
+                return cls.load(f,spacing)
+            finally:
+                f.close()
+        if f.readline() != "filelike checkpoint index 1\n":
+            raise ValueError("not a checkpoint index")
+        index = cls(spacing)
+        for ln in f:
+            (u,c) = ln.split()
+            index.add(int(u),int(c))
+        return index
+    load = classmethod(load)
+
+    def save_gzi(self,f):
+        """Save the restart points to a file in the ".gzi" format.
+
+        This is the format used by bgzip and samtools for indexes of BGZF
+        files: a count of entries followed by a pair of offsets (compressed
+        then uncompressed) for each entry, as little-endian 64-bit integers.
+        The implicit entry at the start of the file is not included.
+        """
+        if isinstance(f,basestring):
+            f = open(f,"wb")
+            try:
+                return self.save_gzi(f)
+            finally:
+                f.close()
+        points = [(c,u) for (u,c,state)
+                        in zip(self._uoffsets,self._coffsets,self._states)
+                        if state is None and u > 0]
+        f.write(struct.pack("<Q",len(points)))
+        for (c,u) in points:
+            f.write(struct.pack("<QQ",c,u))
+
+    def load_gzi(cls,f,spacing=None):
+        """Load an index from a file in the ".gzi" format."""
+        if isinstance(f,basestring):
+            f = open(f,"rb")
+            try:
+                return cls.load_gzi(f,spacing)
+            finally:
+                f.close()
+        data = f.read(8)
+        if len(data) != 8:
+            raise ValueError("not a gzi index")
+        (count,) = struct.unpack("<Q",data)
+        data = f.read(16 * count)
+        if len(data) != 16 * count:
+            raise ValueError("not a gzi index")
+        index = cls(spacing)
+        for i in xrange(0,len(data),16):
+            (c,u) = struct.unpack("<QQ",data[i:i+16])
+            index.add(u,c)
+        return index
+    load_gzi = classmethod(load_gzi)
 
 
 class Decompress(FileWrapper):
@@ -43,9 +241,13 @@ class Decompress(FileWrapper):
     all data read from the file is decompressed on demand, and all data
     written to the file is compressed.
 
-    Subclases must provide compress() and decompress() methods.
+    Subclases must provide compress() and decompress() methods.  When
+    reading a real file, they may also provide _open_native() so that the
+    file is decompressed by the standard library instead.
     """
 
+    _native_rawfile = None
+
     def __init__(self,fileobj,mode=None):
         if mode is None:
             try:
@@ -55,8 +257,15 @@ class Decompress(FileWrapper):
         myFileObj = None
         if "r" in mode:
             if "w" not in mode and "a" not in mode and "+" not in mode:
-                # Nice and easy, just a streaming decompress on read
-                myFileObj = Translate(fileobj,mode=mode,rfunc=self.decompress)
+                # Real files may be decompressed natively, with all the
+                # buffering done in C.  Otherwise it's a streaming
+                # decompress on read.
+                if _is_real_file(fileobj):
+                    myFileObj = self._open_native(fileobj)
+                if myFileObj is not None:
+                    self._native_rawfile = fileobj
+                else:
+                    myFileObj = Translate(fileobj,mode=mode,rfunc=self.decompress)
         else:
             if "-" in mode:
                 # Nice and easy, just a streaming compress on write
@@ -64,13 +273,47 @@ class Decompress(FileWrapper):
         if not myFileObj:
             # Rats, writing + seekabilty == inefficient.
             # Operating in a buffer is the only sensible option
+            # If the compressed data can simply be appended to, flushes
+            # needn't rewrite the whole file.
             myFileObj = Translate(fileobj,mode=mode,rfunc=self.decompress,wfunc=self.compress)
-            myFileObj = FlushableBuffer(myFileObj,mode=mode)
+            appendable = getattr(self.compress,"appendable",False)
+            myFileObj = FlushableBuffer(myFileObj,mode=mode,
+                                        appendable=appendable)
         super(Decompress,self).__init__(myFileObj,mode=mode)
+        if self._native_rawfile is not None and hasattr(fileobj,"name"):
+            self.name = fileobj.name
+
+    def _open_native(self,fileobj):
+        """Open the real file 'fileobj' for reading using the standard library.
+
+        This returns a file object giving the decompressed contents of
+        'fileobj', or None if it should be read using a Translate wrapper.
+        """
+        return None
+
+    def close(self):
+        """Close the object, and the real file behind any native reader."""
+        super(Decompress,self).close()
+        if self._native_rawfile is not None:
+            self._native_rawfile.close()
 
     def _read(self,sizehint=-1):
-        data = super(Decompress,self)._read(sizehint)
-        return data
+        # Read in chunks, so that reading the whole file doesn't also
+        # decompress it all in one go.
+        if sizehint <= 0:
+            sizehint = self._bufsize
+        return super(Decompress,self)._read(sizehint)
+
+
+def _is_real_file(fileobj):
+    """Check whether 'fileobj' is a real file with an OS-level descriptor."""
+    if isinstance(fileobj,filelike.FileLikeBase):
+        return False
+    try:
+        fileobj.fileno()
+    except (AttributeError,IOError,ValueError):
+        return False
+    return True
 
 
 class Compress(FileWrapper):
@@ -105,6 +348,13 @@ class Compress(FileWrapper):
             myFileObj = FlushableBuffer(myFileObj,mode=mode)
         super(Compress,self).__init__(myFileObj,mode=mode)
 
+    def _read(self,sizehint=-1):
+        # Read in chunks, so that reading the whole file doesn't also
+        # compress it all in one go.
+        if sizehint <= 0:
+            sizehint = self._bufsize
+        return super(Compress,self)._read(sizehint)
+
 
 class BZip2Mixin(object):
     """Mixin for Compress/Decompress subclasses using Bzip2."""
@@ -112,7 +362,8 @@ class BZip2Mixin(object):
     def __init__(self,*args,**kwds):
         if not hasattr(self,"compresslevel"):
             self.compresslevel = 9
-        # Compression function with flush and reset.
+        # Compression function with flush and reset.  Each flush finishes
+        # a stream, and further streams can be appended to the file.
         c = [bz2.BZ2Compressor()]
         def compress(data):
             if data == "":
@@ -124,21 +375,387 @@ class BZip2Mixin(object):
             c[0] = bz2.BZ2Compressor()
         compress.flush = c_flush
         compress.reset = c_reset
+        compress.appendable = True
         self.compress = compress
         # Decompression funtion with reset
-        d = [bz2.BZ2Decompressor()]
-        def decompress(data):
-            if data == "":
-                return ""
-            return d[0].decompress(data)
-        def d_reset():
-            d[0] = bz2.BZ2Decompressor()
-        decompress.reset = d_reset
-        self.decompress = decompress
+        if getattr(self,"threads",None):
+            self.decompress = BZ2BlockDecompressor(self.threads)
+        else:
+            d = [bz2.BZ2Decompressor()]
+            pending = [""]
+            carry = [""]
+            counts = [0,0]
+            def decompress(data,max_length=0):
+                if max_length == 0 and not pending[0]:
+                    if data == "":
+                        return ""
+                    return d_feed(data)
+                pending[0] += data
+                return d_more(max_length)
+            def d_feed(data):
+                # A new stream may begin straight after the end of the
+                # last, but anything else found there is ignored.
+                data = carry[0] + data
+                carry[0] = ""
+                output = []
+                while data:
+                    if d[0] is None:
+                        if len(data) < 3 and "BZh".startswith(data):
+                            carry[0] = data
+                            break
+                        if not data.startswith("BZh"):
+                            break
+                        d[0] = bz2.BZ2Decompressor()
+                    try:
+                        output.append(d[0].decompress(data))
+                    except EOFError:
+                        d[0] = None
+                        continue
+                    data = d[0].unused_data
+                    if data:
+                        d[0] = None
+                return "".join(output)
+            def d_more(max_length=0):
+                # BZ2Decompressor can't limit its output, so the input is
+                # fed in pieces sized by the compression ratio seen so far.
+                # Output comes a whole block at a time, so there's no point
+                # aiming for less than a block's worth.
+                data = pending[0]
+                output = []
+                size = 0
+                while data and not (max_length and size >= max_length):
+                    if not max_length:
+                        step = len(data)
+                    elif counts[1]:
+                        target = max(max_length,900*1000)
+                        step = target * counts[0] // counts[1]
+                        step = min(max(step,4),64*1024)
+                    else:
+                        step = 16
+                    out = d_feed(data[:step])
+                    counts[0] += min(step,len(data))
+                    counts[1] += len(out)
+                    output.append(out)
+                    size += len(out)
+                    data = data[step:]
+                pending[0] = data
+                return "".join(output)
+            def d_reset():
+                d[0] = bz2.BZ2Decompressor()
+                pending[0] = ""
+                carry[0] = ""
+                counts[:] = [0,0]
+            decompress.more = d_more
+            decompress.reset = d_reset
+            self.decompress = decompress
         # These can now be used by superclass constructors
         super(BZip2Mixin,self).__init__(*args,**kwds)
 
 
+#  Before python 3.3, BZ2File stops reading at the end of the first stream
+_BZ2FILE_MULTISTREAM = sys.version_info >= (3,3)
+
+#  Magic numbers beginning each bzip2 block, and the end of each stream
+_BZ2_BLOCK_MAGIC = 0x314159265359
+_BZ2_EOS_MAGIC = 0x177245385090
+
+#  Upper bound on the size in bits of a compressed bzip2 block
+_BZ2_MAX_BLOCK_BITS = 2 * 1024 * 1024 * 8
+
+
+def _bz2_patterns(magic):
+    """Get byte strings for finding a 48-bit magic number in a bit stream.
+
+    For each possible bit offset of the magic number within a byte, this
+    gives a tuple (shift,skip,pattern) where 'pattern' is the string of
+    whole bytes covered by the magic number, beginning 'skip' bytes after
+    the byte in which the magic number starts.
+    """
+    patterns = []
+    for shift in xrange(8):
+        window = unhexlify("%014x" % (magic << (8 - shift)))
+        if shift == 0:
+            patterns.append((shift,0,window[:6]))
+        else:
+            patterns.append((shift,1,window[1:6]))
+    return patterns
+
+_BZ2_PATTERNS = [(magic,_bz2_patterns(magic))
+                 for magic in (_BZ2_BLOCK_MAGIC,_BZ2_EOS_MAGIC)]
+
+
+def _get_bits(data,start,nbits):
+    """Get the integer value of <nbits> bits of <data> from bit <start>."""
+    first = start >> 3
+    last = (start + nbits + 7) >> 3
+    value = long(hexlify(data[first:last]) or "0",16)
+    value >>= (last << 3) - start - nbits
+    return value & ((1L << nbits) - 1)
+
+
+class _BZ2Block(object):
+    """A single block of a bzip2 stream, to be decompressed by a worker.
+
+    The block is held as the integer 'value' of its 'nbits' bits, starting
+    with the block magic number.  Once 'done' is set, the decompressed data
+    is available as 'data' or the resulting exception as 'error'.
+    """
+
+    def __init__(self,value,nbits):
+        self.value = value
+        self.nbits = nbits
+        self.data = None
+        self.error = None
+        self.done = threading.Event()
+
+    def merge(self,other):
+        """Merge with the following block, which was wrongly split off."""
+        block = _BZ2Block((self.value << other.nbits) | other.value,
+                          self.nbits + other.nbits)
+        block.run()
+        return block
+
+    def run(self):
+        """Decompress the block as a standalone bzip2 stream.
+
+        The block's own CRC becomes the CRC of the stream, since it is
+        the only block in it.
+        """
+        try:
+            try:
+                crc = (self.value >> (self.nbits - 80)) & 0xffffffffL
+                value = (self.value << 80) | (_BZ2_EOS_MAGIC << 32) | crc
+                nbits = self.nbits + 80
+                pad = -nbits % 8
+                stream = "%0*x" % ((nbits + pad) / 4,value << pad)
+                self.data = bz2.decompress("BZh9" + unhexlify(stream))
+            except Exception, e:
+                self.error = e
+        finally:
+            self.done.set()
+
+
+def _block_worker(tasks):
+    """Background thread for compressing or decompressing blocks."""
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        task.run()
+        del task
+
+
+#  Pools with running worker threads, which are stopped at exit
+_active_pools = weakref.WeakSet()
+
+def _stop_active_pools():
+    for pool in list(_active_pools):
+        pool._stop_workers()
+    for t in threading.enumerate():
+        if t.getName() == "filelike-block-worker":
+            t.join(1)
+atexit.register(_stop_active_pools)
+
+
+class _BlockPool(object):
+    """Base class for functions that process blocks in a pool of threads.
+
+    Tasks are objects with a run() method, which must set their 'done'
+    event when finished.  They are run by 'threads' worker threads, which
+    are started when first needed and stopped by _stop_workers().  Since
+    the workers hold no reference to the pool, they are also stopped when
+    it is garbage-collected.  If 'threads' is zero or None, tasks are run
+    immediately in the calling thread.
+
+    Subclasses keep their tasks in order in the deque self._blocks, from
+    which the results are taken by _collect().
+    """
+
+    def __init__(self,threads,max_pending=None):
+        if max_pending is None:
+            max_pending = 2 * (threads or 0)
+        self.threads = threads
+        self.max_pending = max(max_pending,1)
+        self._tasks = Queue.Queue()
+        self._workers = []
+        self._blocks = deque()
+
+    def __del__(self):
+        self._stop_workers()
+
+    def _run(self,task):
+        """Queue a task to be run by the worker threads."""
+        if not self.threads:
+            task.run()
+            return
+        if len(self._workers) < self.threads:
+            t = threading.Thread(target=_block_worker,args=(self._tasks,),
+                                 name="filelike-block-worker")
+            t.setDaemon(True)
+            t.start()
+            self._workers.append(t)
+            _active_pools.add(self)
+        self._tasks.put(task)
+
+    def _stop_workers(self):
+        """Stop the worker threads; they are restarted when needed."""
+        while self._workers:
+            self._workers.pop()
+            self._tasks.put(None)
+
+    def _collect(self,final):
+        """Collect the results of the tasks that can be output in order.
+
+        Unless 'final' is true, this waits only for enough tasks to bring
+        the number pending down to the limit.
+        """
+        output = []
+        blocks = self._blocks
+        while blocks:
+            if not final and len(blocks) <= self.max_pending:
+                if not blocks[0].done.isSet():
+                    break
+            block = blocks.popleft()
+            block.done.wait()
+            if block.error is not None:
+                raise block.error
+            self._finished(block)
+            output.append(block.data)
+        return "".join(output)
+
+    def _finished(self,task):
+        """Hook called for each task as its result is collected."""
+        pass
+
+
+class BZ2BlockDecompressor(_BlockPool):
+    """Decompression function for bzip2 data, using a pool of threads.
+
+    Each block of a bzip2 stream is compressed independently, and begins
+    with a 48-bit magic number.  Since blocks aren't aligned to byte
+    boundaries, the magic numbers are found by searching for each possible
+    bit offset.  The blocks are passed to 'threads' worker threads, which
+    decompress them concurrently while the GIL is released.  Output is
+    produced in order, with at most 'max_pending' blocks (by default twice
+    the number of threads) waiting to be output at any time.
+
+    The magic number can also appear by chance within a block, so a block
+    that fails to decompress is merged with the one following it and tried
+    again.  Unlike bz2.BZ2Decompressor, this can read files made up of
+    several bzip2 streams, such as those written by pbzip2.
+    """
+
+    def __init__(self,threads,max_pending=None):
+        super(BZ2BlockDecompressor,self).__init__(threads,max_pending)
+        self.reset()
+
+    def reset(self):
+        """Discard all data, ready to decompress a new stream."""
+        self._buffer = ""
+        self._scanned = 0
+        self._start = None
+        self._inBlock = False
+        self._blocks = deque()
+
+    def __call__(self,data):
+        if data == "":
+            return ""
+        self._buffer += data
+        for (start,inBlock) in self._scan():
+            if self._start is not None:
+                self._submit(self._start,start,self._inBlock)
+            self._start = start
+            self._inBlock = inBlock
+        # Discard data before the start of the current block
+        if self._start is None:
+            drop = max(self._scanned >> 3,0)
+        else:
+            drop = self._start >> 3
+            self._start -= drop << 3
+        self._buffer = self._buffer[drop:]
+        self._scanned -= drop << 3
+        return self._output(False)
+
+    def flush(self):
+        """Output all remaining data.
+
+        An incomplete block at the end of the data produces no output, as
+        with bz2.BZ2Decompressor.
+        """
+        try:
+            return self._output(True)
+        finally:
+            self.reset()
+            self._stop_workers()
+
+    def _scan(self):
+        """Find the magic numbers in the buffer that haven't been scanned.
+
+        This returns a sorted list of tuples (start,inBlock) giving the bit
+        position of each magic number, and whether it begins a block rather
+        than ending a stream.
+        """
+        buf = self._buffer
+        nbits = len(buf) << 3
+        found = []
+        for (magic,patterns) in _BZ2_PATTERNS:
+            for (shift,skip,pattern) in patterns:
+                idx = buf.find(pattern,max((self._scanned >> 3) - 1,0))
+                while idx != -1:
+                    start = ((idx - skip) << 3) + shift
+                    if start >= self._scanned and start + 48 <= nbits:
+                        if _get_bits(buf,start,48) == magic:
+                            found.append((start,magic == _BZ2_BLOCK_MAGIC))
+                    idx = buf.find(pattern,idx + 1)
+        self._scanned = max(nbits - 47,self._scanned)
+        found.sort()
+        return found
+
+    def _submit(self,start,end,inBlock):
+        """Queue the data between the given bit positions of the buffer.
+
+        If 'inBlock' is false the data is the end of a stream, which
+        produces no output; it is kept in case it needs to be merged with
+        the preceding block.
+        """
+        block = _BZ2Block(_get_bits(self._buffer,start,end - start),end-start)
+        self._blocks.append(block)
+        if not inBlock:
+            block.data = ""
+            block.done.set()
+            return
+        self._run(block)
+
+    def _output(self,final):
+        """Collect the decompressed data that can be output in order.
+
+        Unless 'final' is true, this waits only for enough blocks to bring
+        the number pending down to the limit.
+        """
+        output = []
+        blocks = self._blocks
+        while blocks:
+            if not final and len(blocks) <= self.max_pending:
+                if not blocks[0].done.isSet():
+                    break
+            block = blocks[0]
+            block.done.wait()
+            while block.error is not None and len(blocks) > 1:
+                if block.nbits > _BZ2_MAX_BLOCK_BITS:
+                    break
+                blocks.popleft()
+                block = blocks[0] = block.merge(blocks[0])
+            if block.error is not None:
+                # It may yet be completed by a block still to be read
+                if final or block.nbits > _BZ2_MAX_BLOCK_BITS:
+                    blocks.popleft()
+                    raise block.error
+                break
+            blocks.popleft()
+            output.append(block.data)
+        return "".join(output)
+
+
 class UnBZip2(BZip2Mixin,Decompress):
     """Class for reading and writing to a un-bziped file.
         
@@ -146,12 +763,37 @@ class UnBZip2(BZip2Mixin,Decompress):
     the standard library, except that it accepts an arbitrary file-like
     object.  All reads from the file are decompressed, all writes are
     compressed.
+
+    If 'threads' is given, blocks of the file are decompressed concurrently
+    by that many threads using a BZ2BlockDecompressor.  Otherwise, a real
+    file opened for reading only is read using bz2.BZ2File, if it can read
+    files made up of several streams on this version of python.
     """
     
-    def __init__(self,fileobj,mode=None,compresslevel=9):
+    def __init__(self,fileobj,mode=None,compresslevel=9,threads=None):
         self.compresslevel = compresslevel
+        self.threads = threads
         super(UnBZip2,self).__init__(fileobj,mode=mode)
 
+    def _open_native(self,fileobj):
+        if self.threads or not _BZ2FILE_MULTISTREAM:
+            return None
+        # BZ2File can only be given a file name, so make sure it names
+        # this very file and that we're reading it from the start.
+        name = getattr(fileobj,"name",None)
+        if not isinstance(name,basestring):
+            return None
+        try:
+            st1 = os.fstat(fileobj.fileno())
+            st2 = os.stat(name)
+            if fileobj.tell() != 0:
+                return None
+        except (EnvironmentError,ValueError):
+            return None
+        if (st1.st_dev,st1.st_ino) != (st2.st_dev,st2.st_ino):
+            return None
+        return bz2.BZ2File(name,"r")
+
 
 class BZip2(BZip2Mixin,Compress):
     """Class for reading and writing a bziped file.
@@ -177,6 +819,143 @@ def _BZip2_decoder(fileobj):
 filelike.open.decoders.append(_BZip2_decoder)
 
 
+#  Header for gzip members, with no file name or modification time
+_GZIP_HEADER = "\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff"
+
+#  Magic number beginning each gzip member
+_GZIP_MAGIC = "\x1f\x8b"
+
+
+class _GzipReader(gzip.GzipFile):
+    """GzipFile ignoring any data after the last member.
+
+    Like the decompression function of GZipMixin, this only reads another
+    member if one begins straight after the last; anything else found
+    there is ignored rather than raising an error.
+    """
+
+    _members = 0
+
+    def _read_gzip_header(self):
+        if self._members:
+            pos = self.fileobj.tell()
+            if self.fileobj.read(2) != _GZIP_MAGIC:
+                raise EOFError("Reached EOF")
+            self.fileobj.seek(pos)
+        self._members += 1
+        gzip.GzipFile._read_gzip_header(self)
+
+    def rewind(self):
+        gzip.GzipFile.rewind(self)
+        self._members = 0
+
+
+class _GZipBlock(object):
+    """A block of data to be compressed by a worker thread.
+
+    The block is compressed as raw deflate data.  Unless it is the 'last'
+    block of a member, it ends with a sync flush so that the next block
+    can be appended to it.  Once 'done' is set, the compressed data is
+    available as 'data' or the resulting exception as 'error'.
+    """
+
+    def __init__(self,data,level,last):
+        self.data = data
+        self.level = level
+        self.last = last
+        self.error = None
+        self.done = threading.Event()
+
+    def run(self):
+        try:
+            try:
+                c = zlib.compressobj(self.level,zlib.DEFLATED,-zlib.MAX_WBITS)
+                if self.last:
+                    mode = zlib.Z_FINISH
+                else:
+                    mode = zlib.Z_SYNC_FLUSH
+                self.data = c.compress(self.data) + c.flush(mode)
+            except Exception, e:
+                self.error = e
+        finally:
+            self.done.set()
+
+
+class GZipBlockCompressor(_BlockPool):
+    """Compression function for gzip data, using a pool of threads.
+
+    Data is split into blocks of 'blocksize' bytes, which are compressed
+    concurrently by 'threads' worker threads while the GIL is released.
+    The compressed blocks are joined in order into a single gzip member,
+    with at most 'max_pending' blocks (by default twice the number of
+    threads) waiting to be output at any time.  Flushing finishes the
+    member, so data written after a flush begins a new member.
+
+    Unlike pigz, blocks are not primed with the end of the previous block,
+    since zlib on this version of python doesn't support a preset
+    dictionary.  This costs a little in compression ratio.
+    """
+
+    appendable = True
+
+    def __init__(self,threads,level=6,blocksize=128*1024,max_pending=None):
+        super(GZipBlockCompressor,self).__init__(threads,max_pending)
+        self.level = level
+        self.blocksize = blocksize
+        self.reset()
+
+    def reset(self):
+        """Discard all data, ready to compress a new member."""
+        self._buffer = []
+        self._buffered = 0
+        self._crc = 0
+        self._size = 0
+        self._started = False
+        self._blocks = deque()
+
+    def __call__(self,data):
+        if data == "":
+            return ""
+        self._crc = zlib.crc32(data,self._crc)
+        self._size += len(data)
+        self._buffer.append(data)
+        self._buffered += len(data)
+        if self._buffered >= self.blocksize:
+            data = "".join(self._buffer)
+            end = len(data) - len(data) % self.blocksize
+            for i in xrange(0,end,self.blocksize):
+                self._submit(data[i:i+self.blocksize],False)
+            self._buffer = [data[end:]]
+            self._buffered = len(data) - end
+        return self._output(False)
+
+    def flush(self):
+        """Finish the current member, returning all remaining output."""
+        try:
+            self._submit("".join(self._buffer),True)
+            output = self._output(True)
+            trailer = struct.pack("<LL",self._crc & 0xffffffffL,
+                                        self._size & 0xffffffffL)
+            return output + trailer
+        finally:
+            self.reset()
+            self._stop_workers()
+
+    def _submit(self,data,last):
+        """Queue a block of data to be compressed."""
+        block = _GZipBlock(data,self.level,last)
+        self._blocks.append(block)
+        self._run(block)
+
+    def _output(self,final):
+        """Collect the compressed data that can be output in order."""
+        output = self._collect(final)
+        if not self._started:
+            self._started = True
+            output = _GZIP_HEADER + output
+        return output
+
+
 class GZipMixin(object):
     """Mixin for Compress/Decompress subclasses using gzip."""
 
@@ -184,27 +963,108 @@ class GZipMixin(object):
         if not hasattr(self,"compresslevel"):
             self.compresslevel = 6
         # Compression function with flush and reset.
-        c = [zlib.compressobj(self.compresslevel)]
-        def compress(data):
-            if data == "":
-                return ""
-            return c[0].compress(data)
-        def c_flush():
-            return c[0].flush()
-        def c_reset():
-            c[0] = zlib.compressobj(self.compresslevel)
-        compress.flush = c_flush
-        compress.reset = c_reset
-        self.compress = compress
-        # Decompression funtion with reset
+        if getattr(self,"threads",None):
+            self.compress = GZipBlockCompressor(self.threads,
+                                                self.compresslevel)
+        else:
+            c = [zlib.compressobj(self.compresslevel,zlib.DEFLATED,
+                                  16+zlib.MAX_WBITS)]
+            def compress(data):
+                if data == "":
+                    return ""
+                return c[0].compress(data)
+            def c_flush():
+                return c[0].flush()
+            def c_reset():
+                c[0] = zlib.compressobj(self.compresslevel,zlib.DEFLATED,
+                                        16+zlib.MAX_WBITS)
+            compress.flush = c_flush
+            compress.reset = c_reset
+            compress.appendable = True
+            self.compress = compress
+        # Decompression funtion with reset and more.  It handles
+        # multi-member files, and keeps count of the data consumed and
+        # produced so that checkpoints can be recorded in self.index.
         d = [zlib.decompressobj(16+zlib.MAX_WBITS)]
-        def decompress(data):
-            if data == "":
+        counts = [0,0]
+        pending = [""]
+        def decompress(data,max_length=0):
+            if data == "" and max_length == 0:
                 return ""
-            return d[0].decompress(data)
+            pending[0] += data
+            return d_more(max_length)
+        def d_more(max_length=0):
+            index = getattr(self,"index",None)
+            # Feed the data in pieces, so checkpoints can be taken
+            # even when it's read in large chunks.
+            if index is None or index.spacing is None:
+                step = None
+            else:
+                step = max(index.spacing // 16,4096)
+            data = pending[0]
+            output = []
+            size = 0
+            while data and not (max_length and size >= max_length):
+                if d[0] is None:
+                    # A new member may begin straight after the end of the
+                    # last, but anything else found there is ignored.
+                    if len(data) < 2 and _GZIP_MAGIC.startswith(data):
+                        break
+                    if not data.startswith(_GZIP_MAGIC):
+                        counts[0] += len(data)
+                        data = ""
+                        break
+                    d[0] = zlib.decompressobj(16+zlib.MAX_WBITS)
+                    if index is not None:
+                        index.add(counts[1],counts[0])
+                if step is None:
+                    piece = data
+                else:
+                    piece = data[:step]
+                rest = data[len(piece):]
+                if max_length:
+                    out = d[0].decompress(piece,max_length - size)
+                else:
+                    out = d[0].decompress(piece)
+                output.append(out)
+                size += len(out)
+                counts[1] += len(out)
+                # At the end of a member, any unconsumed_tail is just a
+                # copy of the unused_data.
+                unused = d[0].unused_data
+                if unused:
+                    tail = unused
+                else:
+                    tail = d[0].unconsumed_tail
+                counts[0] += len(piece) - len(tail)
+                data = tail + rest
+                if unused:
+                    d[0] = None
+                elif index is not None and index.due(counts[1]):
+                    index.add(counts[1],counts[0],d[0].copy())
+            pending[0] = data
+            return "".join(output)
         def d_reset():
             d[0] = zlib.decompressobj(16+zlib.MAX_WBITS)
+            counts[:] = [0,0]
+            pending[0] = ""
+        def d_find_checkpoint(offset):
+            index = getattr(self,"index",None)
+            if index is None:
+                return None
+            return index.find(offset)
+        def d_restore(checkpoint):
+            (u,c,state) = checkpoint
+            if state is None:
+                d[0] = zlib.decompressobj(16+zlib.MAX_WBITS)
+            else:
+                d[0] = state.copy()
+            counts[:] = [c,u]
+            pending[0] = ""
+        decompress.more = d_more
         decompress.reset = d_reset
+        decompress.find_checkpoint = d_find_checkpoint
+        decompress.restore = d_restore
         self.decompress = decompress
         # These can now be used by superclass constructors
         super(GZipMixin,self).__init__(*args,**kwds)
@@ -217,11 +1077,59 @@ class UnGZip(GZipMixin,Decompress):
     the standard library, except that it accepts an arbitrary file-like
     object.  All reads from the file are decompressed, all writes are
     compressed.
+
+    When the file is opened for reading only, checkpoints are recorded in
+    the CheckpointIndex given as 'index' (by default, a new one) so that
+    seeks can resume decompression from the nearest checkpoint instead of
+    the start of the file.  If no index is given and 'fileobj' is a real
+    file, it is instead read using gzip.GzipFile and no checkpoints are
+    recorded until build_index() is called.
+
+    If 'threads' is given, data written to the file is compressed by that
+    many threads using a GZipBlockCompressor.
     """
     
-    def __init__(self,fileobj,mode=None,compresslevel=9):
+    def __init__(self,fileobj,mode=None,compresslevel=9,index=None,
+                 threads=None):
         self.compresslevel = compresslevel
+        self.threads = threads
+        self.index = index
         super(UnGZip,self).__init__(fileobj,mode=mode)
+        if self.index is None and self._native_rawfile is None:
+            self.index = CheckpointIndex()
+
+    def _open_native(self,fileobj):
+        if self.index is not None:
+            return None
+        return _GzipReader(fileobj=fileobj,mode="rb")
+
+    def _seek(self,offset,whence):
+        # GzipFile can't seek relative to the end of the file
+        if whence == 2 and self._native_rawfile is not None:
+            raise NotImplementedError
+        return super(UnGZip,self)._seek(offset,whence)
+
+    def build_index(self):
+        """Read through the whole file to fill in the checkpoint index.
+
+        The file's position is left unchanged, and the index is returned.
+        Only the checkpoints at the start of each member can be saved, so
+        for a file with a single member the index is of use only as long
+        as it's kept in memory.
+        """
+        pos = self.tell()
+        if self._native_rawfile is not None:
+            # GzipFile can't record checkpoints, so switch to decompressing
+            # the file ourselves.
+            self.index = CheckpointIndex()
+            self._fileobj = Translate(self._native_rawfile,mode=self.mode,
+                                      rfunc=self.decompress)
+            self._native_rawfile = None
+        self.seek(self.index.find(pos)[0])
+        while self.read(1024*1024):
+            pass
+        self.seek(pos)
+        return self.index
 
 
 class GZip(GZipMixin,Compress):
@@ -230,10 +1138,14 @@ class GZip(GZipMixin,Compress):
     This class is the dual of UnGZip - it compresses read data, and
     decompresses written data.  Thus GZip(f) is the compressed version
     of f.
+
+    If 'threads' is given, data read from the file is compressed by that
+    many threads using a GZipBlockCompressor.
     """
     
-    def __init__(self,fileobj,mode=None,compresslevel=9):
+    def __init__(self,fileobj,mode=None,compresslevel=9,threads=None):
         self.compresslevel = compresslevel
+        self.threads = threads
         super(GZip,self).__init__(fileobj,mode=mode)
 
 
@@ -242,12 +1154,865 @@ def _GZip_decoder(fileobj):
     """Decoder function for handling .gz files with filelike.open"""
     if not fileobj.name.endswith(".gz"):
         return None
-    f = UnGZip(fileobj)
+    try:
+        index = CheckpointIndex.load(fileobj.name + INDEX_SUFFIX)
+    except (IOError,ValueError):
+        index = None
+    f = UnGZip(fileobj,index=index)
     f.name = fileobj.name[:-3]
     return f
 filelike.open.decoders.append(_GZip_decoder)
 
 
+#  Largest amount of data stored in each BGZF block, as used by bgzip
+_BGZF_BLOCK_DATA = 0xff00
+
+#  The empty block marking the end of a BGZF file
+BGZF_EOF = unhexlify("1f8b08040000000000ff0600424302001b0003000000000000000000")
+
+
+def _bgzf_block_size(data,start=0):
+    """Get the size of the BGZF block beginning at <start> in <data>.
+
+    The size is read from the block's header.  None is returned if <data>
+    doesn't contain the whole header, and IOError raised if it is not the
+    header of a BGZF block.
+    """
+    if len(data) - start < 12:
+        return None
+    if data[start:start+4] != "\x1f\x8b\x08\x04":
+        raise IOError("Not a BGZF block")
+    (xlen,) = struct.unpack("<H",data[start+10:start+12])
+    pos = start + 12
+    end = pos + xlen
+    if len(data) < end:
+        return None
+    while pos + 4 <= end:
+        (slen,) = struct.unpack("<H",data[pos+2:pos+4])
+        if data[pos:pos+2] == "BC" and slen == 2:
+            return struct.unpack("<H",data[pos+4:pos+6])[0] + 1
+        pos += 4 + slen
+    raise IOError("Not a BGZF block")
+
+
+class _BGZFBlock(object):
+    """A BGZF block to be compressed or decompressed by a worker thread.
+
+    If 'level' is None the data is decompressed, otherwise it is compressed
+    into a BGZF block at that level.  Once 'done' is set, the result is
+    available as 'data' or the resulting exception as 'error'.
+    """
+
+    def __init__(self,data,level=None):
+        self.data = data
+        self.level = level
+        self.error = None
+        self.done = threading.Event()
+
+    def run(self):
+        try:
+            try:
+                if self.level is None:
+                    self.data = zlib.decompress(self.data,16+zlib.MAX_WBITS)
+                else:
+                    self.data = self._compress(self.data)
+            except Exception, e:
+                self.error = e
+        finally:
+            self.done.set()
+
+    def _compress(self,data):
+        c = zlib.compressobj(self.level,zlib.DEFLATED,-zlib.MAX_WBITS)
+        cdata = c.compress(data) + c.flush()
+        header = "\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00"
+        header += struct.pack("<H",len(cdata) + 25)
+        trailer = struct.pack("<LL",zlib.crc32(data) & 0xffffffffL,len(data))
+        return header + cdata + trailer
+
+
+class BGZFCompressor(_BlockPool):
+    """Compression function for data in the BGZF format.
+
+    Data is split into blocks of at most 65280 bytes, each compressed as
+    a separate gzip member with an extra field giving its compressed size.
+    If 'threads' is given, blocks are compressed concurrently by that many
+    worker threads.  Flushing writes out any data remaining in a partial
+    block, followed by the empty block that marks the end of the file
+    unless it has just been written.
+    """
+
+    def __init__(self,level=6,threads=None,max_pending=None):
+        super(BGZFCompressor,self).__init__(threads,max_pending)
+        self.level = level
+        self._ended = False
+        self.reset()
+
+    def reset(self):
+        """Discard all data, ready to compress a new file."""
+        self._buffer = []
+        self._buffered = 0
+        self._blocks = deque()
+
+    def __call__(self,data):
+        if data == "":
+            return ""
+        self._ended = False
+        self._buffer.append(data)
+        self._buffered += len(data)
+        if self._buffered >= _BGZF_BLOCK_DATA:
+            data = "".join(self._buffer)
+            end = len(data) - len(data) % _BGZF_BLOCK_DATA
+            for i in xrange(0,end,_BGZF_BLOCK_DATA):
+                self._submit(data[i:i+_BGZF_BLOCK_DATA])
+            self._buffer = [data[end:]]
+            self._buffered = len(data) - end
+        return self._collect(False)
+
+    def flush(self):
+        """Output all remaining blocks, followed by the end-of-file block."""
+        try:
+            if self._buffered:
+                self._submit("".join(self._buffer))
+            output = self._collect(True)
+            if not self._ended:
+                self._ended = True
+                output += BGZF_EOF
+            return output
+        finally:
+            self.reset()
+            self._stop_workers()
+
+    def _submit(self,data):
+        block = _BGZFBlock(data,self.level)
+        self._blocks.append(block)
+        self._run(block)
+
+
+class BGZFDecompressor(_BlockPool):
+    """Decompression function for data in the BGZF format.
+
+    Since the header of each block gives its size, blocks can be found
+    without decompressing them.  If 'threads' is given, they are
+    decompressed concurrently by that many worker threads.  The start of
+    each block is recorded as a restart point in the CheckpointIndex given
+    as 'index', if any, so that seeks can begin at the nearest block.
+    """
+
+    def __init__(self,index=None,threads=None,max_pending=None):
+        super(BGZFDecompressor,self).__init__(threads,max_pending)
+        self.index = index
+        self.reset()
+
+    def reset(self):
+        """Discard all data, ready to decompress from the start of a file."""
+        self.restore((0,0,None))
+
+    def restore(self,checkpoint):
+        """Resume decompression at the start of a block."""
+        (u,c,state) = checkpoint
+        self._buffer = ""
+        self._coffset = c
+        self._uoffset = u
+        self._blocks = deque()
+
+    def find_checkpoint(self,offset):
+        if self.index is None:
+            return None
+        return self.index.find(offset)
+
+    def __call__(self,data):
+        if data == "":
+            return ""
+        buf = self._buffer + data
+        start = 0
+        while True:
+            size = _bgzf_block_size(buf,start)
+            if size is None or len(buf) < start + size:
+                break
+            block = buf[start:start+size]
+            if self.index is not None:
+                self.index.add(self._uoffset,self._coffset)
+            (isize,) = struct.unpack("<L",block[-4:])
+            self._uoffset += isize
+            self._coffset += size
+            start += size
+            block = _BGZFBlock(block)
+            self._blocks.append(block)
+            self._run(block)
+        self._buffer = buf[start:]
+        return self._collect(False)
+
+    def flush(self):
+        """Output all remaining data."""
+        try:
+            if self._buffer:
+                raise IOError("Truncated BGZF block")
+            return self._collect(True)
+        finally:
+            self.reset()
+            self._stop_workers()
+
+
+class BGZipMixin(object):
+    """Mixin for Compress/Decompress subclasses using BGZF."""
+
+    def __init__(self,*args,**kwds):
+        if not hasattr(self,"compresslevel"):
+            self.compresslevel = 6
+        threads = getattr(self,"threads",None)
+        self.compress = BGZFCompressor(self.compresslevel,threads)
+        self.decompress = BGZFDecompressor(getattr(self,"index",None),threads)
+        # These can now be used by superclass constructors
+        super(BGZipMixin,self).__init__(*args,**kwds)
+
+
+class UnBGZip(BGZipMixin,Decompress):
+    """Class for reading and writing to a file in the BGZF format.
+
+    BGZF ("blocked gzip") files are made up of a series of small gzip
+    members, so they can be read by any gzip reader.  Each block records its
+    compressed size, which allows an index of the blocks to be built cheaply
+    and seeks to jump straight to the block containing the target position.
+
+    Positions may also be given as BGZF virtual offsets, which combine the
+    offset of a block in the compressed file with an offset into its data;
+    see seek_virtual() and tell_virtual().
+
+    The index of blocks is kept in the CheckpointIndex given as 'index',
+    by default a new one which is filled in as the file is read.  If
+    'threads' is given, blocks are compressed and decompressed by that many
+    threads.
+    """
+
+    def __init__(self,fileobj,mode=None,compresslevel=6,index=None,
+                 threads=None):
+        self.compresslevel = compresslevel
+        if index is None:
+            index = CheckpointIndex(None)
+        self.index = index
+        self.threads = threads
+        self._rawfile = fileobj
+        super(UnBGZip,self).__init__(fileobj,mode=mode)
+
+    def build_index(self):
+        """Read through the block headers to complete the index.
+
+        Only the header and trailer of each block are read, without any
+        decompression.  The file's position is left unchanged, and the
+        index is returned.
+        """
+        if self._check_mode("w"):
+            self.flush()
+        (u,c,_) = self.index.find_compressed(1L << 62)
+        while True:
+            header = _pread_fileobj(self._rawfile,c,18)
+            size = _bgzf_block_size(header)
+            if size is None:
+                return self.index
+            trailer = _pread_fileobj(self._rawfile,c + size - 4,4)
+            if len(trailer) < 4:
+                return self.index
+            self.index.add(u,c)
+            u += struct.unpack("<L",trailer)[0]
+            c += size
+
+    def _seek(self,offset,whence):
+        # Make sure there's a nearby block to seek to
+        if whence == 0 and not self._writable:
+            if offset > self.index.find(offset)[0] + _BGZF_BLOCK_DATA:
+                self.build_index()
+        return super(UnBGZip,self)._seek(offset,whence)
+
+    def seek_virtual(self,voffset):
+        """Seek to the given BGZF virtual offset.
+
+        The top 48 bits of a virtual offset give the offset in the
+        compressed file of the start of a block, and the bottom 16 bits an
+        offset within that block's data.
+        """
+        coffset = voffset >> 16
+        (u,c,_) = self.index.find_compressed(coffset)
+        if c != coffset:
+            (u,c,_) = self.build_index().find_compressed(coffset)
+            if c != coffset:
+                raise IOError("Invalid virtual offset: %d" % (voffset,))
+        self.seek(u + (voffset & 0xffff))
+
+    def tell_virtual(self):
+        """Get the BGZF virtual offset of the current position."""
+        pos = self.tell()
+        (u,c,_) = self.index.find(pos)
+        if pos - u > 0xffff:
+            (u,c,_) = self.build_index().find(pos)
+        return (c << 16) | (pos - u)
+
+
+class BGZip(BGZipMixin,Compress):
+    """Class for reading and writing a file in the BGZF format.
+
+    This class is the dual of UnBGZip - it compresses read data into the
+    BGZF format, and decompresses written data.  Thus BGZip(f) is the
+    BGZF-compressed version of f.
+    """
+
+    def __init__(self,fileobj,mode=None,compresslevel=6,threads=None):
+        self.compresslevel = compresslevel
+        self.threads = threads
+        super(BGZip,self).__init__(fileobj,mode=mode)
+
+
+def _is_bgzf(fileobj):
+    """Check whether a file opened for reading is in the BGZF format."""
+    mode = getattr(fileobj,"mode","r")
+    if "r" not in mode or "+" in mode:
+        return False
+    try:
+        pos = fileobj.tell()
+        header = fileobj.read(18)
+        fileobj.seek(pos)
+        return _bgzf_block_size(header) is not None
+    except (AttributeError,IOError,NotImplementedError):
+        return False
+
+
+##  Add handling of .bgz files, and .gz files in BGZF format, to
+##  filelike.open().  This must come before the handling of .gz files.
+def _BGZip_decoder(fileobj):
+    """Decoder function for handling BGZF files with filelike.open"""
+    if fileobj.name.endswith(".bgz"):
+        name = fileobj.name[:-4]
+    elif fileobj.name.endswith(".gz") and _is_bgzf(fileobj):
+        name = fileobj.name[:-3]
+    else:
+        return None
+    try:
+        index = CheckpointIndex.load_gzi(fileobj.name + ".gzi")
+    except (IOError,ValueError):
+        index = None
+    f = UnBGZip(fileobj,index=index)
+    f.name = name
+    return f
+filelike.open.decoders.insert(filelike.open.decoders.index(_GZip_decoder),
+                              _BGZip_decoder)
+
+
+#  Magic number beginning each xz stream
+_XZ_MAGIC = "\xfd7zXZ\x00"
+
+
+def _xz_decode_int(data,pos):
+    """Decode a variable-length integer from <data> at <pos>.
+
+    A tuple (value,pos) is returned, giving the position following it.
+    """
+    value = 0
+    shift = 0
+    while True:
+        if pos >= len(data) or shift > 63:
+            raise IOError("Invalid xz index")
+        byte = ord(data[pos])
+        value |= (byte & 0x7f) << shift
+        pos += 1
+        shift += 7
+        if not byte & 0x80:
+            return (value,pos)
+
+def _xz_encode_int(value):
+    """Encode an integer in the variable-length format used by xz."""
+    chars = []
+    while value >= 0x80:
+        chars.append(chr((value & 0x7f) | 0x80))
+        value >>= 7
+    chars.append(chr(value))
+    return "".join(chars)
+
+def _xz_pad(size):
+    """Round a size up to a multiple of four bytes."""
+    return (size + 3) & ~3
+
+def _xz_index(records):
+    """Build an xz index from a list of (unpadded,uncompressed) sizes."""
+    index = ["\x00",_xz_encode_int(len(records))]
+    for (unpadded,usize) in records:
+        index.append(_xz_encode_int(unpadded))
+        index.append(_xz_encode_int(usize))
+    index = "".join(index)
+    index += "\x00" * (_xz_pad(len(index)) - len(index))
+    return index + struct.pack("<L",zlib.crc32(index) & 0xffffffffL)
+
+def _xz_footer(flags,index):
+    """Build the footer for an xz stream with the given flags and index."""
+    footer = struct.pack("<L",len(index) // 4 - 1) + flags
+    return struct.pack("<L",zlib.crc32(footer) & 0xffffffffL) + footer + "YZ"
+
+def _xz_header(flags):
+    """Build the header for an xz stream with the given flags."""
+    return _XZ_MAGIC + flags + struct.pack("<L",zlib.crc32(flags) & 0xffffffffL)
+
+def _xz_parse_index(index):
+    """Get the (unpadded,uncompressed) sizes recorded in an xz index."""
+    if index[:1] != "\x00":
+        raise IOError("Invalid xz index")
+    (count,pos) = _xz_decode_int(index,1)
+    records = []
+    for _ in xrange(count):
+        (unpadded,pos) = _xz_decode_int(index,pos)
+        (usize,pos) = _xz_decode_int(index,pos)
+        records.append((unpadded,usize))
+    return records
+
+
+class XZBlock(object):
+    """A block of an xz file, as located using the file's index.
+
+    'coffset' and 'uoffset' give the position of the block in the
+    compressed and uncompressed data respectively, 'unpadded' and 'usize'
+    its compressed and uncompressed sizes, and 'flags' the flags of the
+    stream containing it.
+    """
+
+    def __init__(self,coffset,uoffset,unpadded,usize,flags):
+        self.coffset = coffset
+        self.uoffset = uoffset
+        self.unpadded = unpadded
+        self.usize = usize
+        self.flags = flags
+
+    def _get_size(self):
+        return _xz_pad(self.unpadded)
+    size = property(_get_size)
+
+    def as_stream(self,data):
+        """Wrap the block's data in a stream of its own.
+
+        'data' must be the compressed data of the block, including any
+        padding.  The resulting stream can be decompressed as normal.
+        """
+        index = _xz_index([(self.unpadded,self.usize)])
+        return _xz_header(self.flags) + data + index + \
+               _xz_footer(self.flags,index)
+
+
+def read_xz_index(fileobj):
+    """Read the index of an xz file, returning a list of XZBlock objects.
+
+    The index is found by working back from the end of the file, so this
+    reads only the headers, footers and indexes of the streams in the file
+    and doesn't change its position.
+    """
+    end = filelike._file_size(fileobj)
+    streams = []
+    while end > 0:
+        # Skip any padding between streams
+        if _pread_fileobj(fileobj,end - 4,4) == "\x00\x00\x00\x00":
+            end -= 4
+            continue
+        footer = _pread_fileobj(fileobj,end - 12,12)
+        if len(footer) != 12 or footer[10:] != "YZ":
+            raise IOError("Not an xz file")
+        flags = footer[8:10]
+        isize = (struct.unpack("<L",footer[4:8])[0] + 1) * 4
+        istart = end - 12 - isize
+        records = _xz_parse_index(_pread_fileobj(fileobj,istart,isize))
+        start = istart - sum([_xz_pad(r[0]) for r in records]) - 12
+        if start < 0 or _pread_fileobj(fileobj,start,12)[:6] != _XZ_MAGIC:
+            raise IOError("Not an xz file")
+        streams.append((start,flags,records))
+        end = start
+    streams.reverse()
+    blocks = []
+    uoffset = 0
+    for (coffset,flags,records) in streams:
+        coffset += 12
+        for (unpadded,usize) in records:
+            blocks.append(XZBlock(coffset,uoffset,unpadded,usize,flags))
+            coffset += _xz_pad(unpadded)
+            uoffset += usize
+    return blocks
+
+
+class _XZTask(object):
+    """A block of an xz file to be compressed or decompressed.
+
+    If 'block' is given, 'data' is the compressed data of that XZBlock and
+    is decompressed.  Otherwise it is compressed into a single xz block
+    with the given 'preset' and 'check', and 'record' set to the block's
+    (unpadded,uncompressed) sizes.
+    """
+
+    def __init__(self,data,block=None,preset=6,check=None):
+        self.data = data
+        self.block = block
+        self.preset = preset
+        self.check = check
+        self.record = None
+        self.error = None
+        self.done = threading.Event()
+
+    def run(self):
+        try:
+            try:
+                if self.block is not None:
+                    stream = self.block.as_stream(self.data)
+                    self.data = lzma.decompress(stream,lzma.FORMAT_XZ)
+                else:
+                    self.data = self._compress(self.data)
+            except Exception, e:
+                self.error = e
+        finally:
+            self.done.set()
+
+    def _compress(self,data):
+        """Compress to a single block, stripped of its stream."""
+        stream = lzma.compress(data,lzma.FORMAT_XZ,self.check,self.preset)
+        isize = (struct.unpack("<L",stream[-8:-4])[0] + 1) * 4
+        istart = len(stream) - 12 - isize
+        [self.record] = _xz_parse_index(stream[istart:-12])
+        return stream[12:istart]
+
+
+class XZBlockCompressor(_BlockPool):
+    """Compression function producing multi-block xz streams.
+
+    Data is split into blocks of 'block_size' bytes, each of which is
+    compressed independently, so that the block can later be decompressed
+    without reading those before it.  If 'threads' is given, blocks are
+    compressed concurrently by that many worker threads.  Flushing ends
+    the stream with its index, so data written after a flush begins a new
+    stream.
+    """
+
+    def __init__(self,block_size=1024*1024,preset=6,check=None,threads=None,
+                 max_pending=None):
+        super(XZBlockCompressor,self).__init__(threads,max_pending)
+        if check is None:
+            check = lzma.CHECK_CRC64
+        self.block_size = block_size
+        self.preset = preset
+        self.check = check
+        self._flags = "\x00" + chr(check)
+        self.reset()
+
+    def reset(self):
+        """Discard all data, ready to compress a new stream."""
+        self._buffer = []
+        self._buffered = 0
+        self._records = []
+        self._started = False
+        self._ended = False
+        self._blocks = deque()
+
+    def __call__(self,data):
+        if data == "":
+            return ""
+        self._ended = False
+        self._buffer.append(data)
+        self._buffered += len(data)
+        if self._buffered >= self.block_size:
+            data = "".join(self._buffer)
+            end = len(data) - len(data) % self.block_size
+            for i in xrange(0,end,self.block_size):
+                self._submit(data[i:i+self.block_size])
+            self._buffer = [data[end:]]
+            self._buffered = len(data) - end
+        return self._output(False)
+
+    def flush(self):
+        """Finish the current stream, returning all remaining output.
+
+        Nothing is output if no data has been given since the last flush,
+        except that an empty stream is produced the first time after a
+        reset.
+        """
+        if self._ended:
+            return ""
+        try:
+            if self._buffered:
+                self._submit("".join(self._buffer))
+            output = self._output(True)
+            index = _xz_index(self._records)
+            return output + index + _xz_footer(self._flags,index)
+        finally:
+            self.reset()
+            self._ended = True
+            self._stop_workers()
+
+    def _submit(self,data):
+        task = _XZTask(data,preset=self.preset,check=self.check)
+        self._blocks.append(task)
+        self._run(task)
+
+    def _finished(self,task):
+        self._records.append(task.record)
+
+    def _output(self,final):
+        """Collect the compressed data that can be output in order."""
+        output = self._collect(final)
+        if not self._started:
+            self._started = True
+            output = _xz_header(self._flags) + output
+        return output
+
+
+class XZDecompressor(_BlockPool):
+    """Decompression function for xz data.
+
+    If 'fileobj' is given, it must be the seekable file from which the
+    compressed data will be read.  Its index is then read using
+    read_xz_index(), each block is decompressed separately, and the start
+    of each block can be used as a checkpoint from which to resume
+    decompression.  If 'threads' is given and the file has several blocks,
+    none bigger than 'max_block' bytes once decompressed, the blocks are
+    decompressed concurrently by that many worker threads.
+
+    Otherwise the data is decompressed incrementally, either block by
+    block or, without 'fileobj', as a single sequential stream.  The more()
+    method is then provided to limit the amount of output, as described
+    for Translate.  Since LZMADecompressor can't limit its output, the
+    input is fed in pieces sized by the compression ratio of the last,
+    so each call may return somewhat more than the maximum requested.
+    """
+
+    def __init__(self,fileobj=None,threads=None,max_pending=None,
+                 max_block=16*1024*1024):
+        super(XZDecompressor,self).__init__(threads,max_pending)
+        self.fileobj = fileobj
+        self.max_block = max_block
+        self.index = None
+        self.reset()
+
+    def reset(self):
+        """Discard all data, ready to decompress from the start of a file.
+
+        Since the file may have been rewritten, its index will be read
+        again when needed.
+        """
+        self._xzblocks = None
+        self._pooled = False
+        self.restore((0,0,None))
+
+    def _get_blocks(self):
+        """Get the list of blocks in the file, reading its index if needed."""
+        if self._xzblocks is None:
+            blocks = self._xzblocks = read_xz_index(self.fileobj)
+            self._starts = [block.coffset for block in blocks]
+            self.index = CheckpointIndex(None)
+            for block in blocks:
+                self.index.add(block.uoffset,block.coffset)
+            if self.threads and len(blocks) > 1:
+                usize = max([block.usize for block in blocks])
+                self._pooled = usize <= self.max_block
+        return self._xzblocks
+
+    def find_checkpoint(self,offset):
+        if self.fileobj is None:
+            return None
+        self._get_blocks()
+        return self.index.find(offset)
+
+    def restore(self,checkpoint):
+        """Resume decompression at the start of a block."""
+        (u,c,state) = checkpoint
+        self._pending = ""
+        self._coffset = c
+        self._next = None
+        self._left = None
+        self._decompressor = None
+        self._step = 4
+        self._blocks = deque()
+
+    def __call__(self,data,max_length=0):
+        if data == "" and max_length == 0:
+            return ""
+        if self.fileobj is not None:
+            self._get_blocks()
+        self._pending += data
+        if self._pooled:
+            return self._submit_blocks()
+        return self.more(max_length)
+
+    def _submit_blocks(self):
+        """Pass each complete block to the worker threads."""
+        blocks = self._xzblocks
+        if self._next is None:
+            self._next = bisect.bisect_left(self._starts,self._coffset)
+        buf = self._pending
+        start = 0
+        while self._next < len(blocks):
+            block = blocks[self._next]
+            bstart = block.coffset - self._coffset
+            if len(buf) < bstart + block.size:
+                start = min(bstart,len(buf))
+                break
+            task = _XZTask(buf[bstart:bstart+block.size],block)
+            self._blocks.append(task)
+            self._run(task)
+            self._next += 1
+            start = bstart + block.size
+        else:
+            start = len(buf)
+        self._pending = buf[start:]
+        self._coffset += start
+        return self._collect(False)
+
+    def more(self,max_length=0):
+        """Decompress further data held back by an earlier call."""
+        if self._pooled:
+            return self._collect(False)
+        data = self._pending
+        output = []
+        size = 0
+        while data and not (max_length and size >= max_length):
+            if self._decompressor is None:
+                if self.fileobj is None:
+                    data = self._start_stream(data)
+                else:
+                    data = self._start_block(data)
+                if self._decompressor is None:
+                    break
+            if max_length:
+                step = min(self._step,len(data))
+            else:
+                step = len(data)
+            if self._left is not None:
+                step = min(step,self._left)
+            piece = data[:step]
+            out = self._decompressor.decompress(piece)
+            output.append(out)
+            size += len(out)
+            data = data[step:]
+            if self._left is not None:
+                self._coffset += step
+                self._left -= step
+                if not self._left:
+                    self._decompressor = None
+                    self._left = None
+                    self._next += 1
+            elif self._decompressor.eof:
+                data = self._decompressor.unused_data + data
+                self._decompressor = None
+            # Aim the next piece at the output still wanted, judging by
+            # the last, but grow it no more than twofold each time since
+            # the compression ratio can change sharply.
+            if max_length and out:
+                wanted = max(max_length - size,1) * step // len(out)
+                self._step = min(max(wanted,1),2 * step,64*1024)
+            elif max_length and step == self._step:
+                self._step = min(2 * step,64*1024)
+        self._pending = data
+        return "".join(output)
+
+    def _start_block(self,data):
+        """Skip to the start of the next block and begin decompressing it.
+
+        The remaining data is returned, or "" if the next block doesn't
+        begin within it.  Data after the last block is ignored.
+        """
+        blocks = self._xzblocks
+        if self._next is None:
+            self._next = bisect.bisect_left(self._starts,self._coffset)
+        if self._next >= len(blocks):
+            self._coffset += len(data)
+            return ""
+        block = blocks[self._next]
+        skip = block.coffset - self._coffset
+        if skip >= len(data):
+            self._coffset += len(data)
+            return ""
+        self._coffset += skip
+        self._decompressor = lzma.LZMADecompressor(lzma.FORMAT_XZ)
+        self._decompressor.decompress(_xz_header(block.flags))
+        self._left = block.size
+        return data[skip:]
+
+    def _start_stream(self,data):
+        """Begin decompressing the next stream, skipping any padding."""
+        data = data.lstrip("\x00")
+        if data:
+            self._decompressor = lzma.LZMADecompressor(lzma.FORMAT_XZ)
+        return data
+
+    def flush(self):
+        """Output all remaining data."""
+        try:
+            return self.more() + self._collect(True)
+        finally:
+            self.reset()
+            self._stop_workers()
+
+
+class LZMAMixin(object):
+    """Mixin for Compress/Decompress subclasses using xz."""
+
+    def __init__(self,fileobj,*args,**kwds):
+        if lzma is None:
+            raise ImportError("the lzma module is required for xz support")
+        if not hasattr(self,"preset"):
+            self.preset = 6
+        if not hasattr(self,"block_size"):
+            self.block_size = 1024*1024
+        threads = getattr(self,"threads",None)
+        self.compress = XZBlockCompressor(self.block_size,self.preset,
+                                          threads=threads)
+        if getattr(self,"_indexed",False):
+            self.decompress = XZDecompressor(fileobj,threads)
+        else:
+            self.decompress = XZDecompressor()
+        # These can now be used by superclass constructors
+        super(LZMAMixin,self).__init__(fileobj,*args,**kwds)
+
+
+class UnLZMA(LZMAMixin,Decompress):
+    """Class for reading and writing to a file in the xz format.
+
+    Data written to the file is compressed in blocks of 'block_size' bytes.
+    When reading, the index at the end of the file is used to find the
+    block containing each position, so seeks only need to decompress a
+    single block.  This requires the underlying file to be seekable.  If
+    'threads' is given, blocks are compressed and decompressed by that
+    many threads.
+
+    This requires the lzma module, or its backport for older versions of
+    python.
+    """
+
+    _indexed = True
+
+    def __init__(self,fileobj,mode=None,preset=6,block_size=1024*1024,
+                 threads=None):
+        self.preset = preset
+        self.block_size = block_size
+        self.threads = threads
+        super(UnLZMA,self).__init__(fileobj,mode=mode)
+
+
+class LZMA(LZMAMixin,Compress):
+    """Class for reading and writing a file in the xz format.
+
+    This class is the dual of UnLZMA - it compresses read data, and
+    decompresses written data.  Thus LZMA(f) is the xz-compressed version
+    of f.
+    """
+
+    def __init__(self,fileobj,mode=None,preset=6,block_size=1024*1024,
+                 threads=None):
+        self.preset = preset
+        self.block_size = block_size
+        self.threads = threads
+        super(LZMA,self).__init__(fileobj,mode=mode)
+
+
+##  Add handling of .xz files to filelike.open()
+def _LZMA_decoder(fileobj):
+    """Decoder function for handling .xz files with filelike.open"""
+    if lzma is None or not fileobj.name.endswith(".xz"):
+        return None
+    f = UnLZMA(fileobj)
+    f.name = fileobj.name[:-3]
+    return f
+filelike.open.decoders.append(_LZMA_decoder)
+
+
 class NullZipMixin(object):
     """Mixin for Compress/Decompress subclasses using NullZip."""
 
@@ -0,0 +1,170 @@
+# filelike/wrappers/extents.py
+#
+# Copyright (C) 2006-2009, Ryan Kelly
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+#
+"""
+
+    filelike.wrappers.extents:  read/write to a list of regions of a file
+
+This module provides the filelike wrapper 'Extents' which exposes several
+non-contiguous portions of a file as a single file.
+
+"""
+
+import bisect
+
+import filelike
+from filelike.wrappers import FileWrapper
+from filelike.wrappers import _pread_fileobj, _pwrite_fileobj
+
+
+class Extents(FileWrapper):
+    """Class for reading/writing a list of regions of a file.
+
+    This file wrapper presents a sequence of regions of a file-like object,
+    known as extents, as if they were a single contiguous file.  Each
+    extent is given as a tuple (offset,length) in the underlying file.
+    For example:
+
+        f = Extents(f,[(100,20),(10,5)])   # bytes 100-119 then 10-14 of f
+
+    This is similar to joining several slices of the same file, but the
+    position of the underlying file is never used; data is accessed using
+    positional reads and writes, so several Extents objects can share the
+    same file.  Extents that are adjacent in the underlying file are
+    merged so that they can be read in a single operation.
+
+    The size of the file is fixed at the total length of the extents, so
+    writes beyond the end raise an IOError and the file can't be truncated.
+    """
+
+    def __init__(self,fileobj,extents,mode=None):
+        """Extents constructor.
+
+        'extents' must be a sequence of (offset,length) tuples giving the
+        regions of 'fileobj' to be accessed, in order.
+        """
+        offsets = []
+        lengths = []
+        for (offset,length) in extents:
+            if offset < 0 or length < 0:
+                raise ValueError("extents cannot be negative: %r" %
+                                 ((offset,length),))
+            if length == 0:
+                continue
+            if offsets and offsets[-1] + lengths[-1] == offset:
+                lengths[-1] += length
+            else:
+                offsets.append(offset)
+                lengths.append(length)
+        self.extents = zip(offsets,lengths)
+        self._offsets = offsets
+        self._lengths = lengths
+        self._starts = []
+        self.size = 0
+        for length in lengths:
+            self._starts.append(self.size)
+            self.size += length
+        self._pos = 0
+        super(Extents,self).__init__(fileobj,mode)
+
+    def _map(self,pos,size):
+        """Find the regions of the underlying file covering a range.
+
+        This generates (offset,length) pairs covering up to 'size' bytes
+        beginning at position 'pos' in the file, or everything to the end
+        of the file if 'size' is negative.
+        """
+        if pos >= self.size:
+            return
+        idx = bisect.bisect_right(self._starts,pos) - 1
+        while idx < len(self._offsets) and size != 0:
+            skip = pos - self._starts[idx]
+            length = self._lengths[idx] - skip
+            if size > 0:
+                length = min(length,size)
+                size -= length
+            yield (self._offsets[idx] + skip,length)
+            pos += length
+            idx += 1
+
+    def _read_at(self,pos,size):
+        """Read up to <size> bytes beginning at position <pos>."""
+        chunks = []
+        for (offset,length) in self._map(pos,size):
+            data = _pread_fileobj(self._fileobj,offset,length)
+            chunks.append(data)
+            # Stop early if the underlying file is shorter than expected
+            if len(data) < length:
+                break
+        return "".join(chunks)
+
+    def _write_at(self,pos,data):
+        """Write the given data beginning at position <pos>."""
+        end = pos + len(data)
+        if end > self.size:
+            data = data[:max(self.size - pos,0)]
+        for (offset,length) in self._map(pos,len(data)):
+            _pwrite_fileobj(self._fileobj,offset,data[:length])
+            data = data[length:]
+        if end > self.size:
+            raise IOError("File not resizable")
+
+    def _read(self,sizehint=-1):
+        """Read approximately <sizehint> bytes from the file."""
+        if self._pos >= self.size:
+            return None
+        data = self._read_at(self._pos,sizehint)
+        if data == "":
+            return None
+        self._pos += len(data)
+        return data
+
+    def _write(self,data,flushing=False):
+        """Write the given string to the file."""
+        pos = self._pos
+        self._pos = min(pos + len(data),self.size)
+        self._write_at(pos,data)
+
+    def _pread(self,offset,size):
+        return self._read_at(offset,size)
+
+    def _pwrite(self,offset,data):
+        self._write_at(offset,data)
+
+    def _seek(self,offset,whence):
+        """Seek within the file."""
+        if whence == 1:
+            offset += self._pos
+        elif whence == 2:
+            offset += self.size
+        elif whence != 0:
+            raise ValueError("Invalid value for whence: " + str(whence))
+        self._pos = min(max(offset,0),self.size)
+
+    def _skip(self,size):
+        self._seek(size,1)
+
+    def _tell(self):
+        """Get position of file pointer."""
+        return self._pos
+
+    def _truncate(self,size):
+        msg = "File extents are not truncatable"
+        raise filelike.NotTruncatableError(msg)
+
@@ -27,7 +27,8 @@ reads/writes to the underlying file are only performed at block boundaries.
 """ 
 
 import filelike
-from filelike.wrappers import FileWrapper
+from filelike.wrappers import FileWrapper, _readinto_fileobj
+from filelike.wrappers import _pread_fileobj, _pwrite_fileobj
 
 
 class FixedBlockSize(FileWrapper):
@@ -71,6 +72,17 @@ class FixedBlockSize(FileWrapper):
             return None
         return data
 
+    def _readinto(self,b):
+        """Read a whole number of blocks directly into the buffer <b>.
+
+        If <b> is smaller than the block size, NotImplementedError is
+        raised so that the data will be read using _read() instead.
+        """
+        size = self._round_down(len(b))
+        if size == 0:
+            raise NotImplementedError
+        return _readinto_fileobj(self._fileobj,b[:size])
+
     def _write(self,data,flushing=False):
         """Write the given string to the file.
 
@@ -86,7 +98,7 @@ class FixedBlockSize(FileWrapper):
             return data[size:]
         # Flushing, so we need to try to pad the data with existing contents.
         # If we can't find such contents, just write at non-blocksize.
-        if self._check_mode("r"):
+        if self._readable:
             nextBlock = self._fileobj.read(self.blocksize)
             self._fileobj.seek(-1*len(nextBlock),1)
         else:
@@ -94,10 +106,34 @@ class FixedBlockSize(FileWrapper):
         padstart = len(data) - size
         self._fileobj.write(data[size:] + nextBlock[padstart:])
         # Seek back to start of previous block, if the file is readable.
-        if self._check_mode("r"):
+        if self._readable:
             self.seek(padstart - self.blocksize,1)
         return ""
 
+    def _pread(self,offset,size):
+        """Read the blocks containing the requested data."""
+        start = self._round_down(offset)
+        end = self._round_up(offset + size)
+        data = _pread_fileobj(self._fileobj,start,end - start)
+        return data[offset-start:offset-start+size]
+
+    def _pwrite(self,offset,data):
+        """Write whole blocks, merging partial ones with existing data.
+
+        Note that this means concurrent writes to the same block may
+        interfere with each other.
+        """
+        start = self._round_down(offset)
+        end = self._round_up(offset + len(data))
+        head = offset - start
+        if head or end != offset + len(data):
+            existing = _pread_fileobj(self._fileobj,start,end - start)
+            prefix = existing[:head]
+            if len(prefix) < head:
+                prefix = prefix + "\0"*(head - len(prefix))
+            data = prefix + data + existing[head+len(data):]
+        _pwrite_fileobj(self._fileobj,start,data)
+
     # TODO: primitive implementation of relative seek
     def _seek(self,offset,whence):
         """Absolute seek, repecting block boundaries.
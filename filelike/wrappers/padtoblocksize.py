@@ -47,7 +47,7 @@ class PadToBlockSize(FileWrapper):
         self._pad_read = ""
         self._pad_unread = ""
         super(PadToBlockSize,self).__init__(fileobj,mode)
-        if "a" in self.mode:
+        if self._appending:
             # Position at the start of the padding, since that's
             # where any additional writes need to happen
             self._pad_unread = self._pad_read
@@ -117,7 +117,7 @@ class PadToBlockSize(FileWrapper):
         # If we are flushing, we need to write the leftovers.
         # If we're in the middle of the file, write out a complete block
         # using the existing file contents.  Only works if readable...
-        if self._check_mode("r"):
+        if self._readable:
             lenNB = self._round_up(len(leftover))
             nextBlock = self._fileobj.read(lenNB)
             self._fileobj.seek(-1*len(nextBlock),1)
@@ -153,8 +153,21 @@ class PadToBlockSize(FileWrapper):
         self._pad_read = ""
         if offset == 0:
             return None
-        # Slow simulation of seek by actually re-reading all the data.
-        boundary = self._round_down(offset)
+        return self._skip(offset)
+
+    def _skip(self,size):
+        """Skip approximately 'size' bytes forward in the file.
+
+        Data is read from the underlying file and discarded, since that's
+        the only way to find out where the padding begins.
+        """
+        # If we're in the padding, just move it from unread to read.
+        if self._pad_read or self._pad_unread:
+            self._pad_read = self._pad_read + self._pad_unread[:size]
+            self._pad_unread = self._pad_unread[size:]
+            return None
+        # Discard whole blocks, stopping at EOF.
+        boundary = self._round_down(size)
         bytes_read = 0
         while bytes_read < boundary:
             data = self._fileobj.read(min(self._bufsize,boundary-bytes_read))
@@ -164,15 +177,15 @@ class PadToBlockSize(FileWrapper):
         # If the boundary is not within the file, we must have seeked right
         # to (or past) the end of the padding.  So just position at end.
         if bytes_read < boundary:
-            data = ""
-            self._pad_read = self._padding("A"*(bytes_read % self.blocksize))
+            size = self._fileobj.tell() % self.blocksize
+            self._pad_read = self._padding("A"*size)
             return None
         # Otherwise, we may have to return some data from the underlying file
         pos = self._fileobj.tell()
-        data = self._fileobj.read(offset-boundary)
+        data = self._fileobj.read(size-boundary)
         self._fileobj.seek(-1*len(data),1)
         assert self._fileobj.tell() == pos, "peeking failed"
-        diff = offset - (len(data) + bytes_read)
+        diff = size - (len(data) + bytes_read)
         assert diff >= 0, "peeking failed"
         if diff > 0:
             # The target offset is somewhere in the padding
@@ -281,7 +294,7 @@ class UnPadToBlockSize(FileWrapper):
             return leftover
         # Flushing, so we need to pad the data.  If the file is readable,
         # check to see if we're in the middle and pad using existing data.
-        if self._check_mode("r"):
+        if self._readable:
             lenNB = self._round_up(len(leftover)+1)
             nextBlock = self._fileobj.read(lenNB)
             self._fileobj.seek(-1*len(nextBlock),1)
@@ -303,20 +316,46 @@ class UnPadToBlockSize(FileWrapper):
         self._pad_seen = ""
         if offset == 0:
             return None
-        data = self._fileobj.read(offset)
+        return self._skip(offset)
+
+    def _skip(self,size):
+        """Skip approximately 'size' bytes forward in the file.
+
+        Whole blocks are read and discarded until we get close to the
+        target, after which we must look for the padding to avoid skipping
+        past the end of the file.
+        """
+        if self._pad_seen:
+            return None
+        chunksize = max(self._round_down(self._bufsize),2*self.blocksize)
+        while size > chunksize + self.blocksize:
+            data = self._fileobj.read(chunksize)
+            if len(data) < chunksize:
+                self._fileobj.seek(-1*len(data),1)
+                break
+            # If the final block might contain the padding, check that
+            # there is more data before discarding it.
+            if "Z" in data[-self.blocksize:]:
+                if self._fileobj.read(1) == "":
+                    self._fileobj.seek(-1*self.blocksize,1)
+                    size -= chunksize - self.blocksize
+                    break
+                self._fileobj.seek(-1,1)
+            size -= chunksize
+        data = self._fileobj.read(size)
         eof = data.rfind("Z")
-        if len(data) < offset:
-            offset = eof
+        if len(data) < size:
+            size = eof
         elif eof != -1 and eof > len(data) - self.blocksize - 1:
             extra = self._fileobj.read(self.blocksize+1)
             data = data + extra
             if len(extra) <= self.blocksize:
                 eof = data.rfind("Z")
-                if eof < offset:
-                    offset = eof
-        boundary = self._round_down(offset)
+                if eof < size:
+                    size = eof
+        boundary = self._round_down(size)
         self._fileobj.seek(boundary-len(data),1)
-        return data[boundary:offset]
+        return data[boundary:size]
 
     def _tell(self):
         return self._fileobj.tell() - len(self._pad_seen)
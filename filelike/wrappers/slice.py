@@ -27,7 +27,9 @@ portion of a file for reading and writing.
 """ 
 
 import filelike
-from filelike.wrappers import FileWrapper
+from filelike.wrappers import FileWrapper, _readinto_fileobj
+from filelike.wrappers import _pread_fileobj, _pwrite_fileobj
+from filelike.wrappers import _get_owner
 
 
 class Slice(FileWrapper):
@@ -50,14 +52,27 @@ class Slice(FileWrapper):
     If 'stop' is negative then it is taken as on offset from the end of the
     file, just like standard list/tuple slicing.
 
+    The slice keeps track of its position in the underlying file rather
+    than calling its tell() method for every read and write.  Several
+    slices may share the same file, each seeking it back to its own
+    position when needed; but the file must not otherwise be moved while
+    the slice is in use, or the slice will read and write at the wrong
+    offset until its seek() method is called.  If the file is shared with
+    other code, specify the 'shared' keyword argument to the constructor;
+    the slice then checks the position of the file before each operation
+    and moves it back if needed.
+
     """
     
-    def __init__(self,fileobj,start=0,stop=None,mode=None,resizable=False):
+    def __init__(self,fileobj,start=0,stop=None,mode=None,resizable=False,
+                 shared=False):
         """Slice constuctor.
 
         'start' and 'stop' are the indicies at which to start and stop the
         slice, and 'resizable' indicates whether the slice is allowed to grow
-        in response to writes beyond the 'stop' index.
+        in response to writes beyond the 'stop' index.  'shared' indicates
+        that the underlying file may be moved by other code between uses
+        of the slice.
         """
         if start < 0:
             raise ValueError("start index cannot be negative.")
@@ -72,14 +87,56 @@ class Slice(FileWrapper):
         self.start = start
         self.stop = stop
         self._resizable = resizable
+        self._pos = None         # cached position in the underlying file
+        if shared:
+            self._owner = None
+        else:
+            self._owner = _get_owner(fileobj)
+        self._token = object()   # marks us as the owner of the position
+        # Writes to a file opened for appending go to its end, wherever
+        # it's positioned, so we can't track them.
+        self._trackWrites = "a" not in getattr(fileobj,"mode","")
         super(Slice,self).__init__(fileobj,mode)
-        if "a" not in self.mode:
-            if self._fileobj.tell() < start:
+        if not self._appending:
+            pos = self._fileobj.tell()
+            if pos < start:
+                pos = start
                 self._fileobj.seek(start)
+            self._set_pos(pos)
+
+    def _get_pos(self):
+        """Get the position of the underlying file.
+
+        The cached position is used if possible.  If another slice has
+        moved the file since it was recorded, the file is moved back.
+        When the cache can't be trusted, the position is checked with
+        tell() and the file moved back if something else has moved it.
+        """
+        owner = self._owner
+        if owner is None:
+            pos = self._fileobj.tell()
+            if self._pos is not None and pos != self._pos:
+                self._fileobj.seek(self._pos,0)
+                return self._pos
+            self._pos = pos
+            return pos
+        if self._pos is None:
+            self._pos = self._fileobj.tell()
+            owner[0] = self._token
+        elif owner[0] is not self._token:
+            self._fileobj.seek(self._pos,0)
+            owner[0] = self._token
+        return self._pos
+
+    def _set_pos(self,pos):
+        """Record that we have moved the underlying file to <pos>."""
+        self._pos = pos
+        if self._owner is not None:
+            self._owner[0] = self._token
     
     def _read(self,size=-1):
         """Read approximately <size> bytes from the file."""
-        pos = self._fileobj.tell()
+        pos = self._get_pos()
         if self.stop is not None:
             if size < 0:
                 size = self.stop - pos
@@ -90,24 +147,66 @@ class Slice(FileWrapper):
         data = self._fileobj.read(size)
         if data == "":
             return None
+        self._pos = pos + len(data)
         return data
 
+    def _readinto(self,b):
+        """Read data directly into the buffer <b>."""
+        pos = self._get_pos()
+        if self.stop is not None:
+            size = self.stop - pos
+            if size <= 0:
+                return None
+            if size < len(b):
+                b = b[:size]
+        n = _readinto_fileobj(self._fileobj,b)
+        if n is not None:
+            self._pos = pos + n
+        return n
+
     def _write(self,data,flushing=False):
         """Write the given string to the file."""
-        if self.stop is None:
-            self._fileobj.write(data)
-        else:
-            pos = self._fileobj.tell()
+        pos = self._get_pos()
+        if self.stop is not None:
             end = pos + len(data)
             if end > self.stop:
                 if self._resizable:
                     self.stop = end
-                    self._fileobj.write(data)
                 else:
-                    self._fileobj.write(data[:(self.stop - pos)])
+                    data = data[:(self.stop - pos)]
+                    self._write_at(pos,data)
                     raise IOError("File not resizable")
-            else:
-                self._fileobj.write(data)
+        self._write_at(pos,data)
+
+    def _write_at(self,pos,data):
+        """Write data to the underlying file, which is positioned at <pos>."""
+        self._fileobj.write(data)
+        if self._trackWrites:
+            self._pos = pos + len(data)
+        else:
+            self._pos = None
+
+    def _pread(self,offset,size):
+        """Read data from the given offset within the slice."""
+        if self.stop is not None:
+            size = min(size,self.stop - self.start - offset)
+        if size <= 0:
+            return ""
+        return _pread_fileobj(self._fileobj,self.start + offset,size)
+
+    def _pwrite(self,data_offset,data):
+        """Write data at the given offset within the slice."""
+        offset = self.start + data_offset
+        if self.stop is not None:
+            end = offset + len(data)
+            if end > self.stop:
+                if self._resizable:
+                    self.stop = end
+                else:
+                    _pwrite_fileobj(self._fileobj,offset,
+                                    data[:max(self.stop - offset,0)])
+                    raise IOError("File not resizable")
+        _pwrite_fileobj(self._fileobj,offset,data)
 
     def _seek(self,offset,whence):
         """Seek within the file."""
@@ -122,21 +221,25 @@ class Slice(FileWrapper):
                     else:
                         offset = self.stop
             self._fileobj.seek(offset,0)
+            self._set_pos(offset)
         elif whence == 1:
-            pos = self._fileobj.tell()
-            if pos + offset < self.start:
-                offset = self.start - pos
+            pos = self._get_pos() + offset
+            if pos < self.start:
+                pos = self.start
             if self.stop is not None:
-                if pos + offset > self.stop:
-                    offset = self.stop - pos
-            self._fileobj.seek(offset,1)
+                if pos > self.stop:
+                    pos = self.stop
+            self._fileobj.seek(pos,0)
+            self._set_pos(pos)
         elif whence == 2:
             if self.stop is None:
                 self._fileobj.seek(offset,2)
+                self._set_pos(None)
                 if offset < 0:
-                    pos = self._fileobj.tell()
+                    pos = self._get_pos()
                     if pos < self.start:
                         self._fileobj.seek(self.start,0)
+                        self._set_pos(self.start)
             else:
                 if offset > 0 and not self._resizable:
                     offset = self.stop - self.start
@@ -148,7 +251,36 @@ class Slice(FileWrapper):
 
     def _tell(self):
         """Get position of file pointer."""
-        return self._fileobj.tell() - self.start
+        return self._get_pos() - self.start
+
+    def _raw_region(self,offset):
+        region = filelike._raw_file_region(self._fileobj,self.start + offset)
+        if region is None or self.stop is None:
+            return region
+        (raw,raw_offset,size) = region
+        available = max(self.stop - self.start - offset,0)
+        if size is None or available < size:
+            size = available
+        return (raw,raw_offset,size)
+
+    def window(self,start=0,length=None):
+        """Get a read-only view of a region of the slice, without copying.
+
+        This requires the underlying file to provide a window() method,
+        as MmapFile does.
+        """
+        try:
+            window = self._fileobj.window
+        except AttributeError:
+            raise IOError("Underlying file does not support windows")
+        if self._wbuffer:
+            self.flush()
+        start = self.start + start
+        if self.stop is not None:
+            start = min(start,self.stop)
+            if length is None or start + length > self.stop:
+                length = self.stop - start
+        return window(start,length)
 
     def _truncate(self,size):
         msg = "File slices are not truncatable"
@@ -1,13 +1,20 @@
 
-from filelike.wrappers import BZip2, UnBZip2, GZip, UnGZip
+from filelike.wrappers import BZip2, UnBZip2, GZip, UnGZip, CheckpointIndex
+from filelike.wrappers import BGZip, UnBGZip
+from filelike.wrappers import LZMA, UnLZMA
+from filelike.wrappers.compress import BGZF_EOF, lzma, read_xz_index
+from filelike.wrappers.compress import XZDecompressor
+from filelike.wrappers.compress import _BZ2FILE_MULTISTREAM
 from filelike import tests
 from filelike.wrappers.tests.test_buffer import get_buffered_value, def_getvalue_maybe_buffered
 
 import unittest
 from StringIO import StringIO
+from distutils.spawn import find_executable
 
 import bz2
 import gzip
+import zlib
 
 
 class Test_BZip2(tests.Test_ReadWriteSeek):
@@ -45,6 +52,12 @@ class Test_BZip2(tests.Test_ReadWriteSeek):
         c = self.file.read(10)
         self.assertEquals(c,self.contents[:10])
 
+    def test_pwrite(self):
+        self.assertEquals(self.file.read(3),self.contents[:3])
+        self.file.pwrite(6,self.contents[6:11])
+        self.assertEquals(self.file.tell(),3)
+        self.assertEquals(self.file.read(8),self.contents[3:11])
+
     def test_resulting_file(self):
         """Make sure BZip2 changes are pushed through to actual file."""
         import tempfile
@@ -96,6 +109,110 @@ class Test_UnBZip2(tests.Test_ReadWrite):
         finally:
           os.unlink(fn)
 
+    def test_bounded_read(self):
+        contents = "".join(["%d\n" % (i,) for i in xrange(500000)])
+        f = UnBZip2(StringIO(bz2.compress(contents,1)),"r")
+        # Output comes a whole block at a time, but no more than that
+        size = 0
+        data = f._fileobj._read(1024)
+        while data is not None:
+            self.assert_(len(data) <= 2*100*1000)
+            size += len(data)
+            data = f._fileobj._read(1024)
+        self.assertEquals(size,len(contents))
+
+    def test_native_file(self):
+        import tempfile
+        import os
+        contents = "".join(["%d\n" % (i,) for i in xrange(10000)])
+        (fd,fn) = tempfile.mkstemp()
+        os.write(fd,bz2.compress(contents))
+        os.close(fd)
+        try:
+            raw = open(fn,"rb")
+            f = UnBZip2(raw,"r")
+            native = isinstance(f._fileobj,bz2.BZ2File)
+            self.assertEquals(native,_BZ2FILE_MULTISTREAM)
+            self.assertEquals(f.read(10),contents[:10])
+            f.seek(-10,2)
+            self.assertEquals(f.read(),contents[-10:])
+            f.seek(100)
+            self.assertEquals(f.read(10),contents[100:110])
+            f.close()
+            self.assert_(raw.closed)
+            # Files not read from the start use the generic code
+            raw = open(fn,"rb")
+            raw.read(1)
+            f = UnBZip2(raw,"r")
+            self.assert_(not isinstance(f._fileobj,bz2.BZ2File))
+            f.close()
+        finally:
+            os.unlink(fn)
+
+    def test_incremental_flush(self):
+        s = StringIO(bz2.compress("hello "))
+        orig = s.getvalue()
+        f = UnBZip2(s,"a")
+        f.write("big ")
+        f.flush()
+        # Appended data goes out as new streams after the existing ones
+        self.assertEquals(s.getvalue(),orig + bz2.compress("big "))
+        f.write("world!")
+        f.flush()
+        self.assertEquals(s.getvalue(),orig + bz2.compress("big ") +
+                                       bz2.compress("world!"))
+        self.assertEquals(UnBZip2(StringIO(s.getvalue()),"r").read(),
+                          "hello big world!")
+        f.close()
+        # Changes to earlier data still rewrite the whole file
+        s = StringIO(bz2.compress("hello "))
+        f = UnBZip2(s,"r+")
+        self.assertEquals(f.read(),"hello ")
+        f.write("world!")
+        f.flush()
+        self.assertEquals(s.getvalue(),bz2.compress("hello ") +
+                                       bz2.compress("world!"))
+        f.seek(0)
+        f.write("j")
+        f.flush()
+        self.assertEquals(s.getvalue(),bz2.compress("jello world!"))
+        f.close()
+
+
+class Test_UnBZip2Threads(Test_UnBZip2):
+    """Testcases for UnBZip2 wrapper class with parallel decompression."""
+
+    def makeFile(self,contents,mode):
+        s = StringIO(bz2.compress(contents))
+        f = UnBZip2(s,mode,threads=3)
+        f.getvalue = def_getvalue_maybe_buffered(f,s,bz2.decompress)
+        return f
+
+    def test_many_blocks(self):
+        lines = ["%d %s\n" % (i,"abcdefgh"[:i%9]*(i%7)) for i in xrange(60000)]
+        contents = "".join(lines)
+        f = UnBZip2(StringIO(bz2.compress(contents,1)),"r",threads=3)
+        self.assertEquals(f.read(),contents)
+        f = UnBZip2(StringIO(bz2.compress(contents,1)),"r",threads=3)
+        data = []
+        chunk = f.read(12345)
+        while chunk:
+            data.append(chunk)
+            chunk = f.read(12345)
+        self.assertEquals("".join(data),contents)
+
+    def test_multiple_streams(self):
+        contents = "".join(["%d\n" % (i,) for i in xrange(100000)])
+        s = StringIO(bz2.compress(contents[:1000]) + bz2.compress(contents[1000:],1))
+        f = UnBZip2(s,"r",threads=2)
+        self.assertEquals(f.read(),contents)
+
+    def test_corrupt_data(self):
+        data = bz2.compress("hello world" * 1000)
+        data = data[:20] + "X"*20 + data[40:]
+        f = UnBZip2(StringIO(data),"r",threads=2)
+        self.assertRaises(IOError,f.read)
+
 
 def gz_compress(data):
     s = StringIO()
@@ -178,6 +295,114 @@ class Test_UnGZip(tests.Test_ReadWrite):
         f.getvalue = def_getvalue_maybe_buffered(f,s,gz_decompress)
         return f
 
+    def test_bounded_read(self):
+        contents = "\0" * (20*1024*1024)
+        f = UnGZip(StringIO(gz_compress(contents)),"r")
+        size = 0
+        data = f._fileobj._read(1024)
+        while data is not None:
+            self.assert_(len(data) <= f._fileobj._bufsize)
+            size += len(data)
+            data = f._fileobj._read(1024)
+        self.assertEquals(size,len(contents))
+        f = UnGZip(StringIO(gz_compress(contents)),"r")
+        self.assertEquals(f.read(),contents)
+
+    def test_native_file(self):
+        import tempfile
+        import os
+        contents = "".join(["%d\n" % (i,) for i in xrange(10000)])
+        (fd,fn) = tempfile.mkstemp()
+        os.write(fd,gz_compress(contents))
+        os.close(fd)
+        try:
+            raw = open(fn,"rb")
+            f = UnGZip(raw,"r")
+            self.assert_(isinstance(f._fileobj,gzip.GzipFile))
+            self.assertEquals(f.index,None)
+            self.assertEquals(f.read(10),contents[:10])
+            f.seek(-10,2)
+            self.assertEquals(f.read(),contents[-10:])
+            f.seek(100)
+            self.assertEquals(f.read(10),contents[100:110])
+            # Building an index switches to the generic code
+            self.assertEquals(len(f.build_index()),1)
+            self.assert_(not isinstance(f._fileobj,gzip.GzipFile))
+            self.assertEquals(f.tell(),110)
+            self.assertEquals(f.read(10),contents[110:120])
+            f.close()
+            self.assert_(raw.closed)
+            # An index given up front also needs the generic code
+            f = UnGZip(open(fn,"rb"),"r",index=CheckpointIndex())
+            self.assert_(not isinstance(f._fileobj,gzip.GzipFile))
+            f.close()
+        finally:
+            os.unlink(fn)
+
+    def test_trailing_data(self):
+        # Padding and junk after the last member are ignored, like gzip does
+        data = gz_compress("hello") + gz_compress(" world")
+        f = UnGZip(StringIO(data + "\0"*512),"r")
+        self.assertEquals(f.read(),"hello world")
+        f = UnGZip(StringIO(data + "trailing junk"),"r")
+        self.assertEquals(f.read(),"hello world")
+        f = UnGZip(StringIO(data + "\x1f"),"r")
+        self.assertEquals(f.read(),"hello world")
+
+    def test_native_trailing_data(self):
+        import tempfile
+        import os
+        data = gz_compress("hello") + gz_compress(" world")
+        (fd,fn) = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            for tail in ("\0"*512,"trailing junk","\x1f"):
+                f = open(fn,"wb")
+                f.write(data + tail)
+                f.close()
+                # The native and generic readers agree on trailing data
+                f = UnGZip(open(fn,"rb"),"r")
+                self.assert_(isinstance(f._fileobj,gzip.GzipFile))
+                self.assertEquals(f.read(),"hello world")
+                f.seek(3)
+                self.assertEquals(f.read(),"lo world")
+                f.close()
+                f = UnGZip(StringIO(data + tail),"r")
+                self.assertEquals(f.read(),"hello world")
+        finally:
+            os.unlink(fn)
+
+    def test_incremental_flush(self):
+        s = StringIO(gz_compress("hello "))
+        orig = s.getvalue()
+        f = UnGZip(s,"a")
+        f.write("big ")
+        f.flush()
+        # Appended data goes out as new members after the existing ones
+        data = s.getvalue()
+        self.assert_(data.startswith(orig))
+        self.assertEquals(gz_decompress(data[len(orig):]),"big ")
+        f.write("world!")
+        f.flush()
+        self.assert_(s.getvalue().startswith(data))
+        self.assertEquals(gz_decompress(s.getvalue()[len(data):]),"world!")
+        self.assertEquals(gz_decompress(s.getvalue()),"hello big world!")
+        f.close()
+        # Changes to earlier data still rewrite the whole file
+        s = StringIO(gz_compress("hello "))
+        f = UnGZip(s,"r+")
+        self.assertEquals(f.read(),"hello ")
+        f.write("world!")
+        f.flush()
+        self.assertEquals(gz_decompress(s.getvalue()),"hello world!")
+        size = len(s.getvalue())
+        f.seek(0)
+        f.write("j")
+        f.flush()
+        self.assert_(len(s.getvalue()) < size)
+        self.assertEquals(gz_decompress(s.getvalue()),"jello world!")
+        f.close()
+
     def test_resulting_file(self):
         """Make sure UnBZip2 changes are pushed through to actual file."""
         import tempfile
@@ -198,3 +423,371 @@ class Test_UnGZip(tests.Test_ReadWrite):
         finally:
           os.unlink(fn)
 
+
+class Test_UnGZipThreads(Test_UnGZip):
+    """Testcases for UnGZip wrapper class with parallel compression."""
+
+    def makeFile(self,contents,mode):
+        s = StringIO(gz_compress(contents))
+        f = UnGZip(s,mode,threads=3)
+        f.getvalue = def_getvalue_maybe_buffered(f,s,gz_decompress)
+        return f
+
+    def test_resulting_file(self):
+        s = StringIO(gz_compress("hello world!"))
+        f = UnGZip(s,"r+",threads=3)
+        f.read(6)
+        f.write("Australia!")
+        f.flush()
+        self.assertEquals(gz_decompress(s.getvalue()),"hello Australia!")
+
+    def test_many_blocks(self):
+        lines = ["%d %s\n" % (i,"abcdefgh"[:i%9]*(i%7)) for i in xrange(60000)]
+        contents = "".join(lines)
+        s = StringIO()
+        f = UnGZip(s,"w-",threads=3)
+        f.compress.blocksize = 10000
+        for i in xrange(0,len(contents),7777):
+            f.write(contents[i:i+7777])
+        f.flush()
+        self.assertEquals(gz_decompress(s.getvalue()),contents)
+        self.assertEquals(zlib.decompress(s.getvalue(),16+zlib.MAX_WBITS),
+                          contents)
+        f.write("extra data")
+        f.flush()
+        self.assertEquals(gz_decompress(s.getvalue()),contents + "extra data")
+
+    def test_compress_on_read(self):
+        contents = "".join(["%d\n" % (i,) for i in xrange(100000)])
+        f = GZip(StringIO(contents),"r",threads=2)
+        self.assertEquals(gz_decompress(f.read()),contents)
+
+
+class CountingStringIO(StringIO):
+    """StringIO keeping count of the data read from it."""
+
+    nread = 0
+
+    def read(self,size=-1):
+        data = StringIO.read(self,size)
+        self.nread += len(data)
+        return data
+
+
+class Test_UnGZipCheckpoints(unittest.TestCase):
+    """Testcases for seeking in UnGZip files using checkpoints."""
+
+    contents = "".join(["line %d of some test data\n" % i for i in xrange(20000)])
+
+    def test_seek_checkpoints(self):
+        s = CountingStringIO(gz_compress(self.contents))
+        f = UnGZip(s,"r",index=CheckpointIndex(32*1024))
+        f.build_index()
+        self.assert_(len(f.index) > 10)
+        # Data is only decompressed from the nearest checkpoint
+        f._fileobj.enable_stats()
+        for pos in (400000,1234,250000,len(self.contents)-10,0,300001):
+            f.seek(pos)
+            self.assertEquals(f.tell(),pos)
+            self.assertEquals(f.read(100),self.contents[pos:pos+100])
+        discarded = f._fileobj.get_stats()["discarded"]
+        self.assert_(discarded < 6*64*1024)
+
+    def test_multiple_members(self):
+        data = "".join([gz_compress(self.contents[i:i+100000])
+                        for i in xrange(0,len(self.contents),100000)])
+        f = UnGZip(StringIO(data),"r",index=CheckpointIndex(None))
+        self.assertEquals(f.read(),self.contents)
+        self.assertEquals(len(f.index),6)
+        f.seek(310000)
+        self.assertEquals(f.read(20),self.contents[310000:310020])
+
+    def test_sidecar(self):
+        import tempfile
+        import os
+        import filelike
+        data = "".join([gz_compress(self.contents[i:i+100000])
+                        for i in xrange(0,len(self.contents),100000)])
+        (fd,fn) = tempfile.mkstemp(suffix=".gz")
+        os.write(fd,data)
+        os.close(fd)
+        try:
+            f = filelike.open(fn)
+            f.build_index().save(fn + ".fidx")
+            f.close()
+            f = filelike.open(fn)
+            self.assertEquals(len(f.index),6)
+            f.seek(410000)
+            self.assertEquals(f.read(20),self.contents[410000:410020])
+            f.close()
+            os.unlink(fn + ".fidx")
+        finally:
+            os.unlink(fn)
+
+
+    def test_sidecar_single_member(self):
+        import warnings
+        data = gz_compress(self.contents)
+        f = UnGZip(StringIO(data),"r",index=CheckpointIndex(32*1024))
+        index = f.build_index()
+        self.assert_(len(index) > 10)
+        s = StringIO()
+        w = warnings.catch_warnings(record=True)
+        caught = w.__enter__()
+        try:
+            warnings.simplefilter("always")
+            index.save(s)
+        finally:
+            w.__exit__()
+        self.assertEquals(len(caught),1)
+        s.seek(0)
+        self.assertEquals(len(CheckpointIndex.load(s)),1)
+
+def bgzf_compress(data):
+    return BGZip(StringIO(data),"r").read()
+
+def bgzf_decompress(data):
+    return UnBGZip(StringIO(data),"r").read()
+
+
+class Test_UnBGZip(tests.Test_ReadWrite):
+    """Testcases for UnBGZip wrapper class."""
+
+    contents = "This is my uncompressed\n test data"
+    threads = None
+
+    def makeFile(self,contents,mode):
+        s = StringIO(bgzf_compress(contents))
+        f = UnBGZip(s,mode,threads=self.threads)
+        f.getvalue = def_getvalue_maybe_buffered(f,s,bgzf_decompress)
+        return f
+
+    def test_gzip_compatible(self):
+        contents = "".join(["%d\n" % (i,) for i in xrange(100000)])
+        s = StringIO()
+        f = UnBGZip(s,"w",threads=self.threads)
+        f.write(contents)
+        f.flush()
+        self.assertEquals(gz_decompress(s.getvalue()),contents)
+        self.assert_(s.getvalue().endswith(BGZF_EOF))
+
+    def test_seek_blocks(self):
+        contents = "".join(["%d\n" % (i,) for i in xrange(400000)])
+        s = CountingStringIO(bgzf_compress(contents))
+        f = UnBGZip(s,"r",threads=self.threads)
+        for pos in (1600000,1234,250000,len(contents)-10,0,900001):
+            s.nread = 0
+            f.seek(pos)
+            self.assertEquals(f.tell(),pos)
+            self.assertEquals(f.read(100),contents[pos:pos+100])
+            self.assert_(s.nread < len(s.getvalue()) / 4)
+
+    def test_virtual_offsets(self):
+        contents = "".join(["%d\n" % (i,) for i in xrange(100000)])
+        f = UnBGZip(StringIO(bgzf_compress(contents)),"r",threads=self.threads)
+        offsets = []
+        for pos in (0,65279,65280,300001,len(contents)):
+            f.seek(pos)
+            offsets.append((pos,f.tell_virtual()))
+        self.assertEquals(offsets[0][1],0)
+        self.assertEquals(offsets[1][1],65279)
+        for (pos,voffset) in reversed(offsets):
+            f.seek_virtual(voffset)
+            self.assertEquals(f.tell(),pos)
+            self.assertEquals(f.read(10),contents[pos:pos+10])
+        self.assertRaises(IOError,f.seek_virtual,(12345 << 16))
+
+    def test_gzi_index(self):
+        import tempfile
+        import os
+        import filelike
+        contents = "".join(["%d\n" % (i,) for i in xrange(100000)])
+        (fd,fn) = tempfile.mkstemp(suffix=".gz")
+        os.write(fd,bgzf_compress(contents))
+        os.close(fd)
+        try:
+            f = filelike.open(fn)
+            self.assert_(isinstance(f,UnBGZip))
+            self.assertEquals(len(f.index),1)
+            f.build_index().save_gzi(fn + ".gzi")
+            f.close()
+            f = filelike.open(fn)
+            self.assertEquals(len(f.index),len(contents) / 65280 + 2)
+            f.seek(410000)
+            self.assertEquals(f.read(20),contents[410000:410020])
+            f.close()
+            os.unlink(fn + ".gzi")
+        finally:
+            os.unlink(fn)
+
+
+class Test_UnBGZipThreads(Test_UnBGZip):
+    """Testcases for UnBGZip wrapper class using threads."""
+
+    threads = 3
+
+
+if lzma is not None:
+
+    class Test_LZMA(tests.Test_ReadWriteSeek):
+        """Testcases for LZMA wrapper class."""
+
+        contents = lzma.compress("This is my compressed\n test data")
+        empty_contents = lzma.compress("")
+
+        def makeFile(self,contents,mode):
+            s = StringIO(lzma.decompress(contents))
+            f = LZMA(s,mode)
+            f.getvalue = def_getvalue_maybe_buffered(f,s,lzma.compress)
+            return f
+
+        #  We can't just write arbitrary text into an xz stream, so we have
+        #  to adjust these tests
+
+        def test_write_read(self):
+            self.file.write(self.contents[0:5])
+            c = self.file.read()
+            self.assertEquals(c,self.contents[5:])
+
+        def test_read_write_read(self):
+            c = self.file.read(5)
+            self.assertEquals(c,self.contents[:5])
+            self.file.write(self.contents[5:10])
+            c = self.file.read(5)
+            self.assertEquals(c,self.contents[10:15])
+
+        def test_read_write_seek(self):
+            c = self.file.read(5)
+            self.assertEquals(c,self.contents[:5])
+            self.file.write(self.contents[5:10])
+            self.file.seek(0)
+            c = self.file.read(10)
+            self.assertEquals(c,self.contents[:10])
+
+        def test_pwrite(self):
+            self.assertEquals(self.file.read(3),self.contents[:3])
+            self.file.pwrite(6,self.contents[6:11])
+            self.assertEquals(self.file.tell(),3)
+            self.assertEquals(self.file.read(8),self.contents[3:11])
+
+
+    class Test_UnLZMA(tests.Test_ReadWrite):
+        """Testcases for UnLZMA wrapper class."""
+
+        contents = "This is my uncompressed\n test data"
+        threads = None
+
+        def makeFile(self,contents,mode):
+            s = StringIO(lzma.compress(contents))
+            f = UnLZMA(s,mode,threads=self.threads)
+            f.getvalue = def_getvalue_maybe_buffered(f,s,lzma.decompress)
+            return f
+
+        def test_blocks(self):
+            contents = "".join(["%d\n" % (i,) for i in xrange(100000)])
+            s = StringIO()
+            f = UnLZMA(s,"w",preset=1,block_size=50000,threads=self.threads)
+            f.write(contents)
+            f.flush()
+            self.assertEquals(lzma.decompress(s.getvalue()),contents)
+            blocks = read_xz_index(s)
+            self.assertEquals(len(blocks),len(contents) / 50000 + 1)
+            self.assertEquals(blocks[3].uoffset,150000)
+
+        def test_seek_blocks(self):
+            contents = "".join(["%d\n" % (i,) for i in xrange(400000)])
+            s = StringIO()
+            f = UnLZMA(s,"w",preset=1,block_size=50000)
+            f.write(contents)
+            f.flush()
+            s = CountingStringIO(s.getvalue())
+            f = UnLZMA(s,"r",threads=self.threads)
+            for pos in (1600000,1234,900000,len(contents)-10,0,1200001):
+                s.nread = 0
+                f.seek(pos)
+                self.assertEquals(f.tell(),pos)
+                self.assertEquals(f.read(100),contents[pos:pos+100])
+                self.assert_(s.nread < len(s.getvalue()) / 4)
+
+        def test_bounded_read(self):
+            contents = "\0" * (20*1024*1024)
+            data = lzma.compress(contents)
+            f = UnLZMA(StringIO(data),"r",threads=self.threads)
+            # The file is a single block, which isn't decompressed whole
+            size = 0
+            chunk = f._fileobj._read(1024)
+            while chunk is not None:
+                self.assert_(len(chunk) <= 8*f._fileobj._bufsize)
+                size += len(chunk)
+                chunk = f._fileobj._read(1024)
+            self.assertEquals(size,len(contents))
+            f.seek(12345)
+            self.assertEquals(f.read(10),contents[12345:12355])
+            # Likewise when decompressing a stream without its index
+            d = XZDecompressor()
+            chunks = [d(data,1024)]
+            while chunks[-1]:
+                self.assert_(len(chunks[-1]) <= 64*1024)
+                chunks.append(d.more(1024))
+            chunks.append(d.flush())
+            self.assertEquals("".join(chunks),contents)
+
+        def test_multiple_streams(self):
+            contents = "".join(["%d\n" % (i,) for i in xrange(10000)])
+            data = lzma.compress(contents[:1000]) + "\x00" * 8 + \
+                   lzma.compress(contents[1000:])
+            f = UnLZMA(StringIO(data),"r",threads=self.threads)
+            f.seek(20000)
+            self.assertEquals(f.read(10),contents[20000:20010])
+            f.seek(10)
+            self.assertEquals(f.read(),contents[10:])
+            s = StringIO()
+            f = LZMA(s,"w")
+            f.write(data)
+            f.flush()
+            self.assertEquals(s.getvalue(),contents)
+
+        def test_compress_on_read(self):
+            contents = "".join(["%d\n" % (i,) for i in xrange(10000)])
+            f = LZMA(StringIO(contents),"r",block_size=10000)
+            data = f.read()
+            self.assertEquals(lzma.decompress(data),contents)
+            self.assertEquals(len(read_xz_index(StringIO(data))),5)
+
+        if find_executable("xz") is not None:
+
+            def test_xz_tool(self):
+                import tempfile
+                import os
+                import subprocess
+                contents = "".join(["%d\n" % (i,) for i in xrange(100000)])
+                (fd,fn) = tempfile.mkstemp(suffix=".xz")
+                os.close(fd)
+                try:
+                    # Files written by UnLZMA can be read by xz
+                    f = UnLZMA(open(fn,"wb"),"w",preset=1,block_size=50000)
+                    f.write(contents)
+                    f.close()
+                    p = subprocess.Popen(["xz","-dc",fn],
+                                         stdout=subprocess.PIPE)
+                    self.assertEquals(p.communicate()[0],contents)
+                    # Multi-block files written by xz can be seeked in
+                    p = subprocess.Popen(["xz","-c","-1","--block-size=50000"],
+                                         stdin=subprocess.PIPE,
+                                         stdout=subprocess.PIPE)
+                    data = p.communicate(contents)[0]
+                    self.assertEquals(len(read_xz_index(StringIO(data))),
+                                      len(contents) / 50000 + 1)
+                    f = UnLZMA(StringIO(data),"r",threads=self.threads)
+                    f.seek(234567)
+                    self.assertEquals(f.read(10),contents[234567:234577])
+                    f.seek(-10,2)
+                    self.assertEquals(f.read(),contents[-10:])
+                finally:
+                    os.unlink(fn)
+
+
+    class Test_UnLZMAThreads(Test_UnLZMA):
+        """Testcases for UnLZMA wrapper class using threads."""
+
+        threads = 3
@@ -0,0 +1,84 @@
+
+from filelike.wrappers import Extents
+from filelike import tests
+
+import unittest
+from StringIO import StringIO
+
+
+class Test_Extents(tests.Test_ReadWriteSeek):
+    """Testcases for the Extents wrapper class."""
+
+    def makeFile(self,contents,mode):
+        # Lay out pairs of chunks in reverse order through the file,
+        # so each pair forms an adjacent extent that will be merged.
+        chunks = [contents[i:i+7] for i in xrange(0,len(contents),7)]
+        pairs = [chunks[i:i+2] for i in xrange(0,len(chunks),2)]
+        data = []
+        offsets = {}
+        offset = 0
+        for i in reversed(xrange(len(pairs))):
+            data.append("X"*(i+1))
+            offset += i+1
+            for (j,chunk) in enumerate(pairs[i]):
+                offsets[2*i+j] = offset
+                data.append(chunk)
+                offset += len(chunk)
+        extents = [(offsets[i],len(c)) for (i,c) in enumerate(chunks)]
+        s = StringIO("".join(data))
+        f = Extents(s,extents,mode=mode)
+        def getvalue():
+            val = s.getvalue()
+            return "".join([val[o:o+n] for (o,n) in extents])
+        f.getvalue = getvalue
+        return f
+
+    #  Extents have a fixed size, so writes past the end must fail
+
+    def test_write(self):
+        method = super(Test_Extents,self).test_write
+        self.assertRaises(IOError,method)
+
+    def test_append(self):
+        method = super(Test_Extents,self).test_append
+        self.assertRaises(IOError,method)
+
+    def test_writelines(self):
+        method = super(Test_Extents,self).test_writelines
+        self.assertRaises(IOError,method)
+
+    def test_write_stream(self):
+        method = super(Test_Extents,self).test_write_stream
+        self.assertRaises(IOError,method)
+
+    def test_write_at_end(self):
+        method = super(Test_Extents,self).test_write_at_end
+        self.assertRaises(IOError,method)
+
+    def test_write_twice(self):
+        method = super(Test_Extents,self).test_write_twice
+        self.assertRaises(IOError,method)
+
+    def test_coalesce(self):
+        s = StringIO("0123456789abcdefghij")
+        f = Extents(s,[(10,3),(13,2),(0,4),(4,0),(4,2),(18,2)])
+        self.assertEquals(f.extents,[(10,5),(0,6),(18,2)])
+        self.assertEquals(f.size,13)
+        self.assertEquals(f.read(),"abcde012345ij")
+        f.seek(4)
+        self.assertEquals(f.read(3),"e01")
+        self.assertEquals(f.pread(9,10),"45ij")
+        f.seek(-3,2)
+        f.write("XYZ")
+        self.assertEquals(s.getvalue(),"01234X6789abcdefghYZ")
+        self.assertRaises(ValueError,Extents,s,[(-1,2)])
+
+    def test_shared_file(self):
+        s = StringIO("0123456789abcdefghij")
+        f1 = Extents(s,[(0,5),(15,5)])
+        f2 = Extents(s,[(5,10)])
+        self.assertEquals(f1.read(3),"012")
+        self.assertEquals(f2.read(3),"567")
+        self.assertEquals(f1.read(),"34fghij")
+        self.assertEquals(f2.read(),"89abcde")
+
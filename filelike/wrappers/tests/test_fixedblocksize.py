@@ -43,6 +43,16 @@ class Test_FixedBlockSize5(tests.Test_ReadWriteSeek):
         fbsf.getvalue = getvalue
         return fbsf
 
+    def test_small_writes(self):
+        f = self.makeFile("","w")
+        data = "abcdefghijklmnopqrstuvwxyz" * 10
+        for c in data:
+            f.write(c)
+            self.assert_(f._wbuflen < self.blocksize * 2)
+        self.assertEquals(f.tell(),len(data))
+        f.flush()
+        self.assertEquals(f.getvalue(),data)
+
 
 class Test_FixedBlockSize7(Test_FixedBlockSize5):
     """Testcases for the FixedBlockSize class, with blocksize 7."""
@@ -111,6 +111,15 @@ class Test_UnPadToBlockSize5(tests.Test_ReadWriteSeek):
         f._fileobj = StringIO(txt + f._padding(txt))
         self.assertEquals(f.read(),txt)
 
+    def test_skip_zeds(self):
+        txt = "test data Z with lots of Z's embedded in it Z" * 10
+        for offset in xrange(0,len(txt)+1,3):
+            f = self.makeFile(txt,"r")
+            f._bufsize = 2 * self.blocksize
+            f.seek(offset)
+            self.assertEquals(f.tell(),offset)
+            self.assertEquals(f.read(),txt[offset:])
+
 
 class Test_UnPadToBlockSize7(Test_UnPadToBlockSize5):
     """Testcases for UnPadToBlockSize with blocksize=7."""
@@ -23,6 +23,51 @@ class Test_Slice_Whole(tests.Test_ReadWriteSeek):
         return f
 
 
+    def test_position_tracking(self):
+        calls = []
+        class CountingStringIO(StringIO):
+            def tell(self):
+                calls.append(1)
+                return StringIO.tell(self)
+        s = CountingStringIO("x"*10 + "y"*4000)
+        f = Slice(s,10,mode="r")
+        f._bufsize = 16
+        self.assertEquals(f.read(),"y"*4000)
+        self.assertEquals(f.tell(),4000)
+        self.assert_(len(calls) <= 2)
+
+    def test_shared_file(self):
+        s = StringIO("abcdefghijklmnopqrstuvwxyz")
+        f1 = Slice(s,0,13,mode="r")
+        f2 = Slice(s,13,mode="r")
+        f1._bufsize = f2._bufsize = 2
+        data1 = []
+        data2 = []
+        for i in xrange(7):
+            data1.append(f1.read(2))
+            data2.append(f2.read(2))
+        self.assertEquals("".join(data1),"abcdefghijklm")
+        self.assertEquals("".join(data2),"nopqrstuvwxyz")
+        self.assertEquals(f1.tell(),13)
+        self.assertEquals(f2.tell(),13)
+
+    def test_shared_file_moved(self):
+        s = StringIO("abcdefghijklmnopqrstuvwxyz")
+        f = Slice(s,10,20,mode="r+",shared=True)
+        f._bufsize = 2
+        self.assertEquals(f.read(2),"kl")
+        s.seek(0)
+        self.assertEquals(s.read(3),"abc")
+        self.assertEquals(f.read(2),"mn")
+        s.seek(25)
+        f.write("XY")
+        f.flush()
+        s.seek(0)
+        self.assertEquals(f.tell(),6)
+        self.assertEquals(f.read(),"qrst")
+        self.assertEquals(s.getvalue(),"abcdefghijklmnXYqrstuvwxyz")
+
+
 class Test_Slice_Start(Test_Slice_Whole):
     """Testcases for the Slice wrapper class with a start offset."""
 
@@ -46,6 +91,10 @@ class Test_Slice_StartStop(Test_Slice_Whole):
         method = super(Test_Slice_StartStop,self).test_write
         self.assertRaises(IOError,method)
 
+    def test_writelines(self):
+        method = super(Test_Slice_StartStop,self).test_writelines
+        self.assertRaises(IOError,method)
+
     def test_write_stream(self):
         method = super(Test_Slice_StartStop,self).test_write_stream
         self.assertRaises(IOError,method)
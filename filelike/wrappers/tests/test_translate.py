@@ -19,6 +19,37 @@ class Test_Translate(tests.Test_ReadWriteSeek):
         f.getvalue = getvalue
         return f
 
+    def test_stats_discarded(self):
+        f = self.makeFile(self.contents,"r")
+        f.enable_stats()
+        f.seek(7)
+        self.assertEquals(f.read(3),self.contents[7:10])
+        stats = f.get_stats()
+        self.assertEquals(stats["discarded"],7)
+        self.assertEquals(stats["skip"]["calls"],0)
+
+    def test_seek_forward_continues(self):
+        translated = []
+        def rfunc(string):
+            translated.append(string)
+            return string
+        def wfunc(string):
+            return string
+        s = StringIO(self.contents)
+        f = Translate(s,rfunc=rfunc,wfunc=wfunc,mode="r+")
+        f._bufsize = 7
+        self.assertEquals(f.read(5),self.contents[:5])
+        f.seek(20)
+        self.assertEquals(f.read(5),self.contents[20:25])
+        f.seek(3,1)
+        self.assertEquals(f.read(5),self.contents[28:33])
+        # Nothing was translated twice
+        self.assert_(self.contents.startswith("".join(translated)))
+        f.seek(40)
+        f.write("XX")
+        f.flush()
+        self.assertEquals(s.getvalue(),self.contents[:40] + "XX" + self.contents[42:])
+
 
 class Test_BytewiseTranslate(tests.Test_ReadWriteSeek):
     """Testcases for the BytewiseTranslate class."""
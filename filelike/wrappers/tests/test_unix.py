@@ -104,6 +104,16 @@ class Test_Head(unittest.TestCase):
         self.assertEquals(txt.count("\n"),1)
         self.assertEquals(txt,self.intext.split("\n")[0]+"\n")
 
+    def test_SeekHead(self):
+        """Test seeking within the head of a file."""
+        hf = Head(self.infile,"r",bytes=20)
+        self.assertEquals(hf.read(3),self.intext[:3])
+        hf.seek(10)
+        self.assertEquals(hf.tell(),10)
+        self.assertEquals(hf.read(),self.intext[10:20])
+        hf.seek(2)
+        self.assertEquals(hf.read(3),self.intext[2:5])
+
 
 def testsuite():
     suite = unittest.TestSuite()
@@ -19,6 +19,61 @@ class Test_FileWrapper(tests.Test_ReadWriteSeek):
         f.getvalue = getvalue
         return f
 
+    def test_mode_flags(self):
+        f = self.makeFile("contents","r-")
+        self.assertRaises(filelike.NotWritableError,f.write,"data")
+        self.assertRaises(filelike.NotSeekableError,f.seek,0)
+        self.assert_(f._check_mode("r-"))
+        self.assert_(not f._check_mode("r"))
+        f.mode = "r+"
+        self.assert_(f._check_mode("rw"))
+        f.seek(3)
+        f.write("TENT")
+        f.flush()
+        self.assertEquals(f.getvalue(),"conTENTs")
+
+    def test_iterlines_batch(self):
+        f = self.makeFile("one\ntwo\r\nthree\nfour","r")
+        f._bufsize = 8
+        batches = list(f.iterlines(batch=True))
+        self.assert_(len(batches) > 1)
+        lines = [ln for batch in batches for ln in batch]
+        self.assertEquals(lines,["one\n","two\r\n","three\n","four"])
+
+    def test_next_then_read(self):
+        f = self.makeFile("one\ntwo\nthree\nfour","r")
+        self.assertEquals(f.next(),"one\n")
+        self.assertEquals(f.tell(),4)
+        self.assertEquals(f.read(5),"two\nt")
+        self.assertEquals(f.next(),"hree\n")
+        self.assertEquals(f.next(),"four")
+        self.assertRaises(StopIteration,f.next)
+        f.seek(4)
+        self.assertEquals(f.next(),"two\n")
+        self.assertEquals(list(f),["three\n","four"])
+
+    def test_stats(self):
+        s = StringIO("one\ntwo\nthree\nfour")
+        f = FileWrapper(FileWrapper(s,"r+"),"r+")
+        self.assertEquals(f.get_stats(),None)
+        enable_stack_stats(f)
+        self.assertEquals(f.read(4),"one\n")
+        f.seek(8)
+        f.write("THREE")
+        f.flush()
+        layers = stack_stats(f)
+        self.assertEquals([l for (l,_) in layers],[f,f._fileobj,s])
+        self.assertEquals(layers[2][1],None)
+        for (_,stats) in layers[:2]:
+            self.assertEquals(stats["read"]["calls"],1)
+            self.assertEquals(stats["write"]["bytes"],5)
+            self.assert_(stats["rbuffer_max"] >= 4)
+            self.assertEquals(stats["wbuffer_max"],5)
+        self.assertEquals(s.getvalue(),"one\ntwo\nTHREE\nfour")
+        f.disable_stats()
+        self.assertEquals(f.get_stats(),None)
+        self.assert_("_read" not in f.__dict__)
+
 
 class Test_OpenerDecoders(unittest.TestCase):
     """Testcases for the filelike.Opener decoder functions."""
@@ -33,7 +33,8 @@ therefore optimise these operations.
 """ 
 
 import filelike
-from filelike.wrappers import FileWrapper, Debug
+from filelike.wrappers import FileWrapper, Debug, _readinto_fileobj
+from filelike.wrappers import _pread_fileobj, _pwrite_fileobj
 
 
 class Translate(FileWrapper):
@@ -54,6 +55,28 @@ class Translate(FileWrapper):
     remaining to be read/written.  If it needs to be reset after flushing,
     it should provide a reset() method.
 
+    To limit the amount of data produced by a single read, the read
+    transform may provide a more() method.  It is then called with a second
+    argument giving the maximum amount of data to return, holding back any
+    input it hasn't yet used; more() takes the same maximum and returns
+    further data from this held-back input, or the empty string if there is
+    none.  Highly compressed data can then be read without ever holding
+    much more than the amount requested in memory.
+
+    If the read transform can resume from a saved state, it may provide
+    the methods find_checkpoint() and restore().  The first takes an offset
+    in the translated data and returns a tuple (offset,raw_offset,state)
+    for the nearest checkpoint before it, or None.  The second restores the
+    transform to that checkpoint.  Read-only files will then seek by
+    resuming from a checkpoint rather than from the start of the file.
+
+    If separate runs of the write transform can simply be concatenated, as
+    with the members of a gzip file, it may have a true 'appendable'
+    attribute.  Flushing then leaves the file positioned at the end of the
+    data, where another run can be appended, instead of starting over from
+    the beginning; a file read through to its end can likewise be appended
+    to without rewriting it.
+
     If the translation function operates on a byte-by-byte basis and
     does not buffer any data, consider using the 'BytewiseTranslate'
     class instead; the efficiency of several operations can be improved
@@ -86,6 +109,8 @@ class Translate(FileWrapper):
         self._wfunc = self._normalise_func(wfunc)
         self._pos = 0
         self._read_eof = False
+        self._written = False
+        self._wflushed = False
         super(Translate,self).__init__(fileobj,mode)
 
     def _normalise_func(self,func):
@@ -108,28 +133,50 @@ class Translate(FileWrapper):
 
     def flush(self):
         # TODO: this should read-and-write the rest of the data in the file
-        data = self._wfunc.flush()
+        appendable = getattr(self._wfunc,"appendable",False)
+        if self._wflushed:
+            # Nothing has been written since the last run was finished
+            data = None
+        else:
+            data = self._wfunc.flush()
         if data is not None:
             self._fileobj.write(data)
         super(Translate,self).flush()
         if not self._closing:
-            if "-" not in self.mode:
-                self.seek(self.tell())
+            if not self._streaming:
+                if appendable:
+                    self._wfunc.reset()
+                else:
+                    self.seek(self.tell())
             else:
                 if hasattr(self._rfunc,"reset"):
                     self._rfunc.reset()
                 if hasattr(self._wfunc,"reset"):
                     self._wfunc.reset()
+            self._wflushed = True
 
     def _read(self,sizehint=-1):
         if self._read_eof:
             return None
+        if sizehint <= 0:
+            sizehint = self._bufsize
+        more = getattr(self._rfunc,"more",None)
+        if more is not None:
+            tData = more(max(sizehint,self._bufsize))
+            if tData:
+                self._pos += len(tData)
+                return tData
         data = self._fileobj.read(sizehint)
         if data == "":
             self._read_eof = True
+            # Reading to the end without writing leaves nothing to flush.
+            if not self._written:
+                self._wflushed = True
             tData = self._rfunc.flush()
             if tData is None:
                 return tData
+        elif more is not None:
+            tData = self._rfunc(data,max(sizehint,self._bufsize))
         else:
             tData = self._rfunc(data)
         self._pos += len(tData)
@@ -138,6 +185,8 @@ class Translate(FileWrapper):
     def _write(self,data,flushing=False):
         """Write the given data to the file."""
         self._pos += len(data)
+        self._written = True
+        self._wflushed = False
         wData = self._wfunc(data)
         self._fileobj.write(wData)
  
@@ -146,18 +195,61 @@ class Translate(FileWrapper):
 
     def _seek(self,offset,whence):
         #  For generic translation functions, we can't do much more than
-        #  go back to the beginning.  See BytewiseTranslate for a much
-        #  more efficient seek().
-        if whence > 0 or offset > 0:
+        #  read forward, or go back to the beginning or to a checkpoint.
+        #  See BytewiseTranslate for a much more efficient seek().
+        if whence == 1:
+            offset = self._pos + offset
+        elif whence == 2:
+            raise NotImplementedError
+        if offset > 0:
+            try:
+                return self._seek_checkpoint(offset)
+            except NotImplementedError:
+                pass
+            # Data ahead of us can be read and discarded, provided the
+            # translation hasn't been disturbed by writing.  Writes must
+            # follow on from the start of the file, so a writable file
+            # seeking to its current position is still reset, unless it's
+            # at the end where a new run of the transform can be appended.
+            if offset >= self._pos and not self._written:
+                if offset > self._pos or not self._writable:
+                    return offset - self._pos
+                if self._read_eof and getattr(self._wfunc,"appendable",False):
+                    self._wfunc.reset()
+                    self._wflushed = True
+                    return None
             raise NotImplementedError
         self._fileobj.seek(0,0)
         self._pos = 0
         self._read_eof = False
+        self._written = False
+        self._wflushed = False
         if hasattr(self._rfunc,"reset"):
             self._rfunc.reset()
         if hasattr(self._wfunc,"reset"):
             self._wfunc.reset()
 
+    def _seek_checkpoint(self,offset):
+        """Seek by resuming from the checkpoint nearest to <offset>.
+
+        The data between the checkpoint and the target position is skipped
+        when the file is next read.
+        """
+        find = getattr(self._rfunc,"find_checkpoint",None)
+        if find is None or self._writable:
+            raise NotImplementedError
+        checkpoint = find(offset)
+        if checkpoint is None:
+            raise NotImplementedError
+        # Reading forward from the current position may be quicker
+        if checkpoint[0] <= self._pos <= offset:
+            raise NotImplementedError
+        self._fileobj.seek(checkpoint[1],0)
+        self._rfunc.restore(checkpoint)
+        self._pos = checkpoint[0]
+        self._read_eof = False
+        return offset - checkpoint[0]
+
     def _truncate(self,size):
         #  For generic translation functions, we can only sensibly truncate
         #  to zero bytes.  See BytewiseTranslate for truncation to any size.
@@ -224,11 +316,26 @@ class BytewiseTranslate(FileWrapper):
         if data == "":
             return None
         return self._rfunc(data)
+
+    def _readinto(self,b):
+        """Read data directly into the buffer <b>, translating in place."""
+        n = _readinto_fileobj(self._fileobj,b)
+        if n:
+            b[:n] = self._rfunc(b[:n].tobytes())
+        return n
     
     def _write(self,data,flushing=False):
         """Write the given data to the file."""
         self._fileobj.write(self._wfunc(data))
 
+    def _pread(self,offset,size):
+        """Read and translate data from the given offset."""
+        return self._rfunc(_pread_fileobj(self._fileobj,offset,size))
+
+    def _pwrite(self,offset,data):
+        """Translate and write data at the given offset."""
+        _pwrite_fileobj(self._fileobj,offset,self._wfunc(data))
+
     # Since this is a bytewise translation, the default implementations of
     # _seek(), _tell() and _truncate() will do what we want.
 
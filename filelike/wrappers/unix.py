@@ -37,7 +37,8 @@ class Head(FileWrapper):
     
     This wrapper limits the amount of data returned from or written to the
     underlying file based on the number of bytes and/or lines.  This class
-    currently does not support seeking or simultaneous read/write.
+    currently does not support simultaneous read/write, and can only seek
+    by rewinding to the start of the file and reading forward.
     
     NOTE: no guarantees are made about the amount of data read *from*
           the underlying file, only about the amount of data returned to
@@ -86,7 +87,7 @@ class Head(FileWrapper):
             else:
                 data = "\n".join(lines[:limit])
             self._finishedR = True
-        self._bytesR = newBytes
+        self._bytesR += len(data)
         self._linesR = newLines
         return data
 
@@ -108,9 +109,38 @@ class Head(FileWrapper):
             else:
                 data = "\n".join(lines[:limit])
             self._finishedW = True
-        self._bytesW = newBytes
+        self._bytesW += len(data)
         self._linesW = newLines
         self._fileobj.write(data)
         return None
 
+    def _seek(self,offset,whence):
+        """Seek to the start of the file.
+
+        Since the limits are defined relative to the start of the file,
+        this is the only seek we can perform directly.  Other seeks are
+        simulated using _skip().
+        """
+        if offset != 0 or whence != 0:
+            raise NotImplementedError
+        self._fileobj.seek(0,0)
+        self._bytesR = self._linesR = 0
+        self._bytesW = self._linesW = 0
+        self._finishedR = self._finishedW = False
+
+    def _skip(self,size):
+        """Skip forward by reading and discarding data.
+
+        Each read is limited to the remaining size, so we never have to
+        return any data between the real and apparent positions.
+        """
+        while size > 0:
+            data = self._read(min(size,self._bufsize))
+            if not data:
+                break
+            size -= len(data)
+
+    def _tell(self):
+        return self._bytesR + self._bytesW
+
 
@@ -33,6 +33,7 @@ LONG_DESC = info["__doc__"]
 
 PACKAGES = [
     "filelike",
+    "filelike.benchmarks",
     "filelike.pipeline",
     "filelike.wrappers",
     "filelike.wrappers.tests",
@@ -55,7 +56,7 @@ setup(
     package_data=PKG_DATA,
     license=LICENSE,
     test_suite="filelike.tests.build_test_suite",
-    tests_require=["PyCrypto"],
+    tests_require=["PyCrypto","backports.lzma; python_version < '3.3'"],
     use_2to3=True,
 )
 